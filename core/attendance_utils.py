@@ -1,5 +1,37 @@
+import io
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
-from .models import Student, Attendance, CallRecord
+from django.db import transaction
+
+from . import fingerprint_utils, stats_utils, workbook
+from .models import Student, Attendance, CallRecord, ImportFingerprint, WeekLock
+from .preview_utils import SAMPLE_SIZE
+
+
+# rows per INSERT statement for the bulk upserts below
+BULK_BATCH_SIZE = 500
+
+# default "call required" cut-off; modules override it with attendance_threshold
+DEFAULT_THRESHOLD = 80
+
+# upper bound on workbooks parsed at the same time by one import
+PARSE_WORKERS = 4
+
+
+class SheetParseError(Exception):
+    """One or more uploaded sheets could not be parsed; `errors` maps label -> message."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(
+            f"{label.replace('_', ' ').capitalize()}: {msg}" for label, msg in errors.items()
+        ))
 
 
 # ---------------- BASIC CLEANERS ----------------
@@ -38,66 +70,72 @@ def percent_to_float(val):
 
 # ---------------- FIND REAL TABLE ----------------
 
-def find_header_row(df):
+def find_header_row(rows):
     """
     Detect the row where actual table header starts
     (contains Roll and Name)
     """
-    for i in range(len(df)):
-        row_text = " ".join(str(x).lower() for x in df.iloc[i].values)
-        if "roll" in row_text and "name" in row_text:
-            return i
-    return 0
+    header_row = workbook.find_header_row(rows, lambda text: "roll" in text and "name" in text)
+    return header_row if header_row is not None else 0
+
+
+def _pick_overall_sheet(sheet_names):
+    # choose sheet containing OVERALL if exists
+    for s in sheet_names:
+        if "OVERALL" in s.upper():
+            return s
+    return sheet_names[0] if sheet_names else None
 
 
 # ---------------- READ ATTENDANCE SHEET ----------------
 
 def read_sheet(file):
 
-    xls = pd.ExcelFile(file)
+    _, rows = workbook.read_rows(file, choose=_pick_overall_sheet)
+    return parse_rows(rows)
 
-    # choose sheet containing OVERALL if exists
-    sheet_name = xls.sheet_names[0]
-    for s in xls.sheet_names:
-        if "OVERALL" in s.upper():
-            sheet_name = s
-            break
 
-    # read raw to detect header row
-    raw = pd.read_excel(xls, sheet_name=sheet_name, header=None)
-    header_row = find_header_row(raw)
+def parse_rows(rows):
+    """Extract {enrollment: percent} from the rows of one attendance sheet."""
 
-    # read with two header rows
-    df = pd.read_excel(xls, sheet_name=sheet_name, header=[header_row, header_row+1])
+    header_row = find_header_row(rows)
+
+    # two header rows; merged top-level cells are carried forward
+    top = []
+    last = ""
+    for val in rows[header_row] if header_row < len(rows) else []:
+        last = workbook.cell_text(val) or last
+        top.append(last)
+    bottom = rows[header_row + 1] if header_row + 1 < len(rows) else []
+    data_start = header_row + 2
 
     # ---------------- FIND ATTENDANCE COLUMN ----------------
     percent_col_index = None
 
-    for i, col in enumerate(df.columns):
-        top = str(col[0]).lower()
-        bottom = str(col[1]).lower()
+    for i, name in enumerate(top):
+        bottom_name = workbook.cell_text(bottom[i]).lower() if i < len(bottom) else ""
 
-        if "attendance" in top and "overall" in bottom:
+        if "attendance" in name.lower() and "overall" in bottom_name:
             percent_col_index = i
             break
 
     if percent_col_index is None:
         raise Exception("Attendance column not found in Excel")
 
-    percent_series = df.iloc[:, percent_col_index]
+    percent_series = workbook.column(rows, percent_col_index, data_start)
 
     # ---------------- FIND ENROLLMENT COLUMN ----------------
     enroll_col_index = None
 
-    for i, col in enumerate(df.columns):
-        if "enrol" in str(col[0]).lower():
+    for i, name in enumerate(top):
+        if "enrol" in name.lower():
             enroll_col_index = i
             break
 
     if enroll_col_index is None:
         raise Exception("Enrollment column not found")
 
-    enroll_series = df.iloc[:, enroll_col_index]
+    enroll_series = workbook.column(rows, enroll_col_index, data_start)
 
     # ---------------- BUILD RESULT ----------------
     result = {}
@@ -114,49 +152,391 @@ def read_sheet(file):
 
 # ---------------- IMPORT LOGIC ----------------
 
-def import_attendance(weekly_file, overall_file, week_no, module, rule="both"):
+def read_sheets(files, max_workers=PARSE_WORKERS, parse=read_sheet):
+    """
+    Parse several attendance workbooks concurrently.
 
-    weekly = read_sheet(weekly_file)
+    `files` maps a label (e.g. "weekly_file") to an uploaded file
+    (or to sheet rows when `parse` is parse_rows).
+    Returns {label: {enrollment: percent}}; if any file fails, raises
+    SheetParseError carrying the message for every failed file.
+    """
+    results = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as pool:
+        futures = {label: pool.submit(parse, file) for label, file in files.items()}
+        for label, future in futures.items():
+            try:
+                results[label] = future.result()
+            except Exception as e:
+                errors[label] = str(e)
 
-    # Week 1 overall = weekly
-    if week_no == 1 or overall_file is None:
-        overall = weekly
-    else:
-        overall = read_sheet(overall_file)
+    if errors:
+        raise SheetParseError(errors)
+    return results
 
-    created_calls = 0
 
-    for enrollment, week_per in weekly.items():
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
 
-        try:
-            student = Student.objects.get(module=module, enrollment=enrollment)
-        except Student.DoesNotExist:
-            continue
 
-        overall_per = overall.get(enrollment, week_per)
+def classify_attendance(weekly, overall, student_ids, rule="both", threshold=DEFAULT_THRESHOLD):
+    """
+    Call decision for one week, over aligned arrays.
 
-        # decide call condition
-        if rule == "week":
-            call_required = week_per < 80
-        elif rule == "overall":
-            call_required = overall_per < 80
-        else:
-            call_required = week_per < 80 or overall_per < 80
+    weekly / overall map enrollment -> percentage, student_ids maps
+    enrollment -> Student.id. Returns (student_id, week_percentage,
+    overall_percentage, call_required) NumPy arrays with one entry per
+    matched student, in sheet order.
+    """
+    enrollments = pd.Index(list(weekly), dtype=object)
+    week = np.fromiter(weekly.values(), dtype=float, count=len(weekly))
+
+    # join the sheet rows onto the module's students; unmatched rows drop out
+    positions = pd.Index(list(student_ids), dtype=object).get_indexer(enrollments)
+    matched = positions >= 0
+    ids = np.fromiter(student_ids.values(), dtype=np.int64, count=len(student_ids))[positions[matched]]
+    enrollments = enrollments[matched]
+    week = week[matched]
+
+    # students missing from the overall sheet fall back to the weekly figure
+    # (the trailing NaN keeps position -1 valid when overall is empty)
+    positions = pd.Index(list(overall), dtype=object).get_indexer(enrollments)
+    values = np.append(np.fromiter(overall.values(), dtype=float, count=len(overall)), np.nan)
+    over = np.where(positions >= 0, values[positions], week)
+
+    if rule == "week":
+        call_required = week < threshold
+    elif rule == "overall":
+        call_required = over < threshold
+    else:
+        call_required = (week < threshold) | (over < threshold)
 
-        # save attendance
-        Attendance.objects.update_or_create(
+    return ids, week, over, call_required
+
+
+def _build_week_rows(week_no, weekly, overall, student_ids, rule, threshold):
+    ids, week, over, call_required = classify_attendance(
+        weekly, overall, student_ids, rule, threshold
+    )
+
+    attendance_rows = [
+        Attendance(
             week_no=week_no,
-            student=student,
-            defaults={
-                'week_percentage': week_per,
-                'overall_percentage': overall_per,
-                'call_required': call_required
-            }
+            student_id=student_id,
+            week_percentage=week_per,
+            overall_percentage=overall_per,
+            call_required=call,
+        )
+        for student_id, week_per, overall_per, call in zip(
+            ids.tolist(), week.tolist(), over.tolist(), call_required.tolist()
+        )
+    ]
+    call_rows = [
+        CallRecord(student_id=student_id, week_no=week_no)
+        for student_id in ids[call_required].tolist()
+    ]
+
+    return attendance_rows, call_rows
+
+
+def _changed_rows(attendance_rows, module, week_numbers):
+    # drop rows whose stored values are already identical
+    stored = {
+        (week_no, student_id): (week_per, overall_per, call_required)
+        for week_no, student_id, week_per, overall_per, call_required in Attendance.objects.filter(
+            week_no__in=week_numbers, student__module=module
+        ).values_list("week_no", "student_id", "week_percentage", "overall_percentage", "call_required")
+    }
+    return [
+        row for row in attendance_rows
+        if stored.get((row.week_no, row.student_id))
+        != (row.week_percentage, row.overall_percentage, row.call_required)
+    ]
+
+
+def _attendance_state(module, week_no, rule):
+    rows = Attendance.objects.filter(week_no=week_no, student__module=module).count()
+    return fingerprint_utils.state_key(
+        rule, module.attendance_threshold, fingerprint_utils.roster_state(module), rows
+    )
+
+
+def _write_rows(module, week_numbers, attendance_rows, call_rows):
+    with transaction.atomic():
+        Attendance.objects.bulk_create(
+            attendance_rows,
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["week_no", "student"],
+            update_fields=["week_percentage", "overall_percentage", "call_required"],
+        )
+        # existing call records keep their follow-up progress
+        CallRecord.objects.bulk_create(
+            call_rows,
+            batch_size=BULK_BATCH_SIZE,
+            ignore_conflicts=True,
         )
+        stats_utils.refresh(module.id, weeks=week_numbers)
 
-        # create call record
-        if call_required:
-            CallRecord.objects.get_or_create(student=student, week_no=week_no)
-            created_calls += 1
 
-    return created_calls
+def _week_files(weekly_file, overall_file, week_no):
+    files = {"weekly_file": weekly_file}
+
+    # Week 1 overall = weekly
+    if week_no != 1 and overall_file is not None:
+        files["overall_file"] = overall_file
+    return files
+
+
+def preview_attendance(weekly_file, overall_file, week_no, module, rule="both", parsed=None):
+    """
+    Dry run of import_attendance: matched / unmatched enrollments, calls
+    and changed rows of the week, without writing. Returns (parsed, summary);
+    `parsed` is the read_sheets() result import_attendance accepts.
+    """
+    parsed = parsed or read_sheets(_week_files(weekly_file, overall_file, week_no))
+    weekly = parsed["weekly_file"]
+    overall = parsed.get("overall_file", weekly)
+
+    enrollments = {
+        student_id: enrollment
+        for enrollment, student_id in Student.objects.filter(module=module).values_list("enrollment", "id")
+    }
+    student_ids = {enrollment: student_id for student_id, enrollment in enrollments.items()}
+    attendance_rows, call_rows = _build_week_rows(
+        week_no, weekly, overall, student_ids, rule, module.attendance_threshold
+    )
+    changed_rows = _changed_rows(attendance_rows, module, [week_no])
+    stored = {
+        student_id: (week_per, overall_per)
+        for student_id, week_per, overall_per in Attendance.objects.filter(
+            week_no=week_no, student_id__in=[row.student_id for row in changed_rows[:SAMPLE_SIZE]]
+        ).values_list("student_id", "week_percentage", "overall_percentage")
+    }
+    unmatched = [e for e in weekly if e not in student_ids]
+
+    return parsed, {
+        "rows_total": len(weekly),
+        "matched": len(attendance_rows),
+        "unmatched": len(unmatched),
+        "changed": len(changed_rows),
+        "unchanged": len(attendance_rows) - len(changed_rows),
+        "calls": len(call_rows),
+        "overall_rows": len(overall) if "overall_file" in parsed else 0,
+        "unmatched_sample": unmatched[:SAMPLE_SIZE],
+        "sample": [
+            {
+                "enrollment": enrollments[row.student_id],
+                "week_percentage": [stored.get(row.student_id, (None, None))[0], row.week_percentage],
+                "overall_percentage": [stored.get(row.student_id, (None, None))[1], row.overall_percentage],
+                "call_required": row.call_required,
+            }
+            for row in changed_rows[:SAMPLE_SIZE]
+        ],
+    }
+
+
+def import_attendance(weekly_file, overall_file, week_no, module, rule="both", stats=None, parsed=None):
+    """
+    Import one week of attendance for a module.
+
+    Returns the number of students that require a follow-up call.
+    Pass a dict as `stats` to receive per-stage timings (ms) and row counters.
+    `parsed` is a read_sheets() result of the same files (cached by a preview).
+    """
+    stats = {} if stats is None else stats
+    started = time.perf_counter()
+
+    files = _week_files(weekly_file, overall_file, week_no)
+
+    # identical re-upload: nothing to parse or write
+    sha256 = fingerprint_utils.file_sha256(weekly_file, files.get("overall_file"))
+    scope = f"week-{week_no}"
+    previous = fingerprint_utils.lookup(
+        module, ImportFingerprint.KIND_ATTENDANCE, scope, sha256, _attendance_state(module, week_no, rule)
+    )
+    if previous is not None:
+        stats["unchanged"] = True
+        stats["rows_read"] = previous["rows_read"]
+        stats["rows_matched"] = previous["rows_matched"]
+        stats["total_ms"] = _elapsed_ms(started)
+        return previous["calls"]
+
+    sheets = parsed or read_sheets(files)
+    weekly = sheets["weekly_file"]
+    overall = sheets.get("overall_file", weekly)
+    stats["parse_ms"] = _elapsed_ms(started)
+
+    # ---------------- MATCH + CLASSIFY (in memory) ----------------
+    stage = time.perf_counter()
+    student_ids = dict(
+        Student.objects.filter(module=module).values_list("enrollment", "id")
+    )
+    attendance_rows, call_rows = _build_week_rows(
+        week_no, weekly, overall, student_ids, rule, module.attendance_threshold
+    )
+    stats["match_ms"] = _elapsed_ms(stage)
+
+    # ---------------- WRITE (one transaction) ----------------
+    stage = time.perf_counter()
+    changed_rows = _changed_rows(attendance_rows, module, [week_no])
+    _write_rows(module, [week_no], changed_rows, call_rows)
+    fingerprint_utils.remember(
+        module,
+        ImportFingerprint.KIND_ATTENDANCE,
+        scope,
+        sha256,
+        _attendance_state(module, week_no, rule),
+        {"calls": len(call_rows), "rows_read": len(weekly), "rows_matched": len(attendance_rows)},
+    )
+    stats["write_ms"] = _elapsed_ms(stage)
+    stats["total_ms"] = _elapsed_ms(started)
+
+    stats["rows_read"] = len(weekly)
+    stats["rows_matched"] = len(attendance_rows)
+    stats["rows_changed"] = len(changed_rows)
+
+    return len(call_rows)
+
+
+# ---------------- MULTI-WEEK BATCH ----------------
+
+# "Week 3", "week-03", "W3", "wk_3" ... anywhere in a sheet or file name
+WEEK_NAME_RE = re.compile(r"\bw(?:ee)?k?[\s_\-]*0*(\d{1,2})(?!\d)", re.IGNORECASE)
+
+
+def _week_part(name):
+    """(week_no, "weekly_file" | "overall_file") for a batch entry name, or None."""
+    base = os.path.splitext(os.path.basename(name))[0]
+    match = WEEK_NAME_RE.search(base.replace("_", " "))
+    if not match or int(match.group(1)) <= 0:
+        return None
+    part = "overall_file" if "overall" in base.lower() else "weekly_file"
+    return int(match.group(1)), part
+
+
+def _is_archive(file_obj):
+    # .xlsx is a zip as well; only a plain archive of workbooks counts here
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    if not zipfile.is_zipfile(file_obj):
+        return False
+    file_obj.seek(0)
+    with zipfile.ZipFile(file_obj) as zf:
+        return "[Content_Types].xml" not in zf.namelist()
+
+
+def split_batch(file_obj):
+    """
+    Split a batch upload into {week_no: {"weekly_file": src, "overall_file": src}}.
+
+    A ZIP holds one workbook or CSV per entry ("week3_weekly.xlsx", "week3_overall.csv");
+    a workbook holds one sheet per entry ("Week 3", "Week 3 Overall").
+    Returns (weeks, parse, ignored): `parse` reads one src, `ignored` lists
+    entries without a week number.
+    """
+    weeks = {}
+    unknown = []
+
+    if _is_archive(file_obj):
+        file_obj.seek(0)
+        with zipfile.ZipFile(file_obj) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or os.path.basename(info.filename).startswith((".", "~$")):
+                    continue
+                if not info.filename.lower().endswith((".xlsx", ".xls", ".csv", ".tsv")):
+                    continue
+                key = _week_part(info.filename)
+                if key is None:
+                    unknown.append(info.filename)
+                    continue
+                weeks.setdefault(key[0], {})[key[1]] = io.BytesIO(zf.read(info))
+        parse = read_sheet
+    else:
+        for name, rows in workbook.read_workbook(file_obj).items():
+            key = _week_part(name)
+            if key is None:
+                unknown.append(name)
+                continue
+            weeks.setdefault(key[0], {})[key[1]] = rows
+        parse = parse_rows
+
+    if not weeks:
+        raise Exception("No week found in batch. Name files or sheets like 'Week 3' and 'Week 3 Overall'.")
+
+    missing = sorted(w for w, parts in weeks.items() if "weekly_file" not in parts)
+    if missing:
+        raise Exception(f"Weekly sheet missing for week(s): {', '.join(map(str, missing))}")
+
+    return weeks, parse, unknown
+
+
+def import_attendance_batch(file_obj, module, rule="both", stats=None):
+    """
+    Import several weeks of attendance from one ZIP / multi-sheet workbook.
+
+    All weeks are parsed concurrently and written in one transaction.
+    Raises if any week is locked. Returns {week_no: calls_required}.
+    """
+    stats = {} if stats is None else stats
+    started = time.perf_counter()
+
+    weeks, parse, unknown = split_batch(file_obj)
+
+    locked = sorted(
+        WeekLock.objects.filter(module=module, week_no__in=list(weeks), locked=True)
+        .values_list("week_no", flat=True)
+    )
+    if locked:
+        raise Exception(f"Week(s) {', '.join(map(str, locked))} LOCKED. Upload not allowed.")
+
+    # Week 1 overall = weekly, as in the single-week upload
+    files = {}
+    for week_no, parts in sorted(weeks.items()):
+        files[f"week_{week_no}_weekly"] = parts["weekly_file"]
+        if week_no != 1 and "overall_file" in parts:
+            files[f"week_{week_no}_overall"] = parts["overall_file"]
+
+    sheets = read_sheets(files, parse=parse)
+    stats["parse_ms"] = _elapsed_ms(started)
+
+    # ---------------- MATCH + CLASSIFY (in memory) ----------------
+    stage = time.perf_counter()
+    student_ids = dict(
+        Student.objects.filter(module=module).values_list("enrollment", "id")
+    )
+
+    attendance_rows = []
+    call_rows = []
+    counts = {}
+    for week_no in sorted(weeks):
+        weekly = sheets[f"week_{week_no}_weekly"]
+        overall = sheets.get(f"week_{week_no}_overall", weekly)
+        week_attendance, week_calls = _build_week_rows(
+            week_no, weekly, overall, student_ids, rule, module.attendance_threshold
+        )
+        attendance_rows.extend(week_attendance)
+        call_rows.extend(week_calls)
+        counts[week_no] = len(week_calls)
+    stats["match_ms"] = _elapsed_ms(stage)
+
+    # ---------------- WRITE (one transaction) ----------------
+    stage = time.perf_counter()
+    changed_rows = _changed_rows(attendance_rows, module, list(weeks))
+    _write_rows(module, list(weeks), changed_rows, call_rows)
+    # single-week fingerprints no longer describe these weeks
+    ImportFingerprint.objects.filter(
+        module=module,
+        kind=ImportFingerprint.KIND_ATTENDANCE,
+        scope__in=[f"week-{w}" for w in weeks],
+    ).delete()
+    stats["write_ms"] = _elapsed_ms(stage)
+    stats["total_ms"] = _elapsed_ms(started)
+
+    stats["weeks"] = len(weeks)
+    stats["rows_matched"] = len(attendance_rows)
+    stats["rows_changed"] = len(changed_rows)
+    stats["ignored"] = unknown
+
+    return counts
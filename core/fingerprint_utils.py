@@ -0,0 +1,56 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+from .models import ImportFingerprint, Student
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _rewind(file_obj):
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+
+
+def file_sha256(*files):
+    """SHA-256 over the content of one or more uploaded files (None entries are skipped)."""
+    digest = hashlib.sha256()
+    for file_obj in files:
+        if file_obj is None:
+            continue
+        _rewind(file_obj)
+        part = hashlib.sha256()
+        for chunk in iter(lambda: file_obj.read(CHUNK_SIZE), b""):
+            part.update(chunk)
+        _rewind(file_obj)
+        digest.update(part.digest())
+    return digest.hexdigest()
+
+
+def state_key(*parts):
+    """Short hash of the DB state an import result depends on."""
+    return hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def roster_state(module):
+    # changes whenever students are added to / removed from the module
+    agg = Student.objects.filter(module=module).aggregate(n=Count("id"), last=Max("id"))
+    return f"{agg['n']}:{agg['last']}"
+
+
+def lookup(module, kind, scope, sha256, state):
+    """Summary of the previous import when the same file was imported into the same state."""
+    fp = ImportFingerprint.objects.filter(module=module, kind=kind, scope=scope).first()
+    if fp and fp.sha256 == sha256 and fp.state == state:
+        return fp.summary
+    return None
+
+
+def remember(module, kind, scope, sha256, state, summary):
+    ImportFingerprint.objects.update_or_create(
+        module=module,
+        kind=kind,
+        scope=scope,
+        defaults={"sha256": sha256, "state": state, "summary": summary},
+    )
@@ -0,0 +1,249 @@
+from django.db.models import Count
+
+from .attendance_utils import import_attendance, import_attendance_batch
+from .models import CallRecord, ResultCallRecord, Subject, WeekLock
+from .practical_utils import import_practical_marks
+from .result_utils import diff_text, import_compiled_bulk_all, import_subject_result
+from .utils import import_students_from_excel
+
+
+# Payload builders of the upload endpoints: the web views, the staff mobile
+# API and the background job handlers all answer with these dicts.
+
+# ---------------- STUDENTS ----------------
+
+def process_student_upload(module, file_obj, parsed=None):
+    added, updated, skipped, skipped_rows = import_students_from_excel(file_obj, module, parsed=parsed)
+    return {
+        "ok": True,
+        "msg": f"Added: {added} | Updated: {updated} | Skipped: {skipped}",
+        "added": added,
+        "updated": updated,
+        "skipped": skipped,
+        "skipped_rows": skipped_rows[:200],
+    }
+
+
+def staff_students_payload(module, file_obj):
+    added, updated, skipped, skipped_rows = import_students_from_excel(file_obj, module)
+    return {
+        "ok": True,
+        "module_id": module.id,
+        "added": added,
+        "updated": updated,
+        "skipped": skipped,
+        "skipped_rows": skipped_rows[:50],
+        "msg": f"Added: {added} | Updated: {updated} | Skipped: {skipped}",
+    }
+
+
+# ---------------- ATTENDANCE ----------------
+
+def process_attendance_upload(module, week_no, rule, weekly_file, overall_file, parsed=None):
+    if WeekLock.objects.filter(module=module, week_no=week_no, locked=True).exists():
+        raise Exception(f"Week {week_no} is LOCKED. Upload not allowed.")
+
+    # import
+    timings = {}
+    count = import_attendance(weekly_file, overall_file, week_no, module, rule, stats=timings, parsed=parsed)
+
+    # mentor-wise counts
+    mentor_stats = list(
+        CallRecord.objects.filter(week_no=week_no, student__module=module)
+        .values("student__mentor__name")
+        .annotate(total=Count("id"))
+        .order_by("student__mentor__name")
+    )
+
+    total_calls = sum(m["total"] for m in mentor_stats)
+
+    return {
+        "ok": True,
+        "msg": (
+            ("Same file as the last upload; nothing changed. " if timings.get("unchanged") else "")
+            + f"{count} students require follow-up calls for Week {week_no}"
+        ),
+        "week": week_no,
+        "unchanged": bool(timings.get("unchanged")),
+        "mentor_stats": mentor_stats,
+        "total_calls": total_calls,
+        "timings": timings,
+    }
+
+
+def staff_attendance_payload(module, week_no, rule, weekly_file, overall_file):
+    timings = {}
+    count = import_attendance(weekly_file, overall_file, week_no, module, rule, stats=timings)
+    mentor_stats = list(
+        CallRecord.objects.filter(week_no=week_no, student__module=module)
+        .values("student__mentor__name")
+        .annotate(total=Count("id"))
+        .order_by("student__mentor__name")
+    )
+    total_calls = sum(m["total"] for m in mentor_stats)
+    return {
+        "ok": True,
+        "module_id": module.id,
+        "week": week_no,
+        "created_calls": count,
+        "mentor_stats": mentor_stats,
+        "total_calls": total_calls,
+        "timings": timings,
+        "unchanged": bool(timings.get("unchanged")),
+        "msg": (
+            ("Same file as the last upload; nothing changed. " if timings.get("unchanged") else "")
+            + f"{count} students require follow-up calls for Week {week_no}"
+        ),
+    }
+
+
+def _batch_mentor_stats(module, week_numbers):
+    # one grouped query for every imported week
+    by_week = {w: [] for w in week_numbers}
+    rows = (
+        CallRecord.objects.filter(week_no__in=week_numbers, student__module=module)
+        .values("week_no", "student__mentor__name")
+        .annotate(total=Count("id"))
+        .order_by("week_no", "student__mentor__name")
+    )
+    for r in rows:
+        by_week[r["week_no"]].append({"student__mentor__name": r["student__mentor__name"], "total": r["total"]})
+    return [
+        {
+            "week": w,
+            "mentor_stats": by_week[w],
+            "total_calls": sum(m["total"] for m in by_week[w]),
+        }
+        for w in week_numbers
+    ]
+
+
+def process_attendance_batch(module, rule, batch_file):
+    timings = {}
+    counts = import_attendance_batch(batch_file, module, rule, stats=timings)
+    weeks = _batch_mentor_stats(module, sorted(counts))
+    for row in weeks:
+        row["created_calls"] = counts[row["week"]]
+
+    return {
+        "ok": True,
+        "msg": f"{len(weeks)} week(s) imported: " + ", ".join(
+            f"Week {row['week']} ({row['created_calls']} calls)" for row in weeks
+        ),
+        "weeks": weeks,
+        "ignored": timings.pop("ignored", []),
+        "timings": timings,
+    }
+
+
+# ---------------- RESULTS ----------------
+
+def result_subject(module, test_name, subject_id):
+    subject = Subject.objects.filter(id=subject_id, module=module, is_active=True).first()
+    if not subject:
+        raise Exception("Invalid subject")
+    if subject.result_format == Subject.FORMAT_T4_ONLY and test_name != "T4":
+        raise Exception("This subject is configured as Only T4. Please upload in T4.")
+    return subject
+
+
+def result_preview_scope(test_name, subject_id, upload_mode):
+    # a preview parse is only reused for the same test/subject/mode
+    if test_name == "ALL_EXAMS":
+        return "ALL_EXAMS"
+    return f"{test_name}-{subject_id}-{upload_mode}"
+
+
+def process_result_upload(module, username, test_name, subject_id, upload_mode, file_obj, progress_cb=None, cancel_cb=None, parsed=None):
+    """
+    Import a result sheet for the web page and the staff mobile API.
+
+    ALL_EXAMS + ALL subjects is the bulk replace; the callers ask for its
+    confirmation before queueing the upload.
+    """
+    if test_name == "ALL_EXAMS" and str(subject_id).upper() == "ALL":
+        summary = import_compiled_bulk_all(
+            file_obj,
+            username,
+            module=module,
+            progress_cb=progress_cb,
+            cancel_cb=cancel_cb,
+            parsed=parsed,
+        )
+        return {
+            "ok": True,
+            "msg": (
+                ("Same file as the last upload; nothing changed. " if summary.get("unchanged") else "")
+                + f"Bulk replace completed. Created uploads: {summary['uploads_created']}. "
+                f"Rows matched: {summary['rows_matched']}. Failed calls: {summary['rows_failed']}."
+                + diff_text(summary.get("diff"))
+            ),
+            "test_name": "ALL_EXAMS",
+            "subject_name": "ALL",
+            "upload_id": "",
+            "mentor_stats": [],
+            "total_calls": summary["rows_failed"],
+            "upload_mode": upload_mode,
+            "found_subjects": summary.get("found_subjects", []),
+            "used_subject": "ALL",
+            "unchanged": bool(summary.get("unchanged")),
+            "diff": summary.get("diff", {}),
+        }
+
+    subject = result_subject(module, test_name, subject_id)
+
+    upload, summary = import_subject_result(
+        file_obj,
+        module,
+        test_name,
+        subject,
+        upload_mode,
+        uploaded_by=username,
+        progress_cb=progress_cb,
+        cancel_cb=cancel_cb,
+        parsed=parsed,
+    )
+
+    mentor_stats = list(
+        ResultCallRecord.objects.filter(upload=upload)
+        .values("student__mentor__name")
+        .annotate(total=Count("id"))
+        .order_by("student__mentor__name")
+    )
+    total_calls = sum(m["total"] for m in mentor_stats)
+    return {
+        "ok": True,
+        "msg": (
+            ("Same file as the last upload; nothing changed. " if summary.get("unchanged") else "")
+            + f"Result uploaded: {test_name} - {subject.name}. "
+            f"Processed {summary['rows_total']} rows. "
+            f"Matched: {summary['rows_matched']}. "
+            f"Fail calls generated: {summary['rows_failed']}."
+            + diff_text(summary.get("diff"))
+        ),
+        "test_name": test_name,
+        "subject_name": subject.name,
+        "upload_id": upload.id,
+        "mentor_stats": mentor_stats,
+        "total_calls": total_calls,
+        "upload_mode": upload_mode,
+        "found_subjects": summary.get("found_subjects", []),
+        "used_subject": summary.get("used_subject", subject.name),
+        "unchanged": bool(summary.get("unchanged")),
+        "diff": summary.get("diff", {}),
+    }
+
+
+# ---------------- PRACTICALS ----------------
+
+def process_practical_upload(module, username, file_obj, parsed=None):
+    summary = import_practical_marks(file_obj, module=module, uploaded_by=username, parsed=parsed)
+    return {
+        "ok": True,
+        "msg": (
+            f"Uploaded practical marks ({summary.get('mode','-')} mode). "
+            f"Rows: {summary['rows_total']}, matched: {summary['rows_matched']}."
+        ),
+        "rows_total": summary["rows_total"],
+        "rows_matched": summary["rows_matched"],
+    }
@@ -0,0 +1,103 @@
+from contextlib import ExitStack
+
+from .models import BackgroundJob
+from . import import_utils, preview_utils, result_utils
+
+
+def _open_files(job, stack):
+    # spooled uploads by field name; None for optional files that were not sent
+    return {name: stack.enter_context(open(path, "rb")) for name, path in job.params.get("files", {}).items()}
+
+
+def _from_mobile(job):
+    # staff mobile uploads keep the payload shape of their synchronous endpoints
+    return job.params.get("source") == "mobile"
+
+
+def _previewed(job, scope, *files):
+    # parse cached by the preview this upload commits, if it is still there
+    return preview_utils.parsed_for(job.params.get("preview_token"), job.module, job.kind, scope, list(files))
+
+
+def run_result_upload(job, channel):
+    params = job.params
+    with ExitStack() as stack:
+        files = _open_files(job, stack)
+        payload = import_utils.process_result_upload(
+            module=job.module,
+            username=job.created_by,
+            test_name=params["test_name"],
+            subject_id=params["subject_id"],
+            upload_mode=params["upload_mode"],
+            file_obj=files["result_file"],
+            progress_cb=channel.progress,
+            cancel_cb=channel.cancelled,
+            parsed=_previewed(
+                job,
+                import_utils.result_preview_scope(params["test_name"], params["subject_id"], params["upload_mode"]),
+                files["result_file"],
+            ),
+        )
+    if _from_mobile(job):
+        payload["module_id"] = job.module_id
+    return payload
+
+
+def run_student_import(job, channel):
+    with ExitStack() as stack:
+        files = _open_files(job, stack)
+        if _from_mobile(job):
+            return import_utils.staff_students_payload(job.module, files["file"])
+        return import_utils.process_student_upload(job.module, files["file"], parsed=_previewed(job, "", files["file"]))
+
+
+def run_attendance_import(job, channel):
+    params = job.params
+    with ExitStack() as stack:
+        files = _open_files(job, stack)
+        week_no = int(params["week"])
+        if _from_mobile(job):
+            return import_utils.staff_attendance_payload(
+                job.module, week_no, params.get("rule"), files["weekly_file"], files.get("overall_file")
+            )
+        return import_utils.process_attendance_upload(
+            job.module,
+            week_no,
+            params.get("rule"),
+            files["weekly_file"],
+            files.get("overall_file"),
+            parsed=_previewed(job, f"week-{week_no}", files["weekly_file"], files.get("overall_file")),
+        )
+
+
+def run_attendance_batch(job, channel):
+    with ExitStack() as stack:
+        files = _open_files(job, stack)
+        return import_utils.process_attendance_batch(job.module, job.params.get("rule") or "both", files["batch_file"])
+
+
+def run_practical_import(job, channel):
+    with ExitStack() as stack:
+        files = _open_files(job, stack)
+        return import_utils.process_practical_upload(
+            job.module,
+            job.created_by,
+            files["practical_file"],
+            parsed=_previewed(job, "", files["practical_file"]),
+        )
+
+
+def run_result_gc(job, channel):
+    removed = result_utils.collect_result_generations(job.module)
+    return {"ok": True, "msg": f"Removed {removed} replaced result upload(s).", "removed": removed}
+
+
+# kind -> (first progress message, handler(job, channel) -> result payload)
+HANDLERS = {
+    BackgroundJob.KIND_RESULT_UPLOAD: ("Reading marks and preparing result call list...", run_result_upload),
+    BackgroundJob.KIND_STUDENT_IMPORT: ("Importing student master...", run_student_import),
+    BackgroundJob.KIND_ATTENDANCE_IMPORT: ("Importing attendance...", run_attendance_import),
+    BackgroundJob.KIND_ATTENDANCE_BATCH: ("Importing attendance batch...", run_attendance_batch),
+    BackgroundJob.KIND_PRACTICAL_IMPORT: ("Importing practical marks...", run_practical_import),
+    BackgroundJob.KIND_RESULT_GC: ("Removing replaced result uploads...", run_result_gc),
+}
@@ -0,0 +1,346 @@
+import os
+import socket
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import progress_utils
+from .models import BackgroundJob
+
+
+CHUNK_SIZE = 1024 * 1024
+
+# claim() looks at this many candidates before giving up for the round
+CLAIM_SCAN = 10
+
+
+# ---------------- ENQUEUE ----------------
+
+def worker_name(prefix="worker"):
+    return f"{prefix}:{socket.gethostname()}:{os.getpid()}"
+
+
+def _spool(file_obj, job_key, field):
+    """
+    Put an uploaded file into the job spool dir; the job reads it from there.
+
+    Uploads Django already streamed to disk (TemporaryUploadedFile) are
+    moved with os.replace; in-memory ones, and temp files on another
+    filesystem, are copied.
+    """
+    os.makedirs(settings.JOB_SPOOL_DIR, exist_ok=True)
+    suffix = os.path.splitext(getattr(file_obj, "name", "") or "")[1] or ".xlsx"
+    path = os.path.join(settings.JOB_SPOOL_DIR, f"{job_key}_{field}{suffix}")
+    if hasattr(file_obj, "temporary_file_path"):
+        try:
+            # the open handle keeps reading the moved file; Django's cleanup tolerates it being gone
+            os.replace(file_obj.temporary_file_path(), path)
+            return path
+        except OSError:
+            pass
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    with open(path, "wb") as out:
+        if hasattr(file_obj, "chunks"):
+            for chunk in file_obj.chunks():
+                out.write(chunk)
+        else:
+            for chunk in iter(lambda: file_obj.read(CHUNK_SIZE), b""):
+                out.write(chunk)
+    return path
+
+
+def enqueue(kind, module, params=None, files=None, created_by="", message="Upload queued...", max_attempts=None):
+    """
+    Queue a long operation and return its BackgroundJob.
+
+    `files` maps names to uploaded files; they are spooled to disk and the
+    handler gets their paths in job.params["files"]. The `run_jobs` worker
+    picks it up (in development, JOBS_IN_PROCESS starts it in a thread here).
+    """
+    job_key = str(uuid.uuid4())
+    spooled = {name: _spool(f, job_key, name) for name, f in (files or {}).items() if f is not None}
+    job = BackgroundJob.objects.create(
+        job_id=job_key,
+        kind=kind,
+        module=module,
+        created_by=created_by or "",
+        params={**(params or {}), "files": spooled},
+        status=BackgroundJob.STATUS_QUEUED,
+        message=message,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    progress_utils.ProgressChannel(job.job_id).update(
+        module_id=module.id,
+        kind=kind,
+        status=BackgroundJob.STATUS_QUEUED,
+        message=message,
+    )
+    if settings.JOBS_IN_PROCESS:
+        transaction.on_commit(start_in_process)
+    return job
+
+
+def cancel(job_id, module, message="Cancelling upload..."):
+    """Flag an active job for cancellation; False when it already finished."""
+    now = timezone.now()
+    job = BackgroundJob.objects.filter(
+        job_id=job_id, module=module, status=BackgroundJob.STATUS_QUEUED, attempts=0
+    ).first()
+    # never started: nothing to interrupt
+    if job and BackgroundJob.objects.filter(id=job.id, status=BackgroundJob.STATUS_QUEUED, attempts=0).update(
+        status=BackgroundJob.STATUS_CANCELLED, cancel_requested=True, finished_at=now, updated_at=now
+    ):
+        progress_utils.ProgressChannel(job_id).finish(BackgroundJob.STATUS_CANCELLED, "Upload cancelled.")
+        _cleanup(job)
+        return True
+
+    updated = BackgroundJob.objects.filter(
+        job_id=job_id,
+        module=module,
+        status__in=BackgroundJob.ACTIVE_STATUSES,
+    ).update(cancel_requested=True, message=message, updated_at=now)
+    if updated:
+        progress_utils.request_cancel(job_id, message)
+    return bool(updated)
+
+
+def status_payload(job_id, module_ids):
+    """Progress JSON of a job belonging to one of `module_ids`, or None when there is no such job."""
+    job = BackgroundJob.objects.filter(job_id=job_id, module_id__in=module_ids).first()
+    if not job:
+        return None
+    payload = {
+        "ok": True,
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "message": job.message or "",
+        "progress_current": job.progress_current,
+        "progress_total": job.progress_total,
+        "current_enrollment": job.current_enrollment or "",
+        "current_student_name": job.current_student_name or "",
+        "result": job.result_payload or {},
+    }
+
+    # the status always comes from the row: a run_jobs worker only updates
+    # its own cache, so another process's cache can still say "queued".
+    # Between DB flushes the cache may hold newer counters of a running job.
+    cached = progress_utils.read(job_id)
+    if (
+        job.status in BackgroundJob.ACTIVE_STATUSES
+        and cached
+        and (cached.get("progress_current") or 0) > job.progress_current
+    ):
+        for key in ("progress_current", "progress_total", "current_enrollment", "current_student_name"):
+            payload[key] = cached.get(key) or payload[key]
+    return payload
+
+
+# ---------------- CLAIM / RUN ----------------
+
+def _claimable(now):
+    # queued jobs that are due, plus running jobs whose worker stopped renewing the lease
+    return BackgroundJob.objects.filter(
+        Q(status=BackgroundJob.STATUS_QUEUED, run_after__lte=now)
+        | Q(status=BackgroundJob.STATUS_RUNNING, lease_until__lt=now)
+    )
+
+
+def _cleanup(job):
+    for path in (job.params or {}).get("files", {}).values():
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except Exception:
+            pass
+
+
+def _give_up(job):
+    now = timezone.now()
+    updated = BackgroundJob.objects.filter(
+        id=job.id, status=BackgroundJob.STATUS_RUNNING, lease_until=job.lease_until
+    ).update(worker="", lease_until=None)
+    if updated:
+        progress_utils.ProgressChannel(job.job_id).finish(
+            BackgroundJob.STATUS_FAILED,
+            "Job stopped responding and ran out of retries.",
+            finished_at=now,
+        )
+        _cleanup(job)
+
+
+def claim(worker, kinds=None):
+    """
+    Take the next due job for `worker`, or None.
+
+    The claim is a conditional UPDATE on the state that was read, so two
+    workers racing for the same row cannot both win.
+    """
+    now = timezone.now()
+    candidates = _claimable(now)
+    if kinds:
+        candidates = candidates.filter(kind__in=kinds)
+
+    for job in candidates.order_by("run_after", "id")[:CLAIM_SCAN]:
+        if job.status == BackgroundJob.STATUS_RUNNING and job.attempts >= job.max_attempts:
+            _give_up(job)
+            continue
+        won = BackgroundJob.objects.filter(
+            id=job.id, status=job.status, lease_until=job.lease_until, attempts=job.attempts
+        ).update(
+            status=BackgroundJob.STATUS_RUNNING,
+            worker=worker,
+            lease_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            heartbeat_at=now,
+            started_at=now,
+            attempts=F("attempts") + 1,
+            updated_at=now,
+        )
+        if won:
+            return BackgroundJob.objects.select_related("module").get(id=job.id)
+    return None
+
+
+class _Heartbeat(threading.Thread):
+    """Renews the job lease while the handler runs."""
+
+    def __init__(self, job_id, worker):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.worker = worker
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(settings.JOB_HEARTBEAT_SECONDS):
+            now = timezone.now()
+            try:
+                BackgroundJob.objects.filter(
+                    job_id=self.job_id, status=BackgroundJob.STATUS_RUNNING, worker=self.worker
+                ).update(heartbeat_at=now, lease_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+            except Exception:
+                pass
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._done.set()
+
+
+def run_job(job, worker=""):
+    """
+    Run a claimed job through its handler and store the final state.
+
+    Database errors (locks, dropped connections) are retried with a growing
+    delay until max_attempts; any other exception is a real failure of the
+    upload and ends the job with its message.
+    """
+    from .job_handlers import HANDLERS
+
+    close_old_connections()
+    channel = progress_utils.ProgressChannel(job.job_id)
+    heartbeat = _Heartbeat(job.job_id, worker)
+    heartbeat.start()
+    retry = False
+    try:
+        if job.cancel_requested:
+            channel.finish(BackgroundJob.STATUS_CANCELLED, "Upload cancelled.", finished_at=timezone.now())
+            return
+
+        if job.kind not in HANDLERS:
+            raise Exception(f"Unknown job kind: {job.kind}")
+        start_message, handler = HANDLERS[job.kind]
+        channel.update(
+            module_id=job.module_id,
+            kind=job.kind,
+            status=BackgroundJob.STATUS_RUNNING,
+            message=start_message,
+        )
+        channel.flush()
+
+        payload = handler(job, channel)
+
+        if channel.cancelled(exact=True):
+            channel.finish(BackgroundJob.STATUS_CANCELLED, "Upload cancelled.", finished_at=timezone.now())
+            return
+
+        channel.finish(
+            BackgroundJob.STATUS_COMPLETED,
+            "Upload completed.",
+            result_payload=payload,
+            progress_current=1,
+            progress_total=1,
+            finished_at=timezone.now(),
+        )
+    except Exception as exc:
+        cancelled = channel.cancelled(exact=True)
+        if isinstance(exc, OperationalError) and not cancelled and job.attempts < job.max_attempts:
+            retry = True
+            delay = settings.JOB_RETRY_DELAY_SECONDS * job.attempts
+            channel.finish(
+                BackgroundJob.STATUS_QUEUED,
+                f"Retrying in {delay}s after error: {exc}",
+                run_after=timezone.now() + timedelta(seconds=delay),
+                worker="",
+                lease_until=None,
+            )
+            if settings.JOBS_IN_PROCESS:
+                threading.Timer(delay, start_in_process).start()
+            return
+
+        extra = {"finished_at": timezone.now()}
+        if getattr(exc, "errors", None):
+            extra["result_payload"] = {"ok": False, "msg": str(exc), "errors": exc.errors}
+        channel.finish(
+            (BackgroundJob.STATUS_CANCELLED if cancelled else BackgroundJob.STATUS_FAILED),
+            ("Upload cancelled." if cancelled else str(exc)),
+            **extra,
+        )
+    finally:
+        heartbeat.stop()
+        if not retry:
+            _cleanup(job)
+        close_old_connections()
+
+
+def drain(worker, kinds=None):
+    """Run due jobs one after another until none is left; returns how many ran."""
+    ran = 0
+    while True:
+        job = claim(worker, kinds)
+        if job is None:
+            return ran
+        run_job(job, worker)
+        ran += 1
+
+
+# ---------------- IN-PROCESS FALLBACK ----------------
+# Development only (JOBS_IN_PROCESS=True): drains run when an upload is queued,
+# so a job whose lease stalls waits for the next upload. Deployments run `run_jobs`.
+
+_in_process_slots = threading.BoundedSemaphore(max(1, settings.JOB_CONCURRENCY))
+
+
+def _drain_in_process():
+    worker = worker_name("web")
+    try:
+        while _in_process_slots.acquire(blocking=False):
+            try:
+                drain(worker)
+            finally:
+                _in_process_slots.release()
+            # a job queued while this thread was finishing would otherwise wait for the next upload
+            if not _claimable(timezone.now()).exists():
+                break
+    finally:
+        close_old_connections()
+
+
+def start_in_process():
+    """Drain the queue in a daemon thread of this process (JOBS_IN_PROCESS fallback)."""
+    threading.Thread(target=_drain_in_process, daemon=True).start()
@@ -0,0 +1,73 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.attendance_utils import DEFAULT_THRESHOLD, classify_attendance
+
+
+def _classify_loop(weekly, overall, student_ids, rule, threshold):
+    # the original per-row implementation, kept as the reference result
+    rows = []
+    for enroll, week_per in weekly.items():
+        student_id = student_ids.get(enroll)
+        if student_id is None:
+            continue
+
+        overall_per = overall.get(enroll, week_per)
+
+        if rule == "week":
+            call_required = week_per < threshold
+        elif rule == "overall":
+            call_required = overall_per < threshold
+        else:
+            call_required = week_per < threshold or overall_per < threshold
+
+        rows.append((student_id, week_per, overall_per, call_required))
+    return rows
+
+
+def _classify_vectorized(weekly, overall, student_ids, rule, threshold):
+    ids, week, over, call_required = classify_attendance(weekly, overall, student_ids, rule, threshold)
+    return list(zip(ids.tolist(), week.tolist(), over.tolist(), call_required.tolist()))
+
+
+class Command(BaseCommand):
+    help = "Compare the vectorized attendance classifier with the row-by-row loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    def handle(self, *args, **options):
+        n = options["students"]
+        threshold = options["threshold"]
+        rnd = random.Random(42)
+
+        # a few sheet rows without a student and a few students missing from overall
+        weekly = {f"E{i:07d}": round(rnd.uniform(40, 100), 2) for i in range(n)}
+        overall = {k: round(rnd.uniform(50, 100), 2) for k in list(weekly)[: n - n // 50]}
+        student_ids = {k: i + 1 for i, k in enumerate(list(weekly)[n // 100:])}
+
+        for rule in ("both", "week", "overall"):
+            timings = {}
+            results = {}
+            for label, fn in (("loop", _classify_loop), ("vectorized", _classify_vectorized)):
+                best = None
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    results[label] = fn(weekly, overall, student_ids, rule, threshold)
+                    spent = time.perf_counter() - started
+                    best = spent if best is None else min(best, spent)
+                timings[label] = best * 1000
+
+            if results["loop"] != results["vectorized"]:
+                self.stderr.write(self.style.ERROR(f"rule={rule}: results differ"))
+                continue
+
+            calls = sum(1 for r in results["loop"] if r[3])
+            self.stdout.write(
+                f"rule={rule:<8} rows={len(results['loop'])} calls={calls} "
+                f"loop={timings['loop']:.2f}ms vectorized={timings['vectorized']:.2f}ms"
+            )
@@ -0,0 +1,87 @@
+import csv
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import workbook
+from core.attendance_utils import _pick_overall_sheet, read_sheet
+from core.practical_utils import _choose_sheet, parse_practical_sheet
+from core.result_utils import parse_compiled_bulk, parse_result_sheet
+from core.utils import parse_student_sheet
+
+
+# kind -> (sheet the importer reads, given the workbook's header rows; parse(file_obj))
+KINDS = {
+    "students": (lambda heads: next(iter(heads), None), parse_student_sheet),
+    "attendance": (lambda heads: _pick_overall_sheet(list(heads)), read_sheet),
+    "result": (lambda heads: next(iter(heads), None), lambda f: parse_result_sheet(f, "T4", "")),
+    "compiled": (lambda heads: "COMPILED", parse_compiled_bulk),
+    "practical": (_choose_sheet, parse_practical_sheet),
+}
+
+
+def _as_text(rows, delimiter, repeat_data, header_rows):
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=delimiter)
+    body = rows[header_rows:]
+    for row in rows[:header_rows] + body * repeat_data:
+        writer.writerow(["" if v is None else v for v in row])
+    return out.getvalue().encode("utf-8")
+
+
+def _as_xlsx(rows, repeat_data, header_rows, sheet):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet)
+    for row in rows[:header_rows] + rows[header_rows:] * repeat_data:
+        ws.append(row)
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Time an importer's parse step on an .xlsx sheet and on the same sheet as CSV / TSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(KINDS))
+        parser.add_argument("path", help="sample .xlsx in the format the importer expects")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--scale", type=int, default=1, help="repeat the data rows this many times")
+        parser.add_argument("--header-rows", type=int, default=10, help="rows kept once when scaling")
+
+    def handle(self, *args, **options):
+        choose, parse = KINDS[options["kind"]]
+        heads = workbook.read_workbook(options["path"], max_rows=workbook.HEADER_SCAN_ROWS)
+        sheet = choose(heads)
+        if sheet not in heads:
+            raise CommandError(f"No sheet to import in {options['path']}.")
+        rows = workbook.read_workbook(options["path"], sheets=[sheet])[sheet]
+
+        scale = max(1, options["scale"])
+        header_rows = options["header_rows"] if scale > 1 else len(rows)
+        # the same cells in every format, so only the reader differs
+        payloads = {
+            "xlsx": _as_xlsx(rows, scale, header_rows, sheet),
+            "csv": _as_text(rows, ",", scale, header_rows),
+            "tsv": _as_text(rows, "\t", scale, header_rows),
+        }
+
+        timings = {}
+        for label, data in payloads.items():
+            best = None
+            for _ in range(options["repeat"]):
+                started = time.perf_counter()
+                parse(io.BytesIO(data))
+                spent = time.perf_counter() - started
+                best = spent if best is None else min(best, spent)
+            timings[label] = best * 1000
+
+        data_rows = header_rows + (len(rows) - header_rows) * scale
+        self.stdout.write(
+            f"kind={options['kind']} sheet={sheet} rows={data_rows} "
+            + " ".join(f"{label}={ms:.1f}ms" for label, ms in timings.items())
+            + f" csv_speedup={timings['xlsx'] / timings['csv']:.1f}x"
+        )
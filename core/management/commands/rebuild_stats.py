@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import stats_utils
+from core.models import AcademicModule
+
+
+class Command(BaseCommand):
+    help = "Recount the mentor-week follow-up counters (MentorWeekStats) from attendance and call records."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", type=int, action="append", dest="modules", help="Module id (repeatable); all modules by default.")
+        parser.add_argument("--week", type=int, action="append", dest="weeks", help="Only this week (repeatable).")
+
+    def handle(self, *args, **options):
+        modules = AcademicModule.objects.order_by("id")
+        if options["modules"]:
+            modules = modules.filter(id__in=options["modules"])
+            missing = set(options["modules"]) - set(modules.values_list("id", flat=True))
+            if missing:
+                raise CommandError(f"Unknown module id(s): {', '.join(map(str, sorted(missing)))}")
+
+        total = 0
+        for module in modules:
+            cells = stats_utils.refresh(module.id, weeks=options["weeks"])
+            total += cells
+            self.stdout.write(f"{module.name}: {cells} mentor-week cells")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} cells."))
@@ -0,0 +1,62 @@
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import job_utils
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (imports) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.JOB_CONCURRENCY)
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--kind", action="append", dest="kinds", help="Only run jobs of this kind (repeatable).")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty.")
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        worker = job_utils.worker_name()
+        stopping = threading.Event()
+
+        def _stop(signum, frame):
+            self.stdout.write("Stopping after the running jobs finish...")
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+
+        if settings.JOBS_IN_PROCESS:
+            self.stderr.write(self.style.WARNING(
+                "JOBS_IN_PROCESS is on: web processes run jobs too. Set JOBS_IN_PROCESS=False when using this worker."
+            ))
+        if settings.CACHES["default"]["BACKEND"].endswith("LocMemCache"):
+            self.stderr.write(self.style.WARNING(
+                "Local-memory cache: the web process only sees progress when it is flushed to the DB. "
+                "Set CACHE_DIR to a directory shared with the web process for live progress."
+            ))
+        self.stdout.write(f"{worker}: running jobs with concurrency {concurrency}")
+        ran = 0
+        active = set()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not stopping.is_set():
+                active = {f for f in active if not f.done()}
+                claimed = False
+                while len(active) < concurrency:
+                    job = job_utils.claim(worker, options["kinds"])
+                    if job is None:
+                        break
+                    self.stdout.write(f"{job.kind} {job.job_id} (attempt {job.attempts})")
+                    active.add(pool.submit(job_utils.run_job, job, worker))
+                    claimed = True
+                    ran += 1
+
+                if options["once"] and not active and not claimed:
+                    break
+                if not claimed:
+                    stopping.wait(options["poll"])
+
+        self.stdout.write(f"{worker}: {ran} job(s) run")
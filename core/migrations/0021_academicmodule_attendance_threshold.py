@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_mentorpassword'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academicmodule',
+            name='attendance_threshold',
+            field=models.FloatField(default=80),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-17 10:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_academicmodule_attendance_threshold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('attendance', 'Attendance'), ('result', 'Result')], max_length=20)),
+                ('scope', models.CharField(max_length=80)),
+                ('sha256', models.CharField(max_length=64)),
+                ('state', models.CharField(blank=True, max_length=64)),
+                ('summary', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_fingerprints', to='core.academicmodule')),
+            ],
+            options={
+                'unique_together': {('module', 'kind', 'scope')},
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 6.0.2 on 2026-10-17 12:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_importfingerprint'),
+    ]
+
+    operations = [
+        migrations.RenameModel(
+            old_name='ResultUploadJob',
+            new_name='BackgroundJob',
+        ),
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='module',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='background_jobs', to='core.academicmodule'),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('result_upload', 'Result upload'), ('student_import', 'Student import'), ('attendance_import', 'Attendance import'), ('attendance_batch', 'Attendance batch import'), ('practical_import', 'Practical marks import')], default='result_upload', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='params',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='max_attempts',
+            field=models.IntegerField(default=3),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='run_after',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='worker',
+            field=models.CharField(blank=True, max_length=120),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='lease_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='backgroundjob',
+            index=models.Index(fields=['status', 'run_after'], name='backgroundjob_claim_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.2 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academicmodule',
+            name='result_generation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resultupload',
+            name='generation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resultupload',
+            unique_together={('module', 'test_name', 'subject', 'generation')},
+        ),
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='kind',
+            field=models.CharField(choices=[('result_upload', 'Result upload'), ('student_import', 'Student import'), ('attendance_import', 'Attendance import'), ('attendance_batch', 'Attendance batch import'), ('practical_import', 'Practical marks import'), ('result_gc', 'Old result generation cleanup')], default='result_upload', max_length=40),
+        ),
+    ]
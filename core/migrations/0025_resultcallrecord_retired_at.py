@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_result_generations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultcallrecord',
+            name='retired_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
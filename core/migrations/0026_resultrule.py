@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-17 13:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_resultcallrecord_retired_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('test_name', models.CharField(choices=[('T1', 'T1'), ('T2', 'T2'), ('T3', 'T3'), ('T4', 'T4'), ('REMEDIAL', 'REMEDIAL')], max_length=20)),
+                ('current_below', models.FloatField()),
+                ('total_below', models.FloatField()),
+                ('needs_total', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_rules', to='core.academicmodule')),
+            ],
+            options={
+                'unique_together': {('module', 'test_name')},
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 6.0.2 on 2026-10-17 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_stats(apps, schema_editor):
+    Attendance = apps.get_model("core", "Attendance")
+    CallRecord = apps.get_model("core", "CallRecord")
+    MentorWeekStats = apps.get_model("core", "MentorWeekStats")
+    key = ("student__module_id", "student__mentor_id", "week_no")
+
+    cells = {}
+    for row in Attendance.objects.filter(call_required=True).values(*key).annotate(need_call=Count("id")).order_by():
+        cells.setdefault(tuple(row[k] for k in key), {})["need_call"] = row["need_call"]
+    for row in CallRecord.objects.values(*key).annotate(
+        calls=Count("id"),
+        received=Count("id", filter=Q(final_status="received")),
+        not_received=Count("id", filter=Q(final_status="not_received")),
+        msg_sent=Count("id", filter=Q(message_sent=True)),
+    ).order_by():
+        cells.setdefault(tuple(row[k] for k in key), {}).update(
+            {k: row[k] for k in ("calls", "received", "not_received", "msg_sent")}
+        )
+
+    MentorWeekStats.objects.bulk_create(
+        [
+            MentorWeekStats(module_id=module_id, mentor_id=mentor_id, week_no=week_no, **counts)
+            for (module_id, mentor_id, week_no), counts in cells.items()
+        ],
+        batch_size=500,
+    )
+
+
+def noop_reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MentorWeekStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_no', models.IntegerField()),
+                ('need_call', models.IntegerField(default=0)),
+                ('calls', models.IntegerField(default=0)),
+                ('received', models.IntegerField(default=0)),
+                ('not_received', models.IntegerField(default=0)),
+                ('msg_sent', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('mentor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.mentor')),
+                ('module', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentor_week_stats', to='core.academicmodule')),
+            ],
+            options={
+                'unique_together': {('module', 'mentor', 'week_no')},
+            },
+        ),
+        migrations.RunPython(fill_stats, noop_reverse),
+    ]
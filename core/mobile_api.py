@@ -2,22 +2,25 @@ import json
 import secrets
 from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.core import signing
-from django.db.models import Count
+from django.db import transaction
 from django.db.models import Q
 from django.http import JsonResponse
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from . import import_utils, job_utils, report_utils, rule_utils, stats_utils, upload_utils
 from .module_utils import is_superadmin_user
-from .attendance_utils import import_attendance
-from .result_utils import import_compiled_bulk_all, import_compiled_result_sheet, import_result_sheet
+from .attendance_utils import SheetParseError
 from .models import (
     AcademicModule,
     Attendance,
+    BackgroundJob,
     CallRecord,
+    ChunkedUpload,
     CoordinatorModuleAccess,
     Mentor,
     MentorAuthToken,
@@ -28,7 +31,6 @@ from .models import (
     StudentResult,
     Student,
 )
-from .utils import import_students_from_excel
 from .utils import resolve_mentor_identity
 
 
@@ -329,89 +331,6 @@ def api_mobile_staff_attendance(request):
     return JsonResponse({"ok": True, "module_id": module.id, "week": week_no, "rows": rows})
 
 
-def _staff_result_thresholds(test_name):
-    test = (test_name or "").upper()
-    if test == "T1":
-        return 9, 9
-    if test == "T2":
-        return 9, 18
-    if test == "T3":
-        return 9, 27
-    if test == "T4":
-        return 18, 35
-    return 35, 35
-
-
-def _staff_process_result_upload(module, username, test_name, subject_id, upload_mode, bulk_confirm, file_obj):
-    is_all_tests = test_name == "ALL_EXAMS"
-    is_all_subjects = str(subject_id).upper() == "ALL"
-
-    if is_all_tests and is_all_subjects:
-        summary = import_compiled_bulk_all(
-            file_obj,
-            username,
-            module=module,
-            progress_cb=None,
-            cancel_cb=None,
-        )
-        return {
-            "ok": True,
-            "msg": (
-                f"Bulk replace completed. Created uploads: {summary['uploads_created']}. "
-                f"Rows matched: {summary['rows_matched']}. Failed calls: {summary['rows_failed']}."
-            ),
-            "test_name": "ALL_EXAMS",
-            "subject_name": "ALL",
-            "upload_id": "",
-            "mentor_stats": [],
-            "total_calls": summary["rows_failed"],
-            "upload_mode": upload_mode,
-            "found_subjects": summary.get("found_subjects", []),
-            "used_subject": "ALL",
-        }
-
-    subject = Subject.objects.filter(id=subject_id, module=module, is_active=True).first()
-    if not subject:
-        raise Exception("Invalid subject")
-    if subject.result_format == Subject.FORMAT_T4_ONLY and test_name != "T4":
-        raise Exception("This subject is configured as Only T4. Please upload in T4.")
-
-    upload, _ = ResultUpload.objects.update_or_create(
-        module=module,
-        test_name=test_name,
-        subject=subject,
-        defaults={"uploaded_by": username},
-    )
-
-    if upload_mode == "compiled":
-        summary = import_compiled_result_sheet(file_obj, upload, progress_cb=None, cancel_cb=None)
-    else:
-        summary = import_result_sheet(file_obj, upload, progress_cb=None, cancel_cb=None)
-
-    mentor_stats = list(
-        ResultCallRecord.objects.filter(upload=upload)
-        .values("student__mentor__name")
-        .annotate(total=Count("id"))
-        .order_by("student__mentor__name")
-    )
-    total_calls = sum(m["total"] for m in mentor_stats)
-    return {
-        "ok": True,
-        "msg": (
-            f"Result uploaded: {upload.test_name} - {upload.subject.name}. "
-            f"Rows total: {summary['rows_total']}, matched: {summary['rows_matched']}, failed: {summary['rows_failed']}."
-        ),
-        "test_name": upload.test_name,
-        "subject_name": upload.subject.name,
-        "upload_id": upload.id,
-        "mentor_stats": mentor_stats,
-        "total_calls": total_calls,
-        "upload_mode": upload_mode,
-        "found_subjects": summary.get("found_subjects", []),
-        "used_subject": summary.get("used_subject", upload.subject.name),
-    }
-
-
 @require_http_methods(["GET"])
 def api_mobile_staff_result_cycles(request):
     user, role = _auth_staff(request)
@@ -422,7 +341,7 @@ def api_mobile_staff_result_cycles(request):
         return JsonResponse({"ok": True, "cycles": [], "latest_upload_id": None, "module_id": None})
 
     uploads = (
-        ResultUpload.objects.filter(module=module)
+        ResultUpload.objects.live().filter(module=module)
         .select_related("subject")
         .order_by("-uploaded_at")
     )
@@ -454,13 +373,13 @@ def api_mobile_staff_result_rows(request):
     upload_id = request.GET.get("upload_id")
     upload = None
     if upload_id:
-        upload = ResultUpload.objects.select_related("subject").filter(id=upload_id, module=module).first()
+        upload = ResultUpload.objects.live().select_related("subject").filter(id=upload_id, module=module).first()
     if not upload:
-        upload = ResultUpload.objects.filter(module=module).select_related("subject").order_by("-uploaded_at").first()
+        upload = ResultUpload.objects.live().filter(module=module).select_related("subject").order_by("-uploaded_at").first()
     if not upload:
         return JsonResponse({"ok": True, "rows": [], "upload": None, "module_id": module.id})
 
-    cur_thr, total_thr = _staff_result_thresholds(upload.test_name)
+    rule = rule_utils.rule_for(module, upload.test_name)
     try:
         page = max(int(request.GET.get("page", "1")), 1)
     except Exception:
@@ -481,11 +400,11 @@ def api_mobile_staff_result_rows(request):
             | Q(student__mentor__name__icontains=q)
         )
     if fail_filter == "current":
-        rows_qs = rows_qs.filter(marks_current__lt=cur_thr)
+        rows_qs = rows_qs.filter(rule.q_current())
     elif fail_filter == "total":
-        rows_qs = rows_qs.filter(marks_total__lt=total_thr)
+        rows_qs = rows_qs.filter(rule.q_total())
     elif fail_filter == "either":
-        rows_qs = rows_qs.filter(Q(marks_current__lt=cur_thr) | Q(marks_total__lt=total_thr))
+        rows_qs = rows_qs.filter(rule.q_either())
     rows_qs = rows_qs.order_by("student__roll_no", "student__name")
 
     total = rows_qs.count()
@@ -495,8 +414,8 @@ def api_mobile_staff_result_rows(request):
     has_more = end < total
     rows = []
     for r in rows_qs:
-        current_fail = r.marks_current is not None and r.marks_current < cur_thr
-        total_fail = r.marks_total is not None and r.marks_total < total_thr
+        current_fail = r.marks_current is not None and r.marks_current < rule.current_below
+        total_fail = r.marks_total is not None and r.marks_total < rule.total_below
         either_fail = current_fail or total_fail
         rows.append(
             {
@@ -540,6 +459,17 @@ def api_mobile_staff_result_rows(request):
     )
 
 
+def _staff_report_rows(rows):
+    # the app reads the completion as "completion_percent"
+    for row in rows:
+        row["completion_percent"] = row.pop("percent")
+    return rows
+
+
+def _staff_mentor_names(module):
+    return list(Mentor.objects.filter(student__module=module).distinct().order_by("name").values_list("name", flat=True))
+
+
 @require_http_methods(["GET"])
 def api_mobile_staff_control_summary(request):
     user, role = _auth_staff(request)
@@ -563,62 +493,14 @@ def api_mobile_staff_control_summary(request):
         )
         week_no = weeks[-1] if weeks else None
 
-    mentors = Mentor.objects.filter(student__module=module).distinct().order_by("name")
-    attendance_rows = []
-    for m in mentors:
-        total_students = Student.objects.filter(module=module, mentor=m).count()
-        need_call = (
-            Attendance.objects.filter(
-                week_no=week_no,
-                student__module=module,
-                student__mentor=m,
-                call_required=True,
-            ).count()
-            if week_no
-            else 0
-        )
-        received = (
-            CallRecord.objects.filter(
-                week_no=week_no,
-                student__module=module,
-                student__mentor=m,
-                final_status="received",
-            ).count()
-            if week_no
-            else 0
-        )
-        not_received = (
-            CallRecord.objects.filter(
-                week_no=week_no,
-                student__module=module,
-                student__mentor=m,
-                final_status="not_received",
-            ).count()
-            if week_no
-            else 0
-        )
-        done = received + not_received
-        not_done = max(need_call - done, 0)
-        percent = round((done / need_call) * 100, 1) if need_call else 0
-        attendance_rows.append(
-            {
-                "mentor": m.name,
-                "students": total_students,
-                "need_call": need_call,
-                "done": done,
-                "received": received,
-                "not_received": not_received,
-                "not_done": not_done,
-                "completion_percent": percent,
-            }
-        )
+    attendance_rows = _staff_report_rows(report_utils.mentor_attendance_stats(module, week_no))
 
     upload_id = request.GET.get("upload_id")
     upload = None
     if upload_id:
-        upload = ResultUpload.objects.select_related("subject").filter(id=upload_id, module=module).first()
+        upload = ResultUpload.objects.live().select_related("subject").filter(id=upload_id, module=module).first()
     if not upload:
-        upload = ResultUpload.objects.filter(module=module).select_related("subject").order_by("-uploaded_at").first()
+        upload = ResultUpload.objects.live().filter(module=module).select_related("subject").order_by("-uploaded_at").first()
 
     result_rows = []
     upload_meta = None
@@ -629,25 +511,9 @@ def api_mobile_staff_control_summary(request):
             "subject_name": upload.subject.name,
             "uploaded_at": upload.uploaded_at.isoformat(),
         }
-        for m in mentors:
-            qs = ResultCallRecord.objects.filter(upload=upload, student__module=module, student__mentor=m)
-            need_call = qs.count()
-            received = qs.filter(final_status="received").count()
-            not_received = qs.filter(final_status="not_received").count()
-            done = received + not_received
-            not_done = max(need_call - done, 0)
-            percent = round((done / need_call) * 100, 1) if need_call else 0
-            result_rows.append(
-                {
-                    "mentor": m.name,
-                    "need_call": need_call,
-                    "done": done,
-                    "received": received,
-                    "not_received": not_received,
-                    "not_done": not_done,
-                    "completion_percent": percent,
-                }
-            )
+        result_rows = _staff_report_rows(
+            report_utils.mentor_result_stats(module, upload, mentors=_staff_mentor_names(module))
+        )
 
     return JsonResponse(
         {
@@ -661,6 +527,136 @@ def api_mobile_staff_control_summary(request):
     )
 
 
+def _staff_wants_job(request):
+    # async=1: spool the file, queue the import and answer with a job id
+    return (request.POST.get("async") or "").strip() == "1"
+
+
+def _staff_enqueue(kind, module, user, params=None, files=None):
+    job = job_utils.enqueue(
+        kind,
+        module,
+        params={**(params or {}), "source": "mobile"},
+        files=files,
+        created_by=user.username,
+    )
+    return JsonResponse({"ok": True, "module_id": module.id, "job_id": job.job_id, "status": job.status}, status=202)
+
+
+@require_http_methods(["GET"])
+def api_mobile_staff_job(request, job_id):
+    user, role = _auth_staff(request)
+    if not user:
+        return JsonResponse({"ok": False, "msg": "Unauthorized"}, status=401)
+    module_ids = _staff_modules(user, role).values_list("id", flat=True)
+    payload = job_utils.status_payload(job_id, module_ids)
+    if payload is None:
+        return JsonResponse({"ok": False, "msg": "Job not found"}, status=404)
+    return JsonResponse(payload)
+
+
+# ---------------- RESUMABLE UPLOADS ----------------
+# POST uploads/ {file_name, size, sha256} -> upload_id; PUT uploads/<id>/ with the
+# raw bytes and an Upload-Offset header, repeated until offset == size (GET tells
+# where to resume after a disconnect); POST uploads/<id>/complete/ checks the hash.
+# The upload endpoints then take `<field>_upload_id` in place of the file.
+
+def _chunked_payload(upload):
+    return {
+        "ok": True,
+        "upload_id": upload.upload_id,
+        "file_name": upload.file_name,
+        "size": upload.size,
+        "offset": upload.received,
+        "status": upload.status,
+        "chunk_size": settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    }
+
+
+def _staff_chunked_upload(user, role, upload_id):
+    return ChunkedUpload.objects.filter(
+        upload_id=upload_id, created_by=user.username, module__in=_staff_modules(user, role)
+    ).first()
+
+
+def _staff_attach_chunked(request, user, module, *fields):
+    """
+    Put the completed uploads named by `<field>_upload_id` into request.FILES,
+    so the endpoint validates and imports them like multipart files.
+    Returns an error message, or "".
+    """
+    for field in fields:
+        upload_id = (request.POST.get(f"{field}_upload_id") or "").strip()
+        if not upload_id or field in request.FILES:
+            continue
+        assembled = upload_utils.claim(upload_id, module, user.username)
+        if assembled is None:
+            return f"Upload {upload_id} is not complete, expired or belongs to another module."
+        request.FILES[field] = assembled
+    return ""
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_mobile_staff_chunked_start(request):
+    user, role = _auth_staff(request)
+    if not user:
+        return JsonResponse({"ok": False, "msg": "Unauthorized"}, status=401)
+    module = _resolve_staff_module(request, user, role)
+    if not module:
+        return JsonResponse({"ok": False, "msg": "No module selected"}, status=400)
+
+    body = _json_body(request)
+    try:
+        upload = upload_utils.start(module, user.username, body.get("file_name"), body.get("size"), body.get("sha256"))
+    except Exception as exc:
+        return JsonResponse({"ok": False, "msg": str(exc)}, status=400)
+    return JsonResponse({**_chunked_payload(upload), "module_id": module.id}, status=201)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "PUT"])
+def api_mobile_staff_chunked_upload(request, upload_id):
+    user, role = _auth_staff(request)
+    if not user:
+        return JsonResponse({"ok": False, "msg": "Unauthorized"}, status=401)
+    upload = _staff_chunked_upload(user, role, upload_id)
+    if not upload:
+        return JsonResponse({"ok": False, "msg": "Upload not found"}, status=404)
+    if request.method == "GET":
+        return JsonResponse(_chunked_payload(upload))
+
+    try:
+        offset = int(request.headers.get("Upload-Offset") or request.GET.get("offset") or "")
+        length = int(request.META.get("CONTENT_LENGTH") or "0")
+    except ValueError:
+        return JsonResponse({"ok": False, "msg": "Upload-Offset header is required"}, status=400)
+    try:
+        # request.read() streams the body; request.body would cap it at DATA_UPLOAD_MAX_MEMORY_SIZE
+        upload_utils.append(upload, offset, request, length)
+    except upload_utils.UploadOffsetError as exc:
+        return JsonResponse({"ok": False, "msg": str(exc), "offset": exc.offset}, status=409)
+    except Exception as exc:
+        return JsonResponse({"ok": False, "msg": str(exc), "offset": upload.received}, status=400)
+    return JsonResponse(_chunked_payload(upload))
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_mobile_staff_chunked_complete(request, upload_id):
+    user, role = _auth_staff(request)
+    if not user:
+        return JsonResponse({"ok": False, "msg": "Unauthorized"}, status=401)
+    upload = _staff_chunked_upload(user, role, upload_id)
+    if not upload:
+        return JsonResponse({"ok": False, "msg": "Upload not found"}, status=404)
+    try:
+        upload_utils.complete(upload)
+    except Exception as exc:
+        return JsonResponse({**_chunked_payload(upload), "ok": False, "msg": str(exc)}, status=400)
+    return JsonResponse({**_chunked_payload(upload), "msg": "Upload complete."})
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_mobile_staff_upload_students(request):
@@ -670,24 +666,19 @@ def api_mobile_staff_upload_students(request):
     module = _resolve_staff_module(request, user, role)
     if not module:
         return JsonResponse({"ok": False, "msg": "No module selected"}, status=400)
+    error = _staff_attach_chunked(request, user, module, "file")
+    if error:
+        return JsonResponse({"ok": False, "msg": error}, status=400)
 
     f = request.FILES.get("file")
     if not f:
         return JsonResponse({"ok": False, "msg": "File is required"}, status=400)
 
+    if _staff_wants_job(request):
+        return _staff_enqueue(BackgroundJob.KIND_STUDENT_IMPORT, module, user, files={"file": f})
+
     try:
-        added, updated, skipped, skipped_rows = import_students_from_excel(f, module)
-        return JsonResponse(
-            {
-                "ok": True,
-                "module_id": module.id,
-                "added": added,
-                "updated": updated,
-                "skipped": skipped,
-                "skipped_rows": skipped_rows[:50],
-                "msg": f"Added: {added} | Updated: {updated} | Skipped: {skipped}",
-            }
-        )
+        return JsonResponse(import_utils.staff_students_payload(module, f))
     except Exception as exc:
         return JsonResponse({"ok": False, "msg": str(exc)}, status=400)
 
@@ -702,7 +693,9 @@ def api_mobile_staff_clear_students(request):
     if not module:
         return JsonResponse({"ok": False, "msg": "No module selected"}, status=400)
 
-    deleted_count, _ = Student.objects.filter(module=module).delete()
+    with transaction.atomic():
+        deleted_count, _ = Student.objects.filter(module=module).delete()
+        stats_utils.refresh(module.id)
     return JsonResponse(
         {
             "ok": True,
@@ -722,6 +715,9 @@ def api_mobile_staff_upload_attendance(request):
     module = _resolve_staff_module(request, user, role)
     if not module:
         return JsonResponse({"ok": False, "msg": "No module selected"}, status=400)
+    error = _staff_attach_chunked(request, user, module, "weekly_file", "overall_file")
+    if error:
+        return JsonResponse({"ok": False, "msg": error}, status=400)
 
     try:
         week_no = int(request.POST.get("week") or "0")
@@ -741,26 +737,19 @@ def api_mobile_staff_upload_attendance(request):
     if week_no == 1:
         overall_file = None
 
-    try:
-        count = import_attendance(weekly_file, overall_file, week_no, module, rule)
-        mentor_stats = list(
-            CallRecord.objects.filter(week_no=week_no, student__module=module)
-            .values("student__mentor__name")
-            .annotate(total=Count("id"))
-            .order_by("student__mentor__name")
-        )
-        total_calls = sum(m["total"] for m in mentor_stats)
-        return JsonResponse(
-            {
-                "ok": True,
-                "module_id": module.id,
-                "week": week_no,
-                "created_calls": count,
-                "mentor_stats": mentor_stats,
-                "total_calls": total_calls,
-                "msg": f"{count} students require follow-up calls for Week {week_no}",
-            }
+    if _staff_wants_job(request):
+        return _staff_enqueue(
+            BackgroundJob.KIND_ATTENDANCE_IMPORT,
+            module,
+            user,
+            params={"week": week_no, "rule": rule},
+            files={"weekly_file": weekly_file, "overall_file": overall_file},
         )
+
+    try:
+        return JsonResponse(import_utils.staff_attendance_payload(module, week_no, rule, weekly_file, overall_file))
+    except SheetParseError as exc:
+        return JsonResponse({"ok": False, "msg": str(exc), "errors": exc.errors}, status=400)
     except Exception as exc:
         return JsonResponse({"ok": False, "msg": str(exc)}, status=400)
 
@@ -790,50 +779,7 @@ def api_mobile_staff_attendance_report(request):
     if not week_no:
         return JsonResponse({"ok": True, "module_id": module.id, "rows": [], "week": None})
 
-    mentors = Mentor.objects.filter(student__module=module).distinct().order_by("name")
-    rows = []
-    for m in mentors:
-        total_students = Student.objects.filter(module=module, mentor=m).count()
-        need_call = Attendance.objects.filter(
-            week_no=week_no,
-            student__module=module,
-            student__mentor=m,
-            call_required=True,
-        ).count()
-        received = CallRecord.objects.filter(
-            week_no=week_no,
-            student__module=module,
-            student__mentor=m,
-            final_status="received",
-        ).count()
-        not_received = CallRecord.objects.filter(
-            week_no=week_no,
-            student__module=module,
-            student__mentor=m,
-            final_status="not_received",
-        ).count()
-        done = received + not_received
-        not_done = max(need_call - done, 0)
-        msg_sent = CallRecord.objects.filter(
-            week_no=week_no,
-            student__module=module,
-            student__mentor=m,
-            message_sent=True,
-        ).count()
-        percent = round((done / need_call) * 100, 1) if need_call else 0
-        rows.append(
-            {
-                "mentor": m.name,
-                "students": total_students,
-                "need_call": need_call,
-                "done": done,
-                "received": received,
-                "not_received": not_received,
-                "not_done": not_done,
-                "msg_sent": msg_sent,
-                "completion_percent": percent,
-            }
-        )
+    rows = _staff_report_rows(report_utils.mentor_attendance_stats(module, week_no))
     return JsonResponse({"ok": True, "module_id": module.id, "week": week_no, "rows": rows})
 
 
@@ -849,35 +795,13 @@ def api_mobile_staff_result_report(request):
     upload_id = request.GET.get("upload_id")
     upload = None
     if upload_id:
-        upload = ResultUpload.objects.select_related("subject").filter(id=upload_id, module=module).first()
+        upload = ResultUpload.objects.live().select_related("subject").filter(id=upload_id, module=module).first()
     if not upload:
-        upload = ResultUpload.objects.filter(module=module).select_related("subject").order_by("-uploaded_at").first()
+        upload = ResultUpload.objects.live().filter(module=module).select_related("subject").order_by("-uploaded_at").first()
     if not upload:
         return JsonResponse({"ok": True, "module_id": module.id, "rows": [], "upload": None})
 
-    mentors = Mentor.objects.filter(student__module=module).distinct().order_by("name")
-    rows = []
-    for m in mentors:
-        qs = ResultCallRecord.objects.filter(upload=upload, student__module=module, student__mentor=m)
-        need_call = qs.count()
-        received = qs.filter(final_status="received").count()
-        not_received = qs.filter(final_status="not_received").count()
-        done = received + not_received
-        not_done = max(need_call - done, 0)
-        msg_sent = qs.filter(message_sent=True).count()
-        percent = round((done / need_call) * 100, 1) if need_call else 0
-        rows.append(
-            {
-                "mentor": m.name,
-                "need_call": need_call,
-                "done": done,
-                "received": received,
-                "not_received": not_received,
-                "not_done": not_done,
-                "msg_sent": msg_sent,
-                "completion_percent": percent,
-            }
-        )
+    rows = _staff_report_rows(report_utils.mentor_result_stats(module, upload, mentors=_staff_mentor_names(module)))
     return JsonResponse(
         {
             "ok": True,
@@ -928,6 +852,9 @@ def api_mobile_staff_upload_results(request):
     module = _resolve_staff_module(request, user, role)
     if not module:
         return JsonResponse({"ok": False, "msg": "No module selected"}, status=400)
+    error = _staff_attach_chunked(request, user, module, "result_file")
+    if error:
+        return JsonResponse({"ok": False, "msg": error}, status=400)
 
     test_name = (request.POST.get("test_name") or "").strip().upper()
     subject_id = (request.POST.get("subject_id") or "").strip()
@@ -951,14 +878,26 @@ def api_mobile_staff_upload_results(request):
     if test_name == "ALL_EXAMS" and bulk_confirm != "yes":
         return JsonResponse({"ok": False, "msg": "Bulk upload requires confirmation (bulk_confirm=yes)"}, status=400)
 
+    if _staff_wants_job(request):
+        return _staff_enqueue(
+            BackgroundJob.KIND_RESULT_UPLOAD,
+            module,
+            user,
+            params={
+                "test_name": test_name,
+                "subject_id": subject_id,
+                "upload_mode": upload_mode,
+            },
+            files={"result_file": result_file},
+        )
+
     try:
-        payload = _staff_process_result_upload(
+        payload = import_utils.process_result_upload(
             module=module,
             username=user.username,
             test_name=test_name,
             subject_id=subject_id,
             upload_mode=upload_mode,
-            bulk_confirm=bulk_confirm,
             file_obj=result_file,
         )
         payload["module_id"] = module.id
@@ -1114,18 +1053,8 @@ def _attendance_map(mentor, week_no, module):
 
 
 def _result_report_text(upload, mentor_name, total, received, not_received, message_done):
-    test_name = upload.test_name
     subject_name = upload.subject.name
-    if test_name == "T1":
-        rule = "Less than 9 marks in T1"
-    elif test_name == "T2":
-        rule = "Less than 9 marks in T2 & less than 18 in (T1+T2)"
-    elif test_name == "T3":
-        rule = "Less than 9 marks in T3 & less than 27 in (T1+T2+T3)"
-    elif test_name == "T4":
-        rule = "Less than 18 marks in SEE & less than 35 in (T1+T2+T3+SEE)"
-    else:
-        rule = "Less than 35 marks in REMEDIAL"
+    rule = rule_utils.rule_for(upload.module, upload.test_name).reason
 
     return (
         f"📞Phone call done regarding failed in {subject_name} ({rule})\n"
@@ -1336,7 +1265,7 @@ def api_mobile_save_call(request):
     elif status == "not_received":
         call.final_status = "not_received"
 
-    call.save()
+    stats_utils.save_call(call)
     return JsonResponse({"ok": True})
 
 
@@ -1360,7 +1289,7 @@ def api_mobile_mark_message(request):
     if not call:
         return JsonResponse({"ok": False, "msg": "Call not found"}, status=404)
     call.message_sent = True
-    call.save(update_fields=["message_sent"])
+    stats_utils.save_call(call, update_fields=["message_sent"])
     return JsonResponse({"ok": True})
 
 
@@ -1424,7 +1353,7 @@ def api_mobile_result_cycles(request):
         return JsonResponse({"ok": True, "cycles": [], "latest_upload_id": None, "module_id": None})
 
     uploads = (
-        ResultUpload.objects.filter(module=module, calls__student__mentor=mentor, calls__student__module=module)
+        ResultUpload.objects.live().filter(module=module, calls__student__mentor=mentor, calls__student__module=module, calls__retired_at__isnull=True)
         .select_related("subject")
         .distinct()
         .order_by("-uploaded_at")
@@ -1456,10 +1385,10 @@ def api_mobile_result_calls(request):
     upload_id = request.GET.get("upload_id")
     upload = None
     if upload_id:
-        upload = ResultUpload.objects.select_related("subject").filter(id=upload_id, module=module).first()
+        upload = ResultUpload.objects.live().select_related("subject").filter(id=upload_id, module=module).first()
     if not upload:
         upload = (
-            ResultUpload.objects.filter(module=module, calls__student__mentor=mentor, calls__student__module=module)
+            ResultUpload.objects.live().filter(module=module, calls__student__mentor=mentor, calls__student__module=module, calls__retired_at__isnull=True)
             .select_related("subject")
             .distinct()
             .order_by("-uploaded_at")
@@ -1606,7 +1535,7 @@ def api_mobile_result_retry_list(request):
     upload_id = request.GET.get("upload_id")
     upload = None
     if upload_id:
-        upload = ResultUpload.objects.select_related("subject").filter(id=upload_id, module=module).first()
+        upload = ResultUpload.objects.live().select_related("subject").filter(id=upload_id, module=module).first()
     if not upload:
         return JsonResponse({"ok": True, "records": [], "module_id": module.id})
 
@@ -1651,10 +1580,10 @@ def api_mobile_result_report(request):
     upload_id = request.GET.get("upload_id")
     upload = None
     if upload_id:
-        upload = ResultUpload.objects.select_related("subject").filter(id=upload_id, module=module).first()
+        upload = ResultUpload.objects.live().select_related("subject").filter(id=upload_id, module=module).first()
     if not upload:
         upload = (
-            ResultUpload.objects.filter(module=module, calls__student__mentor=mentor, calls__student__module=module)
+            ResultUpload.objects.live().filter(module=module, calls__student__mentor=mentor, calls__student__module=module, calls__retired_at__isnull=True)
             .select_related("subject")
             .distinct()
             .order_by("-uploaded_at")
@@ -35,6 +35,9 @@ class AcademicModule(models.Model):
     year_level = models.CharField(max_length=10, choices=YEAR_CHOICES, default="FY")
     variant = models.CharField(max_length=20, choices=VARIANT_CHOICES, default="FY2-CE")
     semester = models.CharField(max_length=10, choices=SEM_CHOICES, default="Sem-1")
+    attendance_threshold = models.FloatField(default=80)
+    # ResultUpload generation readers see; bulk replace stages the next one and flips this
+    result_generation = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -265,6 +268,41 @@ class SifMarksLock(models.Model):
         return f"SIF Marks Lock ({self.module.name}) = {self.locked}"
 
 
+class ResultRule(models.Model):
+    """Per-module override of the fail thresholds of one test (defaults live in rule_utils)."""
+
+    module = models.ForeignKey(AcademicModule, on_delete=models.CASCADE, related_name="result_rules")
+    test_name = models.CharField(max_length=20, choices=TEST_CHOICES)
+    current_below = models.FloatField()
+    total_below = models.FloatField()
+    # False: the current-test mark alone decides (T1, REMEDIAL)
+    needs_total = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("module", "test_name")
+
+    def __str__(self):
+        return f"{self.module.name} {self.test_name}: <{self.current_below:g} / <{self.total_below:g}"
+
+
+class ResultUploadQuerySet(models.QuerySet):
+    def live(self):
+        """Uploads of the module's current generation (hides staged and retired ones)."""
+        return self.filter(generation=models.F("module__result_generation"))
+
+
+class UploadRowQuerySet(models.QuerySet):
+    def live(self):
+        return self.filter(upload__generation=models.F("upload__module__result_generation"))
+
+
+class ResultCallManager(models.Manager.from_queryset(UploadRowQuerySet)):
+    # calls retired by a re-upload (student no longer failing) stay out of every list
+    def get_queryset(self):
+        return super().get_queryset().filter(retired_at__isnull=True)
+
+
 class ResultUpload(models.Model):
     module = models.ForeignKey(AcademicModule, on_delete=models.CASCADE, related_name="result_uploads")
     test_name = models.CharField(max_length=20, choices=TEST_CHOICES)
@@ -274,9 +312,12 @@ class ResultUpload(models.Model):
     rows_total = models.IntegerField(default=0)
     rows_matched = models.IntegerField(default=0)
     rows_failed = models.IntegerField(default=0)
+    generation = models.IntegerField(default=0)
+
+    objects = ResultUploadQuerySet.as_manager()
 
     class Meta:
-        unique_together = ("module", "test_name", "subject")
+        unique_together = ("module", "test_name", "subject", "generation")
         ordering = ["-uploaded_at"]
 
     def __str__(self):
@@ -299,6 +340,8 @@ class StudentResult(models.Model):
     fail_flag = models.BooleanField(default=False)
     fail_reason = models.CharField(max_length=255, blank=True)
 
+    objects = UploadRowQuerySet.as_manager()
+
     class Meta:
         unique_together = ("upload", "student")
 
@@ -335,6 +378,10 @@ class ResultCallRecord(models.Model):
     fail_reason = models.CharField(max_length=255, blank=True)
     marks_current = models.FloatField(default=0)
     marks_total = models.FloatField(null=True, blank=True)
+    retired_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ResultCallManager()
+    all_objects = UploadRowQuerySet.as_manager()
 
     class Meta:
         unique_together = ("upload", "student")
@@ -396,7 +443,7 @@ class OtherCallRecord(models.Model):
         return f"Other Call - {self.student.enrollment}"
 
 
-class ResultUploadJob(models.Model):
+class BackgroundJob(models.Model):
     STATUS_QUEUED = "queued"
     STATUS_RUNNING = "running"
     STATUS_COMPLETED = "completed"
@@ -409,10 +456,28 @@ class ResultUploadJob(models.Model):
         (STATUS_FAILED, "Failed"),
         (STATUS_CANCELLED, "Cancelled"),
     ]
+    ACTIVE_STATUSES = [STATUS_QUEUED, STATUS_RUNNING]
+
+    KIND_RESULT_UPLOAD = "result_upload"
+    KIND_STUDENT_IMPORT = "student_import"
+    KIND_ATTENDANCE_IMPORT = "attendance_import"
+    KIND_ATTENDANCE_BATCH = "attendance_batch"
+    KIND_PRACTICAL_IMPORT = "practical_import"
+    KIND_RESULT_GC = "result_gc"
+    KIND_CHOICES = [
+        (KIND_RESULT_UPLOAD, "Result upload"),
+        (KIND_STUDENT_IMPORT, "Student import"),
+        (KIND_ATTENDANCE_IMPORT, "Attendance import"),
+        (KIND_ATTENDANCE_BATCH, "Attendance batch import"),
+        (KIND_PRACTICAL_IMPORT, "Practical marks import"),
+        (KIND_RESULT_GC, "Old result generation cleanup"),
+    ]
 
     job_id = models.CharField(max_length=64, unique=True, db_index=True)
-    module = models.ForeignKey(AcademicModule, on_delete=models.CASCADE, related_name="result_upload_jobs")
+    kind = models.CharField(max_length=40, choices=KIND_CHOICES, default=KIND_RESULT_UPLOAD)
+    module = models.ForeignKey(AcademicModule, on_delete=models.CASCADE, related_name="background_jobs")
     created_by = models.CharField(max_length=120, blank=True)
+    params = models.JSONField(default=dict, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
     message = models.TextField(blank=True)
     progress_current = models.IntegerField(default=0)
@@ -421,11 +486,88 @@ class ResultUploadJob(models.Model):
     current_student_name = models.CharField(max_length=150, blank=True)
     cancel_requested = models.BooleanField(default=False)
     result_payload = models.JSONField(default=dict, blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=120, blank=True)
+    lease_until = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at", "-id"]
+        indexes = [models.Index(fields=["status", "run_after"], name="backgroundjob_claim_idx")]
+
+    def __str__(self):
+        return f"BackgroundJob {self.kind} {self.job_id} ({self.status})"
+
+
+class ImportFingerprint(models.Model):
+    KIND_ATTENDANCE = "attendance"
+    KIND_RESULT = "result"
+    KIND_CHOICES = [
+        (KIND_ATTENDANCE, "Attendance"),
+        (KIND_RESULT, "Result"),
+    ]
+
+    module = models.ForeignKey(AcademicModule, on_delete=models.CASCADE, related_name="import_fingerprints")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    scope = models.CharField(max_length=80)
+    sha256 = models.CharField(max_length=64)
+    state = models.CharField(max_length=64, blank=True)
+    summary = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("module", "kind", "scope")
+
+    def __str__(self):
+        return f"{self.kind} {self.scope} ({self.module.name})"
+
+
+class ChunkedUpload(models.Model):
+    """A file sent in pieces by the mobile app; the bytes live under CHUNKED_UPLOAD_DIR."""
+
+    STATUS_UPLOADING = "uploading"
+    STATUS_COMPLETE = "complete"
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, "Uploading"),
+        (STATUS_COMPLETE, "Complete"),
+    ]
+
+    upload_id = models.CharField(max_length=64, unique=True, db_index=True)
+    module = models.ForeignKey(AcademicModule, on_delete=models.CASCADE, related_name="chunked_uploads")
+    created_by = models.CharField(max_length=120, blank=True)
+    file_name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"ChunkedUpload {self.file_name} {self.received}/{self.size} ({self.status})"
+
+
+class MentorWeekStats(models.Model):
+    """Follow-up counters of one mentor's students for one week, kept in step by stats_utils."""
+
+    module = models.ForeignKey(AcademicModule, on_delete=models.CASCADE, related_name="mentor_week_stats")
+    mentor = models.ForeignKey(Mentor, on_delete=models.CASCADE)
+    week_no = models.IntegerField()
+    need_call = models.IntegerField(default=0)
+    calls = models.IntegerField(default=0)
+    received = models.IntegerField(default=0)
+    not_received = models.IntegerField(default=0)
+    msg_sent = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("module", "mentor", "week_no")
 
     def __str__(self):
-        return f"ResultUploadJob {self.job_id} ({self.status})"
+        return f"{self.mentor.name} - Week {self.week_no} ({self.module.name})"
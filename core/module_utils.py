@@ -58,7 +58,8 @@ def get_current_module(request):
     if not module and getattr(request, "user", None) and is_superadmin_user(request.user):
         module = get_or_create_default_module()
 
-    if module:
+    # only write the session when it changes (every write takes the DB write lock on SQLite)
+    if module and request.session.get("current_module_id") != module.id:
         request.session["current_module_id"] = module.id
     return module
 
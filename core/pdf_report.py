@@ -5,6 +5,7 @@ from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
 
+from . import rule_utils
 from .models import (
     Attendance,
     CallRecord,
@@ -62,19 +63,6 @@ def _subject_order_key(subject_name):
     return 99
 
 
-def _result_thresholds(test_name):
-    test_name = (test_name or "").upper()
-    if test_name == "T1":
-        return 9, 9
-    if test_name == "T2":
-        return 9, 18
-    if test_name == "T3":
-        return 9, 27
-    if test_name == "T4":
-        return 18, 35
-    return 35, 35
-
-
 def _split_attendance_remarks(raw_text):
     text = (raw_text or "").strip()
     if "PARENT::" in text and "||FACULTY::" in text:
@@ -183,7 +171,7 @@ def _fmt_mark(v):
 
 def _latest_student_result(student, subject):
     upload = (
-        ResultUpload.objects.filter(module=student.module, subject=subject)
+        ResultUpload.objects.live().filter(module=student.module, subject=subject)
         .order_by("-uploaded_at")
         .first()
     )
@@ -300,7 +288,7 @@ def generate_student_pdf(response, student):
         "Faculty Name & Sign",
     ]
     result_data = [[_p(x, h_style) for x in result_headers]]
-    result_calls_qs = ResultCallRecord.objects.filter(student=student, final_status__isnull=False).select_related(
+    result_calls_qs = ResultCallRecord.objects.live().filter(student=student, final_status__isnull=False).select_related(
         "upload", "upload__subject"
     )
     result_calls = sorted(
@@ -494,9 +482,11 @@ def generate_student_prefilled_pdf(response, student):
     ]
     attendance_data = [[_p(x, h_style) for x in attendance_headers]]
     rows = Attendance.objects.filter(student=student).order_by("week_no")
+    # same cut-off as the SIF screen
+    threshold = student.module.attendance_threshold
     sr = 1
     for a in rows:
-        if a.week_percentage >= 80 and a.overall_percentage >= 80:
+        if a.week_percentage >= threshold and a.overall_percentage >= threshold:
             continue
         percent = f"W:{round(a.week_percentage, 2)} / O:{round(a.overall_percentage, 2)}"
         attendance_data.append(
@@ -537,7 +527,7 @@ def generate_student_prefilled_pdf(response, student):
         "Faculty Name & Sign",
     ]
     result_data = [[_p(x, h_style) for x in result_headers]]
-    result_rows_qs = StudentResult.objects.filter(student=student).select_related("upload", "upload__subject")
+    result_rows_qs = StudentResult.objects.live().filter(student=student).select_related("upload", "upload__subject")
     result_rows = sorted(
         result_rows_qs,
         key=lambda r: (
@@ -548,14 +538,13 @@ def generate_student_prefilled_pdf(response, student):
         ),
     )
 
+    rules = rule_utils.rules_for(student.module)
     sr = 1
     for r in result_rows:
         if not r.upload:
             continue
-        cur_thr, total_thr = _result_thresholds(r.upload.test_name)
-        current_fail = r.marks_current is not None and r.marks_current < cur_thr
-        total_fail = r.marks_total is not None and r.marks_total < total_thr
-        if not (current_fail or total_fail):
+        rule = rules.get(r.upload.test_name) or rules["REMEDIAL"]
+        if not rule.below_either(r.marks_current, r.marks_total):
             continue
 
         exam = _exam_name_for_pdf(r.upload.test_name)
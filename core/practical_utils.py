@@ -1,7 +1,9 @@
 import pandas as pd
 from django.db import transaction
 
+from . import workbook
 from .models import PracticalMarkUpload, Student, StudentPracticalMark, Subject
+from .preview_utils import SAMPLE_SIZE
 
 
 def _norm(text):
@@ -20,13 +22,11 @@ def _to_float_or_none(val):
         return None
 
 
-def _find_header_row(raw):
-    for i in range(len(raw)):
-        row = [str(x).strip().lower() for x in raw.iloc[i].tolist()]
-        joined = " ".join(row)
-        if "sr" in joined and "no" in joined and ("enroll" in joined or "enrollment" in joined):
-            return i
-    return None
+def _find_header_row(rows):
+    return workbook.find_header_row(
+        rows,
+        lambda joined: "sr" in joined and "no" in joined and ("enroll" in joined or "enrollment" in joined),
+    )
 
 
 def _find_col_idx(columns, tokens):
@@ -67,19 +67,50 @@ def _subject_key_candidates(subject):
     return {x for x in out if x}
 
 
-def _match_subject_by_text(text, subjects):
-    key = _norm(text)
-    if not key:
-        return None
-    for s in subjects:
-        keys = _subject_key_candidates(s)
-        if any(k == key for k in keys):
-            return s
-    for s in subjects:
-        keys = _subject_key_candidates(s)
-        if any((k and (k in key or key in k)) for k in keys):
-            return s
-    return None
+class SubjectIndex:
+    """
+    Normalized alias -> subjects of a module, built once per import.
+
+    Header and title lookups go through the index instead of re-expanding
+    every subject's aliases; `subjects` keeps the module's subject order,
+    which decides between several matches.
+    """
+
+    def __init__(self, subjects):
+        self.subjects = list(subjects)
+        self._order = {s.id: i for i, s in enumerate(self.subjects)}
+        self.keys = {}
+        for s in self.subjects:
+            for key in _subject_key_candidates(s):
+                self.keys.setdefault(key, []).append(s)
+        self._max_len = max((len(k) for k in self.keys), default=0)
+
+    def _sorted(self, found):
+        return sorted(found.values(), key=lambda s: self._order[s.id])
+
+    def containing(self, text):
+        """Subjects having an alias contained in normalized `text`, in subject order."""
+        found = {}
+        for i in range(len(text)):
+            for j in range(i + 1, min(len(text), i + self._max_len) + 1):
+                for s in self.keys.get(text[i:j], ()):
+                    found[s.id] = s
+        return self._sorted(found)
+
+    def match(self, text):
+        key = _norm(text)
+        if not key:
+            return None
+        exact = self.keys.get(key)
+        if exact:
+            return exact[0]
+        found = {s.id: s for s in self.containing(key)}
+        for k, subjects in self.keys.items():
+            if key in k:
+                for s in subjects:
+                    found[s.id] = s
+        ordered = self._sorted(found)
+        return ordered[0] if ordered else None
 
 
 def _subject_priority(subject):
@@ -110,55 +141,67 @@ def ordered_subjects(module):
     return subjects
 
 
-@transaction.atomic
-def import_practical_marks(file_obj, module, uploaded_by=""):
+def _choose_sheet(heads):
+    """Sheet to import, picked from the header rows of every sheet ({name: rows})."""
+    first = next(iter(heads), None)
+    for pname in ["PRACTICLE COMPILED", "PRACTICAL COMPILED"]:
+        if pname in heads:
+            # a compiled sheet without a header row falls back to the first sheet
+            return pname if _find_header_row(heads[pname]) is not None else first
+
+    # auto-pick compiled-like sheet if exact name is not present
+    best = None
+    best_score = -1
+    for sh, raw_sh in heads.items():
+        hr = _find_header_row(raw_sh)
+        if hr is None:
+            continue
+        cols = [workbook.cell_text(x) for x in raw_sh[hr]]
+        pr_count = sum(1 for c in cols if "pr" in _norm(c))
+        pct_count = sum(1 for c in cols if "%" in str(c) or "percent" in _norm(c))
+        score = (pr_count * 10) + pct_count
+        if pr_count >= 2 and score > best_score:
+            best_score = score
+            best = sh
+    return best or first
+
+
+def _clean_enrollment(val):
+    enrollment = str(val).strip()
+    if not enrollment or enrollment.lower() == "nan":
+        return ""
+    if enrollment.endswith(".0"):
+        enrollment = enrollment[:-2]
+    return enrollment
+
+
+def _column(data, idx):
+    if idx is None or idx >= data.shape[1]:
+        return [None] * len(data)
+    return data.iloc[:, idx].tolist()
+
+
+def parse_practical_sheet(file_obj):
+    """Rows of the sheet to import; no DB access, so a preview can cache it."""
     # Prefer a compiled sheet if present in workbook (contains multiple PR/% columns).
-    raw = None
-    try:
-        xls = pd.ExcelFile(file_obj)
-        preferred_names = ["PRACTICLE COMPILED", "PRACTICAL COMPILED"]
-        for pname in preferred_names:
-            if pname in xls.sheet_names:
-                raw = pd.read_excel(xls, sheet_name=pname, header=None)
-                break
-
-        if raw is not None:
-            header_row = _find_header_row(raw)
-            if header_row is None:
-                raise Exception("Header row not found in PRACTICLE COMPILED sheet.")
-
-        if raw is not None:
-            pass
-        else:
-            # auto-pick compiled-like sheet if exact name is not present
-            best = None
-            best_score = -1
-            for sh in xls.sheet_names:
-                raw_sh = pd.read_excel(xls, sheet_name=sh, header=None)
-                hr = _find_header_row(raw_sh)
-                if hr is None:
-                    continue
-                cols = [str(x).strip() for x in raw_sh.iloc[hr].tolist()]
-                pr_count = sum(1 for c in cols if "pr" in _norm(c))
-                pct_count = sum(1 for c in cols if "%" in str(c) or "percent" in _norm(c))
-                score = (pr_count * 10) + pct_count
-                if pr_count >= 2 and score > best_score:
-                    best_score = score
-                    best = raw_sh
-            if best is not None:
-                raw = best
-    except Exception:
-        raw = None
+    # Sheets are scored on their header rows only; just the chosen one is read in full.
+    sheet_name = _choose_sheet(workbook.read_workbook(file_obj, max_rows=workbook.HEADER_SCAN_ROWS))
+    raw = workbook.read_workbook(file_obj, sheets=[sheet_name])[sheet_name] if sheet_name else []
 
-    if raw is None:
-        raw = pd.read_excel(file_obj, header=None)
-    header_row = _find_header_row(raw)
-    if header_row is None:
+    if _find_header_row(raw) is None:
         raise Exception("Header row with 'Sr No' and 'Enrollment Number' not found.")
+    return raw
+
 
-    columns = [str(x).strip() for x in raw.iloc[header_row].tolist()]
-    data = raw.iloc[header_row + 1 :].copy()
-    data.columns = columns[: len(data.columns)]
+def _practical_plan(raw, module):
+    """
+    What importing `raw` would store, without writing: mode, the subject
+    of a subject-wise sheet, marks as (student_id, subject, pr, att),
+    row counters, unknown headers and unmatched enrollments.
+    """
+    header_row = _find_header_row(raw)
+    columns = [workbook.cell_text(x) for x in raw[header_row]]
+    data = workbook.frame(raw, header_row + 1, labels=columns)
     data = data.dropna(how="all")
 
     enrollment_idx = _find_col_idx(columns, ["enroll"])
@@ -169,87 +212,70 @@ def import_practical_marks(file_obj, module, uploaded_by=""):
     if not subjects:
         raise Exception("No subjects configured for selected module. Please add subjects first.")
     subject_map = {s.id: s for s in subjects}
+    index = SubjectIndex(subjects)
 
     # Build column map using SHORTNAME-PR and SHORTNAME-% (combined layout).
-    col_map = {}
+    col_map = {s.id: {"pr": None, "att": None} for s in subjects}
     unknown_headers = []
-    norm_columns = [_norm(c) for c in columns]
-    for s in subjects:
-        keys = _subject_key_candidates(s)
-        pr_idx = None
-        att_idx = None
-        for idx, nc in enumerate(norm_columns):
-            for key in keys:
-                if not key:
-                    continue
-                if (key in nc or nc.startswith(key)) and "pr" in nc:
-                    pr_idx = idx if pr_idx is None else pr_idx
-                if (key in nc or nc.startswith(key)) and (
-                    nc.endswith("percent") or nc.endswith("%") or nc.endswith("pct") or "percent" in nc
-                ):
-                    att_idx = idx if att_idx is None else att_idx
-                if (key in nc or nc.startswith(key)) and ("%" in columns[idx] or "percent" in nc):
-                    att_idx = idx if att_idx is None else att_idx
-        col_map[s.id] = {"pr": pr_idx, "att": att_idx}
-
-    for c in columns:
-        n = _norm(c)
-        if n.endswith("pr") or "%" in c or "percent" in n:
-            matched = False
-            for s in subjects:
-                keys = _subject_key_candidates(s)
-                if any(k and (k in n or n.startswith(k)) for k in keys):
-                    matched = True
-                    break
-            if not matched:
-                unknown_headers.append(c)
+    for idx, c in enumerate(columns):
+        nc = _norm(c)
+        matched = index.containing(nc)
+        is_pr = "pr" in nc
+        is_att = nc.endswith("pct") or "percent" in nc or "%" in c
+        for s in matched:
+            if is_pr and col_map[s.id]["pr"] is None:
+                col_map[s.id]["pr"] = idx
+            if is_att and col_map[s.id]["att"] is None:
+                col_map[s.id]["att"] = idx
+        if (nc.endswith("pr") or "%" in c or "percent" in nc) and not matched:
+            unknown_headers.append(c)
 
     has_combined_pattern = any("-" in str(c) and ("PR" in str(c).upper() or "%" in str(c)) for c in columns)
-    upload = PracticalMarkUpload.objects.create(module=module, uploaded_by=uploaded_by)
+
+    # enrollment -> student id; the first student wins on duplicate enrollments
+    students = {}
+    for sid, enrollment in Student.objects.filter(module=module).order_by("id").values_list("id", "enrollment"):
+        students.setdefault(enrollment, sid)
 
     rows_total = 0
     rows_matched = 0
-    bulk = []
-    touched_subject_ids = set()
+    marks = []
+    unmatched = []
+    subject = None
+    enrollments = [_clean_enrollment(v) for v in _column(data, enrollment_idx)]
 
     if has_combined_pattern:
-        # Combined upload replaces full practical dataset.
-        StudentPracticalMark.objects.filter(module=module).delete()
-        for _, row in data.iterrows():
-            enrollment = str(row.iloc[enrollment_idx]).strip() if enrollment_idx < len(row) else ""
-            if not enrollment or enrollment.lower() == "nan":
+        values = {
+            sid: (
+                [_to_float_or_none(v) for v in _column(data, idxs["pr"])],
+                [_to_float_or_none(v) for v in _column(data, idxs["att"])],
+            )
+            for sid, idxs in col_map.items()
+        }
+        for row_idx, enrollment in enumerate(enrollments):
+            if not enrollment:
                 continue
-            if enrollment.endswith(".0"):
-                enrollment = enrollment[:-2]
             rows_total += 1
 
-            student = Student.objects.filter(module=module, enrollment=enrollment).first()
-            if not student:
+            student_id = students.get(enrollment)
+            if not student_id:
+                unmatched.append(enrollment)
                 continue
             rows_matched += 1
 
-            for sid, idxs in col_map.items():
-                pr_val = _to_float_or_none(row.iloc[idxs["pr"]]) if idxs["pr"] is not None else None
-                att_val = _to_float_or_none(row.iloc[idxs["att"]]) if idxs["att"] is not None else None
+            for sid, (pr_vals, att_vals) in values.items():
+                pr_val = pr_vals[row_idx]
+                att_val = att_vals[row_idx]
                 if pr_val is None and att_val is None:
                     continue
-                bulk.append(
-                    StudentPracticalMark(
-                        module=module,
-                        upload=upload,
-                        student=student,
-                        subject=subject_map[sid],
-                        pr_marks=pr_val,
-                        attendance_percentage=att_val,
-                    )
-                )
+                marks.append((student_id, subject_map[sid], pr_val, att_val))
     else:
         # Subject-wise practical sheet:
         # - detect subject from title rows
         # - detect "Final Practical Marks (out of 100)" column
         subject_text = ""
         for i in range(min(12, len(raw))):
-            cells = [str(x).strip() for x in raw.iloc[i].tolist()]
+            cells = [workbook.cell_text(x) for x in raw[i]]
             target_cell = ""
             for cell in cells:
                 if "subject name" in cell.lower():
@@ -260,16 +286,16 @@ def import_practical_marks(file_obj, module, uploaded_by=""):
                 parts = target_cell.split(":", 1)
                 subject_text = (parts[1] if len(parts) > 1 else target_cell).strip()
                 break
-        subject = _match_subject_by_text(subject_text, subjects)
+        subject = index.match(subject_text)
         if not subject:
             raise Exception(f"Could not map subject from sheet title '{subject_text}'. Set proper short name in Manage Subjects.")
 
         # find final practical column from row under header (usually next row)
-        subheader = raw.iloc[header_row + 1].tolist() if header_row + 1 < len(raw) else []
+        subheader = raw[header_row + 1] if header_row + 1 < len(raw) else []
         scan_cols = [str(c) for c in columns]
         for i, c in enumerate(subheader):
             if i < len(scan_cols) and (not scan_cols[i] or scan_cols[i].lower() == "nan"):
-                scan_cols[i] = str(c)
+                scan_cols[i] = workbook.cell_text(c)
         final_pr_idx = None
         for i, c in enumerate(scan_cols):
             n = _norm(c)
@@ -280,45 +306,124 @@ def import_practical_marks(file_obj, module, uploaded_by=""):
             # fallback: last numeric-looking column
             final_pr_idx = len(scan_cols) - 1
 
-        touched_subject_ids.add(subject.id)
-        StudentPracticalMark.objects.filter(module=module, subject=subject).delete()
-
-        for _, row in data.iterrows():
-            enrollment = str(row.iloc[enrollment_idx]).strip() if enrollment_idx < len(row) else ""
-            if not enrollment or enrollment.lower() == "nan":
+        pr_vals = [_to_float_or_none(v) for v in _column(data, final_pr_idx)]
+        for enrollment, pr_val in zip(enrollments, pr_vals):
+            if not enrollment:
                 continue
-            if enrollment.endswith(".0"):
-                enrollment = enrollment[:-2]
             rows_total += 1
-            student = Student.objects.filter(module=module, enrollment=enrollment).first()
-            if not student:
+            student_id = students.get(enrollment)
+            if not student_id:
+                unmatched.append(enrollment)
                 continue
             rows_matched += 1
-            pr_val = _to_float_or_none(row.iloc[final_pr_idx]) if final_pr_idx < len(row) else None
-            bulk.append(
-                StudentPracticalMark(
-                    module=module,
-                    upload=upload,
-                    student=student,
-                    subject=subject,
-                    pr_marks=pr_val,
-                    attendance_percentage=None,
-                )
-            )
+            marks.append((student_id, subject, pr_val, None))
 
+    return {
+        "mode": ("combined" if has_combined_pattern else "subject"),
+        "subject": subject,
+        "marks": marks,
+        "rows_total": rows_total,
+        "rows_matched": rows_matched,
+        "unknown_headers": unknown_headers,
+        "unmatched": unmatched,
+        "columns": {
+            s.name: {k: (columns[i] if i is not None else None) for k, i in col_map[s.id].items()}
+            for s in subjects
+        },
+    }
+
+
+def preview_practical_marks(file_obj, module, parsed=None):
+    """Dry run of import_practical_marks. Returns (parsed, summary)."""
+    raw = parsed or parse_practical_sheet(file_obj)
+    plan = _practical_plan(raw, module)
+
+    # what the import replaces: the whole module (combined) or one subject
+    stored_qs = StudentPracticalMark.objects.filter(module=module)
+    if plan["subject"] is not None:
+        stored_qs = stored_qs.filter(subject=plan["subject"])
+    stored = {
+        (student_id, subject_id): (pr_val, att_val)
+        for student_id, subject_id, pr_val, att_val in stored_qs.values_list(
+            "student_id", "subject_id", "pr_marks", "attendance_percentage"
+        )
+    }
+    enrollments = dict(Student.objects.filter(module=module).values_list("id", "enrollment"))
+
+    incoming = {}
+    for student_id, subject, pr_val, att_val in plan["marks"]:
+        if pr_val is None and att_val is None:
+            continue
+        incoming[(student_id, subject.id)] = (pr_val, att_val, subject.name)
+
+    sample = []
+    changed = 0
+    for key, (pr_val, att_val, subject_name) in incoming.items():
+        before = stored.get(key)
+        if before is not None and before != (pr_val, att_val):
+            changed += 1
+            if len(sample) < SAMPLE_SIZE:
+                sample.append({
+                    "enrollment": enrollments.get(key[0], ""),
+                    "subject": subject_name,
+                    "pr_marks": [before[0], pr_val],
+                    "attendance_percentage": [before[1], att_val],
+                })
+
+    return raw, {
+        "mode": plan["mode"],
+        "subject": plan["subject"].name if plan["subject"] else "",
+        "rows_total": plan["rows_total"],
+        "rows_matched": plan["rows_matched"],
+        "unmatched": len(plan["unmatched"]),
+        "unmatched_sample": plan["unmatched"][:SAMPLE_SIZE],
+        "unknown_headers": plan["unknown_headers"],
+        "columns": plan["columns"] if plan["mode"] == "combined" else {},
+        "added": sum(1 for key in incoming if key not in stored),
+        "changed": changed,
+        "unchanged": sum(1 for key, v in incoming.items() if stored.get(key) == v[:2]),
+        "removed": sum(1 for key in stored if key not in incoming),
+        "sample": sample,
+    }
+
+
+@transaction.atomic
+def import_practical_marks(file_obj, module, uploaded_by="", parsed=None):
+    """`parsed` is a parse_practical_sheet() of the same file (cached by a preview)."""
+    raw = parsed or parse_practical_sheet(file_obj)
+    plan = _practical_plan(raw, module)
+
+    upload = PracticalMarkUpload.objects.create(module=module, uploaded_by=uploaded_by)
+    if plan["subject"] is None:
+        # Combined upload replaces full practical dataset.
+        StudentPracticalMark.objects.filter(module=module).delete()
+    else:
+        StudentPracticalMark.objects.filter(module=module, subject=plan["subject"]).delete()
+
+    bulk = [
+        StudentPracticalMark(
+            module=module,
+            upload=upload,
+            student_id=student_id,
+            subject=subject,
+            pr_marks=pr_val,
+            attendance_percentage=att_val,
+        )
+        for student_id, subject, pr_val, att_val in plan["marks"]
+    ]
     if bulk:
         StudentPracticalMark.objects.bulk_create(bulk, batch_size=1000)
     # remove stale blank rows if any older imports produced them
     StudentPracticalMark.objects.filter(module=module, pr_marks__isnull=True, attendance_percentage__isnull=True).delete()
 
-    upload.rows_total = rows_total
-    upload.rows_matched = rows_matched
+    upload.rows_total = plan["rows_total"]
+    upload.rows_matched = plan["rows_matched"]
     upload.save(update_fields=["rows_total", "rows_matched", "uploaded_at"])
 
     return {
-        "rows_total": rows_total,
-        "rows_matched": rows_matched,
-        "unknown_headers": unknown_headers,
-        "mode": ("combined" if has_combined_pattern else "subject"),
+        "rows_total": plan["rows_total"],
+        "rows_matched": plan["rows_matched"],
+        "unknown_headers": plan["unknown_headers"],
+        "mode": plan["mode"],
         "uploaded_at": upload.uploaded_at,
     }
@@ -0,0 +1,57 @@
+import uuid
+
+from django.core.cache import cache
+
+from . import fingerprint_utils
+
+
+# a preview stays committable for this long
+PREVIEW_TTL = 30 * 60
+
+# unmatched enrollments / changed rows listed in a preview
+SAMPLE_SIZE = 20
+
+
+def _key(token):
+    return f"preview:{token}"
+
+
+def remember(module, kind, scope, files, parsed):
+    """
+    Cache the parse of a previewed upload and return its token.
+
+    The entry is bound to the module, the import kind, the `scope` (the
+    options the parse depends on, e.g. test/subject) and the content of
+    `files`; parsed_for() only hands it back for the same upload.
+    """
+    token = str(uuid.uuid4())
+    cache.set(
+        _key(token),
+        {
+            "module_id": module.id,
+            "kind": kind,
+            "scope": scope,
+            "sha256": fingerprint_utils.file_sha256(*files),
+            "parsed": parsed,
+        },
+        PREVIEW_TTL,
+    )
+    return token
+
+
+def parsed_for(token, module, kind, scope, files):
+    """Cached parse for committing a preview, or None (expired, other file, other process)."""
+    if not token:
+        return None
+    entry = cache.get(_key(token))
+    if not entry or (entry["module_id"], entry["kind"], entry["scope"]) != (module.id, kind, scope):
+        return None
+    if entry["sha256"] != fingerprint_utils.file_sha256(*files):
+        return None
+    cache.delete(_key(token))
+    return entry["parsed"]
+
+
+def payload(summary, token, msg):
+    """JSON shape of a preview answer: the importer's summary plus the commit token."""
+    return {"ok": True, "preview": True, "preview_token": token, "msg": msg, **summary}
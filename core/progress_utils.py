@@ -0,0 +1,108 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+
+# cached job state outlives any realistic upload
+CACHE_TTL = 6 * 60 * 60
+
+PROGRESS_FIELDS = (
+    "status",
+    "message",
+    "progress_current",
+    "progress_total",
+    "current_enrollment",
+    "current_student_name",
+)
+
+
+def _state_key(job_id):
+    return f"job:{job_id}"
+
+
+def _cancel_key(job_id):
+    return f"job:{job_id}:cancel"
+
+
+def read(job_id):
+    """Cached progress fields of a job, or None when the cache has nothing."""
+    return cache.get(_state_key(job_id))
+
+
+def request_cancel(job_id, message="Cancelling upload..."):
+    cache.set(_cancel_key(job_id), True, CACHE_TTL)
+    state = read(job_id)
+    if state:
+        state["message"] = message
+        cache.set(_state_key(job_id), state, CACHE_TTL)
+
+
+class ProgressChannel:
+    """
+    Progress/cancel state of one background job.
+
+    Every update goes to the cache; the BackgroundJob row is written at
+    most every `flush_rows` rows or `flush_ms` milliseconds. Cancel flags
+    are read from the cache, with a DB check at the same throttled pace
+    (the cancel request may have been served by another process).
+    """
+
+    def __init__(self, job_id, flush_rows=None, flush_ms=None):
+        self.job_id = job_id
+        self.flush_rows = flush_rows or settings.JOB_PROGRESS_FLUSH_ROWS
+        self.flush_ms = flush_ms or settings.JOB_PROGRESS_FLUSH_MS
+        self.state = read(job_id) or {}
+        self._flushed_rows = 0
+        self._flushed_at = time.monotonic()
+        self._checked_at = time.monotonic()
+        self._cancelled = False
+
+    def _due(self, last):
+        return (time.monotonic() - last) * 1000 >= self.flush_ms
+
+    def update(self, **fields):
+        self.state.update(fields)
+        cache.set(_state_key(self.job_id), self.state, CACHE_TTL)
+
+        rows = self.state.get("progress_current") or 0
+        if abs(rows - self._flushed_rows) >= self.flush_rows or self._due(self._flushed_at):
+            self.flush()
+
+    def progress(self, current, total, enrollment, student_name, message):
+        # signature of the importers' progress_cb
+        self.update(
+            progress_current=current or 0,
+            progress_total=total or 0,
+            current_enrollment=(enrollment or ""),
+            current_student_name=(student_name or ""),
+            message=(message or "Processing result upload..."),
+        )
+
+    def flush(self, **extra):
+        fields = {k: v for k, v in self.state.items() if k in PROGRESS_FIELDS}
+        BackgroundJob.objects.filter(job_id=self.job_id).update(
+            **fields, **extra, updated_at=timezone.now()
+        )
+        self._flushed_rows = self.state.get("progress_current") or 0
+        self._flushed_at = time.monotonic()
+
+    def cancelled(self, exact=False):
+        if self._cancelled or cache.get(_cancel_key(self.job_id)):
+            self._cancelled = True
+        elif exact or self._due(self._checked_at):
+            self._checked_at = time.monotonic()
+            self._cancelled = BackgroundJob.objects.filter(job_id=self.job_id, cancel_requested=True).exists()
+        return self._cancelled
+
+    def finish(self, status, message, **extra):
+        """Final state: always written to the DB and cache."""
+        self.state.update(status=status, message=message)
+        for key in ("progress_current", "progress_total"):
+            if key in extra:
+                self.state[key] = extra.pop(key)
+        cache.set(_state_key(self.job_id), self.state, CACHE_TTL)
+        self.flush(**extra)
@@ -0,0 +1,180 @@
+from django.db.models import Count, Q
+
+from .models import TEST_CHOICES, Attendance, MentorWeekStats, ResultCallRecord, ResultUpload, Student
+
+
+def _followup_row(mentor, need_call, received, not_received, msg_sent):
+    done = received + not_received
+    return {
+        "mentor": mentor,
+        "need_call": need_call,
+        "done": done,
+        "received": received,
+        "not_received": not_received,
+        "not_done": max(need_call - done, 0),
+        "msg_sent": msg_sent,
+        "percent": round((done / need_call) * 100, 1) if need_call else 0,
+    }
+
+
+# ---------------- ATTENDANCE FOLLOW-UP ----------------
+
+def mentor_attendance_stats(module, week_no):
+    """
+    Follow-up figures of every mentor of the module for one week, ordered
+    by mentor name: students, need_call, received, not_received, done,
+    not_done, msg_sent and percent (done / need_call).
+
+    Read from the MentorWeekStats counters plus one grouped student count,
+    so the cost does not grow with the number of calls. Without a week
+    every figure but `students` is 0.
+    """
+    counters = {
+        row["mentor__name"]: row
+        for row in MentorWeekStats.objects.filter(module=module, week_no=week_no).values(
+            "mentor__name", "need_call", "received", "not_received", "msg_sent"
+        )
+    }
+    students = (
+        Student.objects.filter(module=module)
+        .values("mentor__name")
+        .annotate(students=Count("id"))
+        .order_by("mentor__name")
+    )
+    rows = []
+    for row in students:
+        mentor = row["mentor__name"]
+        cell = counters.get(mentor, {})
+        rows.append({
+            "mentor": mentor,
+            "students": row["students"],
+            **_followup_row(
+                mentor,
+                cell.get("need_call", 0),
+                cell.get("received", 0),
+                cell.get("not_received", 0),
+                cell.get("msg_sent", 0),
+            ),
+        })
+    return rows
+
+
+def mentor_week(module, mentor, week_no):
+    """MentorWeekStats of one mentor and week; an unsaved all-zero one when nothing is recorded."""
+    return (
+        MentorWeekStats.objects.filter(module=module, mentor=mentor, week_no=week_no).first()
+        or MentorWeekStats(module=module, mentor=mentor, week_no=week_no)
+    )
+
+
+# ---------------- RESULT FOLLOW-UP ----------------
+
+def _result_call_counts(module, upload_ids):
+    """{upload_id: {mentor: row}} of the live calls of the uploads, from one grouped query."""
+    counts = (
+        ResultCallRecord.objects.filter(upload_id__in=upload_ids, student__module=module)
+        .values("upload_id", "student__mentor__name")
+        .annotate(
+            need_call=Count("id"),
+            received=Count("id", filter=Q(final_status="received")),
+            not_received=Count("id", filter=Q(final_status="not_received")),
+            msg_sent=Count("id", filter=Q(message_sent=True)),
+        )
+        # the model's roll-number ordering would otherwise join the GROUP BY
+        .order_by()
+    )
+    out = {upload_id: {} for upload_id in upload_ids}
+    for row in counts:
+        mentor = row["student__mentor__name"]
+        out[row["upload_id"]][mentor] = _followup_row(
+            mentor, row["need_call"], row["received"], row["not_received"], row["msg_sent"]
+        )
+    return out
+
+
+def mentor_result_stats(module, upload, mentors=None):
+    """
+    Per-mentor follow-up figures of one result upload (need_call, done,
+    received, not_received, not_done, msg_sent, percent), ordered by mentor.
+
+    Only mentors with calls are listed, unless `mentors` (names) is given:
+    then every one of them gets a row, zeros included.
+    """
+    by_mentor = _result_call_counts(module, [upload.id])[upload.id]
+    names = sorted(by_mentor) if mentors is None else list(mentors)
+    return [by_mentor.get(name) or _followup_row(name, 0, 0, 0, 0) for name in names]
+
+
+def result_followup_matrix(module):
+    """
+    Follow-up totals of every live upload of the module as a subject x test
+    grid, from two queries whatever the number of uploads.
+
+    Returns (tests, rows): `tests` are the test names present, each row is
+    {"subject", "cells"} with one cell per test, None where nothing was
+    uploaded. A cell holds the upload, its totals and its per-mentor rows.
+    """
+    uploads = list(ResultUpload.objects.live().filter(module=module).select_related("subject"))
+    counts = _result_call_counts(module, [u.id for u in uploads])
+
+    present = {u.test_name for u in uploads}
+    tests = [t for t, _ in TEST_CHOICES if t in present]
+    grid = {}
+    for u in uploads:
+        mentors = [counts[u.id][name] for name in sorted(counts[u.id])]
+        totals = _followup_row(
+            "",
+            *(sum(m[key] for m in mentors) for key in ("need_call", "received", "not_received", "msg_sent")),
+        )
+        grid.setdefault(u.subject, {})[u.test_name] = {"upload": u, "totals": totals, "mentors": mentors}
+
+    rows = [
+        {"subject": subject, "cells": [cells.get(t) for t in tests]}
+        for subject, cells in sorted(grid.items(), key=lambda item: (item[0].display_order, item[0].name))
+    ]
+    return tests, rows
+
+
+# ---------------- SEMESTER REGISTER ----------------
+
+def register_weeks(module, mentor=None):
+    """Weeks with attendance uploaded for the module (or one mentor's students), ascending."""
+    records = Attendance.objects.filter(student__module=module)
+    if mentor is not None:
+        records = records.filter(student__mentor=mentor)
+    return sorted(records.values_list("week_no", flat=True).distinct())
+
+
+def attendance_register(students, weeks):
+    """
+    Semester register rows of `students`, in their order: roll, enrollment,
+    name, mentor, cells (week_percentage per week of `weeks`, None where
+    missing) and overall (overall_percentage of the latest week present).
+
+    The attendance of all the students comes from one query and is pivoted
+    into the students x weeks grid in memory.
+    """
+    column = {week_no: i for i, week_no in enumerate(weeks)}
+    cells = {s.id: [None] * len(weeks) for s in students}
+    overall = {}
+    records = (
+        Attendance.objects.filter(student_id__in=list(cells), week_no__in=weeks)
+        .order_by("week_no")
+        .values_list("student_id", "week_no", "week_percentage", "overall_percentage")
+    )
+    for student_id, week_no, week_per, overall_per in records:
+        cells[student_id][column[week_no]] = week_per
+        # ordered by week, so the latest week's figure is kept
+        overall[student_id] = overall_per
+
+    return [
+        {
+            "roll": s.roll_no,
+            "enrollment": s.enrollment,
+            "name": s.name,
+            "mentor": s.mentor.name,
+            "cells": cells[s.id],
+            "overall": overall.get(s.id),
+        }
+        for s in students
+    ]
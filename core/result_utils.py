@@ -1,7 +1,23 @@
+from datetime import timedelta
+
+import numpy as np
 import pandas as pd
 from django.db import transaction
-
-from .models import ResultCallRecord, ResultUpload, Student, StudentResult, Subject
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from . import fingerprint_utils, rule_utils, workbook
+from .models import (
+    AcademicModule,
+    BackgroundJob,
+    ImportFingerprint,
+    ResultCallRecord,
+    ResultUpload,
+    Student,
+    StudentResult,
+    Subject,
+)
+from .preview_utils import SAMPLE_SIZE
 
 
 TESTS = {"T1", "T2", "T3", "T4", "REMEDIAL"}
@@ -44,20 +60,6 @@ def _subject_base_name(text):
     return raw
 
 
-def _to_mark(val):
-    if pd.isna(val):
-        return None, False
-    text = str(val).strip().upper()
-    if not text:
-        return None, False
-    if text == "AB":
-        return 0.0, True
-    try:
-        return float(text), False
-    except Exception:
-        return None, False
-
-
 def _resolve_col(columns, keywords, fallback=None):
     lower_cols = [str(c).strip().lower() for c in columns]
     for i, name in enumerate(lower_cols):
@@ -78,37 +80,31 @@ def _find_col_any(columns, keyword_sets):
 
 
 def _looks_subheader_row(values):
-    txt = " ".join(str(x).strip().lower() for x in values if str(x).strip())
+    txt = " ".join(workbook.cell_text(x).lower() for x in values if workbook.cell_text(x))
     if not txt:
         return False
     keys = ["test", "t1", "t2", "t3", "t4", "see", "rem", "remedial", "total", "25", "50", "100"]
     return any(k in txt for k in keys)
 
 
+def _is_result_header(row_text):
+    if ("sr" in row_text or "roll" in row_text) and ("enroll" in row_text or "enrol" in row_text):
+        return True
+    return "enrollment" in row_text or "enrol" in row_text
+
+
 def _build_df(file_obj):
-    raw = pd.read_excel(file_obj, header=None)
-    header_row = 0
-    for i in range(len(raw)):
-        row_text = " ".join(str(x).lower() for x in raw.iloc[i].tolist())
-        if ("sr" in row_text or "roll" in row_text) and ("enroll" in row_text or "enrol" in row_text):
-            header_row = i
-            break
-        if "enrollment" in row_text or "enrol" in row_text:
-            header_row = i
-            break
+    _, raw = workbook.read_rows(file_obj)
+    header_row = workbook.find_header_row(raw, _is_result_header) or 0
 
-    row1 = raw.iloc[header_row].tolist() if header_row < len(raw) else []
-    row2 = raw.iloc[header_row + 1].tolist() if header_row + 1 < len(raw) else []
+    row1 = raw[header_row] if header_row < len(raw) else []
+    row2 = raw[header_row + 1] if header_row + 1 < len(raw) else []
 
     col_count = max(len(row1), len(row2))
     cols = []
     for idx in range(col_count):
-        h1 = str(row1[idx]).strip() if idx < len(row1) else ""
-        h2 = str(row2[idx]).strip() if idx < len(row2) else ""
-        if h1.lower() == "nan":
-            h1 = ""
-        if h2.lower() == "nan":
-            h2 = ""
+        h1 = workbook.cell_text(row1[idx]) if idx < len(row1) else ""
+        h2 = workbook.cell_text(row2[idx]) if idx < len(row2) else ""
         if h2 and "unnamed" not in h2.lower():
             col = f"{h1} {h2}".strip()
         else:
@@ -121,8 +117,7 @@ def _build_df(file_obj):
     if _looks_subheader_row(row2):
         data_start = header_row + 2
 
-    df = raw.iloc[data_start:].copy()
-    df.columns = cols[: len(df.columns)]
+    df = workbook.frame(raw, data_start, labels=cols)
     df = df.dropna(how="all")
     df.columns = [str(c).strip() for c in df.columns]
     return df
@@ -159,55 +154,96 @@ def _current_mark_col(test_name, subject_name, columns):
     return None
 
 
-def _fail_rule(test_name, marks_current, marks_total):
-    if marks_current is None:
-        return False, ""
+# rows per INSERT/UPDATE batch; progress and cancel checks run once per batch
+BULK_BATCH_SIZE = 500
 
-    if test_name == "T1":
-        fail = marks_current < 9
-        return fail, "Less than 9 marks in T1"
-    if test_name == "T2":
-        fail = marks_current < 9 and (marks_total is not None and marks_total < 18)
-        return fail, "Less than 9 marks in T2 & less than 18 in (T1+T2)"
-    if test_name == "T3":
-        fail = marks_current < 9 and (marks_total is not None and marks_total < 27)
-        return fail, "Less than 9 marks in T3 & less than 27 in (T1+T2+T3)"
-    if test_name == "T4":
-        fail = marks_current < 18 and (marks_total is not None and marks_total < 35)
-        return fail, "Less than 18 marks in SEE & less than 35 in (T1+T2+T3+SEE)"
-    if test_name == "REMEDIAL":
-        fail = marks_current < 35
-        return fail, "Less than 35 marks in REMEDIAL"
-    return False, ""
-
-
-def _save_import_rows(upload, rows, progress_cb=None, cancel_cb=None):
-    StudentResult.objects.filter(upload=upload).delete()
-    ResultCallRecord.objects.filter(upload=upload).delete()
+# staged generations older than this were left behind by a crashed bulk import
+STALE_GENERATION_HOURS = 24
+
+RESULT_FIELDS = (
+    "marks_current", "marks_t1", "marks_t2", "marks_t3", "marks_t4",
+    "marks_total", "is_absent", "fail_flag", "fail_reason",
+)
+CALL_FIELDS = ("fail_reason", "marks_current", "marks_total")
+# what a mentor recorded on a call; carried over when a bulk replace recreates the call
+OUTCOME_FIELDS = (
+    "attempt1_time", "attempt2_time", "final_status", "talked_with",
+    "duration", "parent_reason", "message_sent",
+)
+
+
+def _has_outcome(call):
+    return bool(call.final_status or call.attempt1_time or call.message_sent or call.parent_reason)
 
+
+def _inherit(call, prior):
+    for f in OUTCOME_FIELDS:
+        setattr(call, f, getattr(prior, f))
+    return call
+
+
+def _student_map(module):
+    """enrollment -> (student id, name) for every student of the module."""
+    return {
+        enrollment: (sid, name)
+        for sid, enrollment, name in Student.objects.filter(module=module).values_list("id", "enrollment", "name")
+    }
+
+
+def _save_import_rows(upload, rows, progress_cb=None, cancel_cb=None, students=None, replaced=None, rule=None, dry_run=False):
+    """
+    Merge parsed rows into `upload`, touching only rows whose values changed.
+
+    Results are inserted/updated only when their marks changed; students no
+    longer in the sheet lose their result row. Call records are created or
+    retired only when the fail outcome flips, so attempts, remarks and
+    message_sent of calls that still apply are kept; a retired call comes
+    back with its outcome if the student fails again. `replaced` is the
+    upload this one supersedes (bulk replace): new calls inherit its call
+    outcomes and the diff is reported against it.
+    Writes are batched; progress/cancel callbacks fire once per
+    BULK_BATCH_SIZE rows read and once per write batch. `students` is an optional shared _student_map(),
+    `rule` the FailRule of the upload's test (read from the module if omitted).
+    With `dry_run` nothing is written (`upload` may be unsaved) and the
+    summary also lists unmatched enrollments and a sample of changed rows.
+    """
+    if students is None:
+        students = _student_map(upload.module)
+    if rule is None:
+        rule = rule_utils.rule_for(upload.module, upload.test_name)
+    existing = {r.student_id: r for r in StudentResult.objects.filter(upload=upload)} if upload.pk else {}
+    calls = {c.student_id: c for c in ResultCallRecord.all_objects.filter(upload=upload)} if upload.pk else {}
+    before_results, before_calls = existing, calls
+    if replaced is not None:
+        before_results = {r.student_id: r for r in StudentResult.objects.filter(upload=replaced)}
+        before_calls = {c.student_id: c for c in ResultCallRecord.all_objects.filter(upload=replaced)}
+
+    # student id -> (enrollment, result values, call values or None); the last sheet row wins
+    final = {}
     rows_total = 0
     rows_matched = 0
-    rows_failed = 0
+    unmatched = []
 
     total_rows = len(rows)
     for idx, row in enumerate(rows, start=1):
-        if cancel_cb and cancel_cb():
+        if cancel_cb and idx % BULK_BATCH_SIZE == 1 and cancel_cb():
             raise Exception("Upload cancelled by user.")
         enrollment = _clean_enrollment(row.get("enrollment"))
-        if not enrollment:
-            continue
-        rows_total += 1
-
-        student = Student.objects.filter(module=upload.module, enrollment=enrollment).select_related("mentor").first()
-        if progress_cb:
+        student_id, student_name = students.get(enrollment, (None, ""))
+        if progress_cb and (idx % BULK_BATCH_SIZE == 0 or idx == total_rows):
             progress_cb(
                 current=idx,
                 total=total_rows,
                 enrollment=enrollment,
-                student_name=(student.name if student else ""),
+                student_name=student_name,
                 message="Reading marks and preparing result call list...",
             )
-        if not student:
+        if not enrollment:
+            continue
+        rows_total += 1
+
+        if not student_id:
+            unmatched.append(enrollment)
             continue
         rows_matched += 1
 
@@ -219,40 +255,152 @@ def _save_import_rows(upload, rows, progress_cb=None, cancel_cb=None):
         mtotal = row.get("mtotal")
         is_absent = bool(row.get("is_absent", False))
 
-        if upload.test_name == "T2" and mtotal is None and m1 is not None and current_mark is not None:
-            mtotal = m1 + current_mark
-        if upload.test_name == "T3" and mtotal is None and all(v is not None for v in [m1, m2, current_mark]):
-            mtotal = m1 + m2 + current_mark
-        if upload.test_name == "T4":
-            if mtotal is None and all(v is not None for v in [m1, m2, m3, current_mark]):
-                mtotal = m1 + m2 + m3 + (current_mark / 2.0)
-
-        fail_flag, fail_reason = _fail_rule(upload.test_name, current_mark, mtotal)
-
-        StudentResult.objects.create(
-            upload=upload,
-            student=student,
-            enrollment=enrollment,
-            marks_current=current_mark,
-            marks_t1=m1,
-            marks_t2=m2,
-            marks_t3=m3,
-            marks_t4=m4,
-            marks_total=mtotal,
-            is_absent=is_absent,
-            fail_flag=fail_flag,
-            fail_reason=fail_reason,
-        )
-
+        if "fail_flag" in row:
+            # totals and fail outcome already computed column-wise
+            fail_flag, fail_reason = row["fail_flag"], row["fail_reason"]
+        else:
+            if upload.test_name == "T2" and mtotal is None and m1 is not None and current_mark is not None:
+                mtotal = m1 + current_mark
+            if upload.test_name == "T3" and mtotal is None and all(v is not None for v in [m1, m2, current_mark]):
+                mtotal = m1 + m2 + current_mark
+            if upload.test_name == "T4":
+                if mtotal is None and all(v is not None for v in [m1, m2, m3, current_mark]):
+                    mtotal = m1 + m2 + m3 + (current_mark / 2.0)
+
+            fail_flag, fail_reason = rule.check(current_mark, mtotal)
+
+        values = {
+            "marks_current": current_mark,
+            "marks_t1": m1,
+            "marks_t2": m2,
+            "marks_t3": m3,
+            "marks_t4": m4,
+            "marks_total": mtotal,
+            "is_absent": is_absent,
+            "fail_flag": fail_flag,
+            "fail_reason": fail_reason,
+        }
+        call_values = None
         if fail_flag:
-            rows_failed += 1
-            ResultCallRecord.objects.create(
-                upload=upload,
-                student=student,
-                fail_reason=fail_reason,
-                marks_current=current_mark or 0,
-                marks_total=mtotal,
-            )
+            call_values = {"fail_reason": fail_reason, "marks_current": current_mark or 0, "marks_total": mtotal}
+        final[student_id] = (enrollment, values, call_values)
+
+    # ---------------- DIFF ----------------
+    now = timezone.now()
+    new_results = []
+    changed_results = []
+    new_calls = []
+    changed_calls = []
+    sample = []
+    diff = {
+        "added": 0, "updated": 0, "unchanged": 0, "removed": 0,
+        "calls_added": 0, "calls_updated": 0, "calls_retired": 0, "calls_restored": 0,
+    }
+
+    for student_id, (enrollment, values, call_values) in final.items():
+        before = before_results.get(student_id)
+        if before is None:
+            diff["added"] += 1
+        elif any(getattr(before, f) != values[f] for f in RESULT_FIELDS) or before.enrollment != enrollment:
+            diff["updated"] += 1
+            if dry_run and len(sample) < SAMPLE_SIZE:
+                sample.append({
+                    "enrollment": enrollment,
+                    "changes": {f: [getattr(before, f), values[f]] for f in RESULT_FIELDS if getattr(before, f) != values[f]},
+                })
+        else:
+            diff["unchanged"] += 1
+
+        result = existing.get(student_id)
+        if result is None:
+            new_results.append(StudentResult(upload=upload, student_id=student_id, enrollment=enrollment, **values))
+        elif any(getattr(result, f) != values[f] for f in RESULT_FIELDS) or result.enrollment != enrollment:
+            for f, v in values.items():
+                setattr(result, f, v)
+            result.enrollment = enrollment
+            changed_results.append(result)
+
+        prior = before_calls.get(student_id)
+        if call_values is None:
+            if prior is not None and prior.retired_at is None:
+                diff["calls_retired"] += 1
+        elif prior is None:
+            diff["calls_added"] += 1
+        elif prior.retired_at is not None:
+            diff["calls_restored"] += 1
+        elif any(getattr(prior, f) != call_values[f] for f in CALL_FIELDS):
+            diff["calls_updated"] += 1
+
+        call = calls.get(student_id)
+        if call_values is None:
+            if call is not None and call.retired_at is None:
+                call.retired_at = now
+                changed_calls.append(call)
+            elif call is None and replaced is not None and prior is not None and _has_outcome(prior):
+                # keep the recorded outcome with the new upload, out of the call lists
+                new_calls.append(_inherit(ResultCallRecord(upload=upload, student_id=student_id, retired_at=now), prior))
+            continue
+
+        if call is None:
+            call = ResultCallRecord(upload=upload, student_id=student_id, **call_values)
+            if replaced is not None and prior is not None:
+                _inherit(call, prior)
+            new_calls.append(call)
+        elif call.retired_at is not None or any(getattr(call, f) != call_values[f] for f in CALL_FIELDS):
+            call.retired_at = None
+            for f, v in call_values.items():
+                setattr(call, f, v)
+            changed_calls.append(call)
+
+    gone = [sid for sid in existing if sid not in final]
+    diff["removed"] = sum(1 for sid in before_results if sid not in final)
+    diff["calls_retired"] += sum(
+        1 for sid, c in before_calls.items() if sid not in final and c.retired_at is None
+    )
+    for sid in gone:
+        call = calls.get(sid)
+        if call is not None and call.retired_at is None:
+            call.retired_at = now
+            changed_calls.append(call)
+    rows_failed = sum(1 for _, _, call_values in final.values() if call_values is not None)
+
+    if dry_run:
+        return {
+            "rows_total": rows_total,
+            "rows_matched": rows_matched,
+            "rows_failed": rows_failed,
+            "diff": diff,
+            "unmatched": len(unmatched),
+            "unmatched_sample": unmatched[: SAMPLE_SIZE],
+            "sample": sample,
+        }
+
+    # ---------------- WRITE (batched) ----------------
+    writes = [
+        (StudentResult.objects.bulk_create, new_results, {}),
+        (StudentResult.objects.bulk_update, changed_results, {"fields": [*RESULT_FIELDS, "enrollment"]}),
+        (ResultCallRecord.all_objects.bulk_create, new_calls, {}),
+        (ResultCallRecord.all_objects.bulk_update, changed_calls, {"fields": [*CALL_FIELDS, "retired_at"]}),
+    ]
+    total_writes = sum(len(objs) for _, objs, _ in writes)
+    written = 0
+    for write, objs, kwargs in writes:
+        for start in range(0, len(objs), BULK_BATCH_SIZE):
+            if cancel_cb and cancel_cb():
+                raise Exception("Upload cancelled by user.")
+            batch = objs[start:start + BULK_BATCH_SIZE]
+            write(batch, **kwargs)
+            written += len(batch)
+            if progress_cb:
+                progress_cb(
+                    current=written,
+                    total=total_writes,
+                    enrollment="",
+                    student_name="",
+                    message="Saving results and result calls...",
+                )
+    if gone:
+        StudentResult.objects.filter(upload=upload, student_id__in=gone).delete()
 
     upload.rows_total = rows_total
     upload.rows_matched = rows_matched
@@ -263,30 +411,43 @@ def _save_import_rows(upload, rows, progress_cb=None, cancel_cb=None):
         "rows_total": rows_total,
         "rows_matched": rows_matched,
         "rows_failed": rows_failed,
+        "diff": diff,
     }
 
 
+def diff_text(diff):
+    """One-line description of what a re-upload changed (empty for a first upload)."""
+    if not diff or not (diff.get("updated") or diff.get("removed") or diff.get("calls_retired") or diff.get("calls_restored")):
+        return ""
+    return (
+        f" Changes: {diff.get('added', 0)} added, {diff.get('updated', 0)} updated, "
+        f"{diff.get('unchanged', 0)} unchanged, {diff.get('removed', 0)} removed; "
+        f"calls {diff.get('calls_added', 0)} new, {diff.get('calls_retired', 0)} retired, "
+        f"{diff.get('calls_restored', 0)} restored."
+    )
+
+
 def _read_compiled_layout(file_obj):
-    xls = pd.ExcelFile(file_obj)
-    if "COMPILED" not in xls.sheet_names:
+    book = workbook.read_workbook(file_obj, sheets=["COMPILED"])
+    if "COMPILED" not in book:
         raise Exception("COMPILED sheet not found. Please upload compiled file with exact tab name COMPILED.")
 
-    raw = pd.read_excel(xls, sheet_name="COMPILED", header=None)
+    raw = book["COMPILED"]
     if len(raw) < 9:
         raise Exception("Compiled sheet format invalid. Expected headers in row 7-8 and data from row 9.")
 
-    row_subject = raw.iloc[6].tolist()  # row 7
-    row_exam = raw.iloc[7].tolist()  # row 8
+    row_subject = raw[6]  # row 7
+    row_exam = raw[7]  # row 8
 
     enrollment_idx = None
     for idx, v in enumerate(row_subject):
-        txt = str(v).lower()
+        txt = workbook.cell_text(v).lower()
         if "enroll" in txt or "enrol" in txt:
             enrollment_idx = idx
             break
     if enrollment_idx is None:
         for idx, v in enumerate(row_exam):
-            txt = str(v).lower()
+            txt = workbook.cell_text(v).lower()
             if "enroll" in txt or "enrol" in txt:
                 enrollment_idx = idx
                 break
@@ -296,8 +457,8 @@ def _read_compiled_layout(file_obj):
     blocks = {}
     current_subject = ""
     for idx in range(len(row_exam)):
-        s_text = str(row_subject[idx]).strip() if idx < len(row_subject) else ""
-        if s_text and s_text.lower() != "nan":
+        s_text = workbook.cell_text(row_subject[idx]) if idx < len(row_subject) else ""
+        if s_text:
             current_subject = s_text
         exam_key = _exam_key_from_header(row_exam[idx] if idx < len(row_exam) else "")
         if exam_key and current_subject:
@@ -308,16 +469,38 @@ def _read_compiled_layout(file_obj):
     if not found_subjects:
         raise Exception("No subject blocks with TEST headers found in COMPILED row 7/8.")
 
-    data_df = raw.iloc[8:].copy()  # row 9 onwards
+    data_df = workbook.frame(raw, 8)  # row 9 onwards
+    marks, absent = _marks_matrix(data_df)
+    enrollments = [
+        _clean_enrollment(v) for v in workbook.column(raw, enrollment_idx, 8)
+    ]
     return {
         "raw": raw,
         "enrollment_idx": enrollment_idx,
         "blocks": blocks,
         "found_subjects": found_subjects,
         "data_df": data_df,
+        "marks": marks,
+        "absent": absent,
+        "enrollments": enrollments,
     }
 
 
+def _marks_matrix(data_df):
+    """
+    Every cell of the sheet as a mark: float matrix (NaN = blank / not a
+    number, AB = 0, case and surrounding spaces ignored) and the AB mask.
+    """
+    if data_df.empty:
+        return np.empty(data_df.shape), np.zeros(data_df.shape, dtype=bool)
+    text = data_df.apply(lambda col: col.astype(str).str.strip().str.upper())
+    absent = (text == "AB").to_numpy()
+    marks = text.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    marks[data_df.isna().to_numpy()] = np.nan
+    marks[absent] = 0.0
+    return marks, absent
+
+
 def _match_compiled_subject(selected_subject_name, found_subjects):
     selected_key = _norm_key(_subject_base_name(selected_subject_name))
     for s in found_subjects:
@@ -331,65 +514,86 @@ def _match_compiled_subject(selected_subject_name, found_subjects):
     return None
 
 
-def _build_rows_from_compiled_block(data_df, enrollment_idx, cols, test_name):
+def _nullable(values):
+    return [None if v != v else v for v in values.tolist()]
+
+
+def _build_rows_from_compiled_block(layout, cols, test_name, rule):
+    """
+    Rows for one subject block and test, computed column-wise from the
+    marks matrix: cumulative totals, T4 fallback total and fail outcome
+    (`rule` is the test's FailRule).
+    """
+    marks = layout["marks"]
+    absent = layout["absent"]
+    n = marks.shape[0]
+    missing = np.full(n, np.nan)
+
+    def col(key):
+        return marks[:, cols[key]] if key in cols else missing
+
+    m1, m2, m3, m4, total, c12, c123 = (col(k) for k in ("t1", "t2", "t3", "t4_50", "total", "t12", "t123"))
+    read = [cols[k] for k in ("t1", "t2", "t3", "t4_50", "total", "t12", "t123") if k in cols]
+    is_absent = absent[:, read].any(axis=1) if read else np.zeros(n, dtype=bool)
+
+    if test_name == "T1":
+        current, mtotal = m1, m1
+    elif test_name == "T2":
+        current = m2
+        mtotal = np.where(~np.isnan(c12), c12, np.where(~np.isnan(m1) & ~np.isnan(m2), m1 + m2, total))
+    elif test_name == "T3":
+        current = m3
+        sum123 = m1 + m2 + m3
+        mtotal = np.where(~np.isnan(c123), c123, np.where(~np.isnan(sum123), sum123, total))
+    elif test_name == "T4":
+        current = m4
+        mtotal = np.where(np.isnan(total), m1 + m2 + m3 + (current / 2.0), total)
+    elif test_name == "REMEDIAL":
+        current, mtotal = total, total
+    else:
+        current, mtotal = missing, total
+
+    fail, reasons = rule.mask(current, mtotal)
+
     parsed_rows = []
-    for _, row in data_df.iterrows():
-        enrollment = _clean_enrollment(row.iloc[enrollment_idx]) if enrollment_idx < len(row) else ""
+    for enrollment, cur, v1, v2, v3, v4, tot, ab, flag, reason in zip(
+        layout["enrollments"],
+        _nullable(current),
+        _nullable(m1),
+        _nullable(m2),
+        _nullable(m3),
+        _nullable(m4),
+        _nullable(mtotal),
+        is_absent.tolist(),
+        fail.tolist(),
+        reasons.tolist(),
+    ):
         if not enrollment:
             continue
-
-        m1 = m2 = m3 = m4 = mtotal = current_mark = None
-        is_absent = False
-
-        if "t1" in cols:
-            m1, ab = _to_mark(row.iloc[cols["t1"]]); is_absent = is_absent or ab
-        if "t2" in cols:
-            m2, ab = _to_mark(row.iloc[cols["t2"]]); is_absent = is_absent or ab
-        if "t3" in cols:
-            m3, ab = _to_mark(row.iloc[cols["t3"]]); is_absent = is_absent or ab
-        if "t4_50" in cols:
-            m4, ab = _to_mark(row.iloc[cols["t4_50"]]); is_absent = is_absent or ab
-        if "total" in cols:
-            mtotal, ab = _to_mark(row.iloc[cols["total"]]); is_absent = is_absent or ab
-
-        c12 = c123 = None
-        if "t12" in cols:
-            c12, ab = _to_mark(row.iloc[cols["t12"]]); is_absent = is_absent or ab
-        if "t123" in cols:
-            c123, ab = _to_mark(row.iloc[cols["t123"]]); is_absent = is_absent or ab
-
-        if test_name == "T1":
-            current_mark = m1
-            mtotal = m1
-        elif test_name == "T2":
-            current_mark = m2
-            mtotal = c12 if c12 is not None else (m1 + m2 if m1 is not None and m2 is not None else mtotal)
-        elif test_name == "T3":
-            current_mark = m3
-            mtotal = c123 if c123 is not None else (m1 + m2 + m3 if m1 is not None and m2 is not None and m3 is not None else mtotal)
-        elif test_name == "T4":
-            current_mark = m4
-        elif test_name == "REMEDIAL":
-            current_mark = mtotal
-
         parsed_rows.append(
             {
                 "enrollment": enrollment,
-                "current_mark": current_mark,
-                "m1": m1,
-                "m2": m2,
-                "m3": m3,
-                "m4": m4,
-                "mtotal": mtotal,
-                "is_absent": is_absent,
+                "current_mark": cur,
+                "m1": v1,
+                "m2": v2,
+                "m3": v3,
+                "m4": v4,
+                "mtotal": tot,
+                "is_absent": ab,
+                "fail_flag": flag,
+                "fail_reason": reason,
             }
         )
     return parsed_rows
 
 
-@transaction.atomic
-def import_result_sheet(file_obj, upload: ResultUpload, progress_cb=None, cancel_cb=None):
-    if upload.test_name not in TESTS:
+def parse_result_sheet(file_obj, test_name, subject_name):
+    """
+    Parse a per-subject result sheet into rows for _save_import_rows.
+
+    Returns {"rows": [...], "columns": header used per mark}; no DB access.
+    """
+    if test_name not in TESTS:
         raise Exception("Invalid test")
 
     df = _build_df(file_obj)
@@ -406,37 +610,36 @@ def import_result_sheet(file_obj, upload: ResultUpload, progress_cb=None, cancel
     col_t3 = _find_col_any(cols, [["test-3", "25"], ["test 3", "25"], ["t3"], ["test-3"], ["test 3"]])
     col_t4 = _find_col_any(cols, [["test-4", "50"], ["test 4", "50"], ["see", "50"], ["t4", "50"], ["t4"], ["test-4"], ["test 4"]])
     col_total = _find_col_any(cols, [["total", "100"], ["total"]])
-    col_current = _current_mark_col(upload.test_name, upload.subject.name, cols)
-
-    usable_cols = [c for c in cols if c is not None]
-    if col_current is None:
-        best_idx = None
-        best_score = -1
-        for idx, _ in enumerate(usable_cols):
-            series = df.iloc[:, idx].dropna().head(100)
-            score = 0
-            for v in series:
-                mark, _abs = _to_mark(v)
-                if mark is not None:
-                    score += 1
-            if score > best_score:
-                best_score = score
-                best_idx = idx
-        col_current = best_idx
+    col_current = _current_mark_col(test_name, subject_name, cols)
+
+    marks, absent = _marks_matrix(df)
+    if col_current is None and marks.shape[1]:
+        # most numeric column, scored on its first 100 non-blank cells
+        filled = df.notna().to_numpy()
+        sampled = filled & (np.cumsum(filled, axis=0) <= 100)
+        col_current = int(np.argmax((sampled & ~np.isnan(marks)).sum(axis=0)))
+
+    missing = np.full(len(df), np.nan)
+
+    def col(idx):
+        return marks[:, idx] if idx is not None else missing
+
+    is_absent = absent[:, col_current] if col_current is not None else np.zeros(len(df), dtype=bool)
 
     parsed_rows = []
-    for _, row in df.iterrows():
-        enrollment = _clean_enrollment(row.iloc[enroll_idx])
+    for raw_enrollment, current_mark, m1, m2, m3, m4, mtotal, ab in zip(
+        df.iloc[:, enroll_idx].tolist(),
+        _nullable(col(col_current)),
+        _nullable(col(col_t1)),
+        _nullable(col(col_t2)),
+        _nullable(col(col_t3)),
+        _nullable(col(col_t4)),
+        _nullable(col(col_total)),
+        is_absent.tolist(),
+    ):
+        enrollment = _clean_enrollment(raw_enrollment)
         if not enrollment:
             continue
-
-        current_mark, is_absent = _to_mark(row.iloc[col_current]) if col_current is not None else (None, False)
-        m1, _ = _to_mark(row.iloc[col_t1]) if col_t1 is not None else (None, False)
-        m2, _ = _to_mark(row.iloc[col_t2]) if col_t2 is not None else (None, False)
-        m3, _ = _to_mark(row.iloc[col_t3]) if col_t3 is not None else (None, False)
-        m4, _ = _to_mark(row.iloc[col_t4]) if col_t4 is not None else (None, False)
-        mtotal, _ = _to_mark(row.iloc[col_total]) if col_total is not None else (None, False)
-
         parsed_rows.append(
             {
                 "enrollment": enrollment,
@@ -446,11 +649,31 @@ def import_result_sheet(file_obj, upload: ResultUpload, progress_cb=None, cancel
                 "m3": m3,
                 "m4": m4,
                 "mtotal": mtotal,
-                "is_absent": is_absent,
+                "is_absent": ab,
             }
         )
 
-    return _save_import_rows(upload, parsed_rows, progress_cb=progress_cb, cancel_cb=cancel_cb)
+    def header(idx):
+        return cols[idx] if idx is not None else None
+
+    return {
+        "rows": parsed_rows,
+        "columns": {
+            "enrollment": header(enroll_idx),
+            "current": header(col_current),
+            "t1": header(col_t1),
+            "t2": header(col_t2),
+            "t3": header(col_t3),
+            "t4": header(col_t4),
+            "total": header(col_total),
+        },
+    }
+
+
+@transaction.atomic
+def import_result_sheet(file_obj, upload: ResultUpload, progress_cb=None, cancel_cb=None, parsed=None):
+    parsed = parsed or parse_result_sheet(file_obj, upload.test_name, upload.subject.name)
+    return _save_import_rows(upload, parsed["rows"], progress_cb=progress_cb, cancel_cb=cancel_cb)
 
 
 def _exam_key_from_header(text):
@@ -481,26 +704,30 @@ def _exam_key_from_header(text):
     return ""
 
 
-@transaction.atomic
-def import_compiled_result_sheet(file_obj, upload: ResultUpload, progress_cb=None, cancel_cb=None):
+def parse_compiled_result_sheet(file_obj, test_name, subject_name):
+    """
+    Read the COMPILED sheet and check the block of one subject has the
+    columns `test_name` needs. Returns {"layout", "block"}; the rows are
+    built from it at import time, with the module's fail rule.
+    """
     layout = _read_compiled_layout(file_obj)
     found_subjects = layout["found_subjects"]
-    selected_block_name = _match_compiled_subject(upload.subject.name, found_subjects)
+    selected_block_name = _match_compiled_subject(subject_name, found_subjects)
 
     if not selected_block_name:
         raise Exception(
-            f"Selected subject '{upload.subject.name}' not found in COMPILED row 7. "
+            f"Selected subject '{subject_name}' not found in COMPILED row 7. "
             f"Found subjects: {', '.join(found_subjects)}"
         )
 
     cols = layout["blocks"][selected_block_name]
-    if upload.test_name == "T1":
+    if test_name == "T1":
         required = ["t1"]
-    elif upload.test_name == "T2":
+    elif test_name == "T2":
         required = ["t2", "t1", "t12"]
-    elif upload.test_name == "T3":
+    elif test_name == "T3":
         required = ["t3", "t1", "t2", "t123"]
-    elif upload.test_name == "T4":
+    elif test_name == "T4":
         required = ["t4_50", "t4_25", "t1", "t2", "t3", "total"]
     else:
         required = ["total"]
@@ -508,78 +735,336 @@ def import_compiled_result_sheet(file_obj, upload: ResultUpload, progress_cb=Non
     missing = [k for k in required if k not in cols]
     if missing:
         raise Exception(
-            f"Missing required columns for {upload.test_name} in subject '{selected_block_name}': {', '.join(missing)}"
+            f"Missing required columns for {test_name} in subject '{selected_block_name}': {', '.join(missing)}"
         )
+    return {"layout": layout, "block": selected_block_name}
 
-    parsed_rows = _build_rows_from_compiled_block(
-        layout["data_df"],
-        layout["enrollment_idx"],
-        cols,
-        upload.test_name,
-    )
 
-    summary = _save_import_rows(upload, parsed_rows, progress_cb=progress_cb, cancel_cb=cancel_cb)
-    summary["found_subjects"] = found_subjects
-    summary["used_subject"] = selected_block_name
-    return summary
+def _compiled_rows(parsed, test_name, rule):
+    layout = parsed["layout"]
+    return _build_rows_from_compiled_block(layout, layout["blocks"][parsed["block"]], test_name, rule)
 
 
 @transaction.atomic
-def import_compiled_bulk_all(file_obj, uploaded_by="", module=None, progress_cb=None, cancel_cb=None):
+def import_compiled_result_sheet(file_obj, upload: ResultUpload, progress_cb=None, cancel_cb=None, parsed=None):
+    parsed = parsed or parse_compiled_result_sheet(file_obj, upload.test_name, upload.subject.name)
+    rule = rule_utils.rule_for(upload.module, upload.test_name)
+    parsed_rows = _compiled_rows(parsed, upload.test_name, rule)
+
+    summary = _save_import_rows(upload, parsed_rows, progress_cb=progress_cb, cancel_cb=cancel_cb, rule=rule)
+    summary["found_subjects"] = parsed["layout"]["found_subjects"]
+    summary["used_subject"] = parsed["block"]
+    return summary
+
+
+def _upload_state(module, uploads):
+    return fingerprint_utils.state_key(
+        fingerprint_utils.roster_state(module),
+        rule_utils.rules_version(module),
+        *sorted((u.id, u.uploaded_at.isoformat()) for u in uploads),
+    )
+
+
+def parse_subject_result(file_obj, test_name, subject, upload_mode):
+    if upload_mode == "compiled":
+        return parse_compiled_result_sheet(file_obj, test_name, subject.name)
+    return parse_result_sheet(file_obj, test_name, subject.name)
+
+
+def preview_subject_result(file_obj, module, test_name, subject, upload_mode, parsed=None):
+    """
+    Dry run of import_subject_result against the live upload of the
+    test/subject. Returns (parsed, summary).
+    """
+    parsed = parsed or parse_subject_result(file_obj, test_name, subject, upload_mode)
+    upload = ResultUpload.objects.live().filter(module=module, test_name=test_name, subject=subject).first()
+    if upload is None:
+        upload = ResultUpload(module=module, test_name=test_name, subject=subject)
+    rule = rule_utils.rule_for(module, test_name)
+    if upload_mode == "compiled":
+        rows = _compiled_rows(parsed, test_name, rule)
+    else:
+        rows = parsed["rows"]
+    summary = _save_import_rows(upload, rows, rule=rule, dry_run=True)
+    if upload_mode == "compiled":
+        summary["found_subjects"] = parsed["layout"]["found_subjects"]
+        summary["used_subject"] = parsed["block"]
+    else:
+        summary["columns"] = parsed["columns"]
+    return parsed, summary
+
+
+def import_subject_result(file_obj, module, test_name, subject, upload_mode, uploaded_by="", progress_cb=None, cancel_cb=None, parsed=None):
+    """
+    Import one test/subject sheet (upload_mode "compiled" or per-subject).
+
+    An identical re-upload into an untouched upload returns the previous
+    summary without parsing (summary["unchanged"] is True). `parsed` is a
+    parse_subject_result() of the same file (cached by a preview).
+    Returns (upload, summary).
+    """
+    sha256 = fingerprint_utils.file_sha256(file_obj)
+    scope = f"{test_name}-{subject.id}-{upload_mode}"
+
+    upload = ResultUpload.objects.live().filter(module=module, test_name=test_name, subject=subject).first()
+    if upload:
+        previous = fingerprint_utils.lookup(
+            module, ImportFingerprint.KIND_RESULT, scope, sha256, _upload_state(module, [upload])
+        )
+        if previous is not None:
+            return upload, {**previous, "unchanged": True}
+
+    upload, _ = ResultUpload.objects.update_or_create(
+        module=module,
+        test_name=test_name,
+        subject=subject,
+        generation=module.result_generation,
+        defaults={"uploaded_by": uploaded_by},
+    )
+
+    if upload_mode == "compiled":
+        summary = import_compiled_result_sheet(file_obj, upload, progress_cb=progress_cb, cancel_cb=cancel_cb, parsed=parsed)
+    else:
+        summary = import_result_sheet(file_obj, upload, progress_cb=progress_cb, cancel_cb=cancel_cb, parsed=parsed)
+
+    upload.refresh_from_db(fields=["uploaded_at"])
+    fingerprint_utils.remember(
+        module, ImportFingerprint.KIND_RESULT, scope, sha256, _upload_state(module, [upload]), summary
+    )
+    return upload, summary
+
+
+def _carry_new_outcomes(replaced, uploads):
+    """
+    Copy call outcomes mentors recorded on the replaced uploads while the
+    new generation was being built. `uploads` maps (test_name, subject_id)
+    to the new upload; run inside the swap transaction.
+    """
+    sources = {uploads[key].id: old.id for key, old in replaced.items() if key in uploads}
+    if not sources:
+        return 0
+    targets = {old_id: new_id for new_id, old_id in sources.items()}
+    # locks the old calls, so saves already in flight finish first
+    prior_calls = {
+        (targets[c.upload_id], c.student_id): c
+        for c in ResultCallRecord.all_objects.select_for_update().filter(upload_id__in=list(targets))
+    }
+
+    changed = []
+    carried = set()
+    for call in ResultCallRecord.all_objects.filter(upload_id__in=list(sources)):
+        carried.add((call.upload_id, call.student_id))
+        prior = prior_calls.get((call.upload_id, call.student_id))
+        if prior is not None and any(getattr(call, f) != getattr(prior, f) for f in OUTCOME_FIELDS):
+            changed.append(_inherit(call, prior))
+
+    # a call the new sheet no longer flags keeps its outcome retired, as in _save_import_rows
+    in_sheet = set(StudentResult.objects.filter(upload_id__in=list(sources)).values_list("upload_id", "student_id"))
+    now = timezone.now()
+    new_calls = [
+        _inherit(ResultCallRecord(upload_id=key[0], student_id=key[1], retired_at=now), prior)
+        for key, prior in prior_calls.items()
+        if key not in carried and key in in_sheet and _has_outcome(prior)
+    ]
+
+    ResultCallRecord.all_objects.bulk_update(changed, list(OUTCOME_FIELDS), batch_size=BULK_BATCH_SIZE)
+    ResultCallRecord.all_objects.bulk_create(new_calls, batch_size=BULK_BATCH_SIZE)
+    return len(changed) + len(new_calls)
+
+
+def _next_generation(module):
+    top = ResultUpload.objects.filter(module=module).aggregate(g=Max("generation"))["g"]
+    return max(top if top is not None else 0, module.result_generation) + 1
+
+
+def collect_result_generations(module, stale_hours=STALE_GENERATION_HOURS):
+    """
+    Delete result uploads of retired generations (and staged ones abandoned
+    for `stale_hours`). Returns the number of uploads removed.
+    """
+    live = AcademicModule.objects.filter(id=module.id).values_list("result_generation", flat=True).first()
+    if live is None:
+        return 0
+    abandoned = timezone.now() - timedelta(hours=stale_hours)
+    old = ResultUpload.objects.filter(module=module).filter(
+        Q(generation__lt=live) | Q(generation__gt=live, uploaded_at__lt=abandoned)
+    )
+    ids = list(old.values_list("id", flat=True))
+    for start in range(0, len(ids), BULK_BATCH_SIZE):
+        # small transactions: mentors keep reading the live generation meanwhile
+        with transaction.atomic():
+            ResultUpload.objects.filter(id__in=ids[start:start + BULK_BATCH_SIZE]).delete()
+    return len(ids)
+
+
+def _bulk_blocks(layout, module):
+    """(subject, block columns, tests) for every active subject found in the compiled sheet."""
+    out = []
+    for s in Subject.objects.filter(module=module, is_active=True).order_by("name"):
+        block = _match_compiled_subject(s.name, layout["found_subjects"])
+        if not block:
+            continue
+        tests = ["T4"] if s.result_format == Subject.FORMAT_T4_ONLY else ["T1", "T2", "T3", "T4"]
+        out.append((s, layout["blocks"][block], tests))
+    return out
+
+
+def parse_compiled_bulk(file_obj):
+    return _read_compiled_layout(file_obj)
+
+
+def preview_compiled_bulk(file_obj, module, parsed=None):
+    """
+    Dry run of import_compiled_bulk_all: every upload it would create,
+    diffed against the live one. Returns (parsed, summary).
+    """
+    layout = parsed or parse_compiled_bulk(file_obj)
+    students = _student_map(module)
+    rules = rule_utils.rules_for(module)
+    replaced = {
+        (u.test_name, u.subject_id): u for u in ResultUpload.objects.live().filter(module=module)
+    }
+
+    summary = {
+        "uploads_created": 0, "rows_total": 0, "rows_matched": 0, "rows_failed": 0,
+        "found_subjects": layout["found_subjects"], "processed": [], "diff": {},
+        "unmatched": 0, "unmatched_sample": [], "sample": [],
+    }
+    for s, cols, tests in _bulk_blocks(layout, module):
+        for test_name in tests:
+            rows = _build_rows_from_compiled_block(layout, cols, test_name, rules[test_name])
+            part = _save_import_rows(
+                ResultUpload(module=module, test_name=test_name, subject=s),
+                rows,
+                students=students,
+                replaced=replaced.get((test_name, s.id)),
+                rule=rules[test_name],
+                dry_run=True,
+            )
+            summary["uploads_created"] += 1
+            for key in ("rows_total", "rows_matched", "rows_failed"):
+                summary[key] += part[key]
+            for key, n in part["diff"].items():
+                summary["diff"][key] = summary["diff"].get(key, 0) + n
+            # every upload reads the same enrollment column; report it once
+            if not summary["processed"]:
+                summary["unmatched"] = part["unmatched"]
+                summary["unmatched_sample"] = part["unmatched_sample"]
+            room = SAMPLE_SIZE - len(summary["sample"])
+            summary["sample"] += [{"upload": f"{test_name}-{s.name}", **row} for row in part["sample"][:room]]
+            summary["processed"].append(f"{test_name}-{s.name}")
+    return layout, summary
+
+
+def import_compiled_bulk_all(file_obj, uploaded_by="", module=None, progress_cb=None, cancel_cb=None, parsed=None):
+    """
+    Replace every result upload of the module from one compiled sheet.
+
+    The uploads are written into a new generation that readers (`.live()`)
+    do not see; the module's generation pointer flips to it in one UPDATE
+    at the end, with call outcomes mentors saved during the build, and the
+    old generation is deleted by a background job.
+    `parsed` is a parse_compiled_bulk() of the same file (cached by a preview).
+    """
     if module is None:
         raise Exception("Module is required for bulk import")
-    layout = _read_compiled_layout(file_obj)
-    found_subjects = layout["found_subjects"]
 
-    subjects = list(Subject.objects.filter(module=module, is_active=True).order_by("name"))
-    subject_to_block = {}
-    for s in subjects:
-        block = _match_compiled_subject(s.name, found_subjects)
-        if block:
-            subject_to_block[s.id] = block
+    sha256 = fingerprint_utils.file_sha256(file_obj)
+    previous = fingerprint_utils.lookup(
+        module,
+        ImportFingerprint.KIND_RESULT,
+        "ALL_EXAMS",
+        sha256,
+        _upload_state(module, ResultUpload.objects.filter(module=module).live()),
+    )
+    if previous is not None:
+        return {**previous, "unchanged": True}
+
+    layout = parsed or _read_compiled_layout(file_obj)
+    found_subjects = layout["found_subjects"]
 
-    # Replace all old result uploads as requested.
-    ResultUpload.objects.filter(module=module).delete()
+    generation = _next_generation(module)
+    students = _student_map(module)
+    rules = rule_utils.rules_for(module)
 
+    # uploads being replaced: their call outcomes carry over, the diff is taken against them
+    replaced = {
+        (u.test_name, u.subject_id): u for u in ResultUpload.objects.live().filter(module=module)
+    }
+    uploads = {}
+    diff = {}
     uploads_created = 0
     rows_total = 0
     rows_matched = 0
     rows_failed = 0
     processed = []
 
-    for s in subjects:
-        block = subject_to_block.get(s.id)
-        if not block:
-            continue
-        cols = layout["blocks"][block]
-        tests = ["T4"] if s.result_format == Subject.FORMAT_T4_ONLY else ["T1", "T2", "T3", "T4"]
-        for test_name in tests:
-            if cancel_cb and cancel_cb():
-                raise Exception("Upload cancelled by user.")
-            upload = ResultUpload.objects.create(
-                module=module,
-                test_name=test_name,
-                subject=s,
-                uploaded_by=uploaded_by,
-            )
-            parsed_rows = _build_rows_from_compiled_block(
-                layout["data_df"],
-                layout["enrollment_idx"],
-                cols,
-                test_name,
-            )
-            summary = _save_import_rows(upload, parsed_rows, progress_cb=progress_cb, cancel_cb=cancel_cb)
-            uploads_created += 1
-            rows_total += summary["rows_total"]
-            rows_matched += summary["rows_matched"]
-            rows_failed += summary["rows_failed"]
-            processed.append(f"{test_name}-{s.name}")
+    try:
+        for s, cols, tests in _bulk_blocks(layout, module):
+            for test_name in tests:
+                if cancel_cb and cancel_cb():
+                    raise Exception("Upload cancelled by user.")
+                with transaction.atomic():
+                    upload = ResultUpload.objects.create(
+                        module=module,
+                        test_name=test_name,
+                        subject=s,
+                        uploaded_by=uploaded_by,
+                        generation=generation,
+                    )
+                    parsed_rows = _build_rows_from_compiled_block(layout, cols, test_name, rules[test_name])
+                    summary = _save_import_rows(
+                        upload,
+                        parsed_rows,
+                        progress_cb=progress_cb,
+                        cancel_cb=cancel_cb,
+                        students=students,
+                        replaced=replaced.get((test_name, s.id)),
+                        rule=rules[test_name],
+                    )
+                uploads[(test_name, s.id)] = upload
+                uploads_created += 1
+                rows_total += summary["rows_total"]
+                rows_matched += summary["rows_matched"]
+                rows_failed += summary["rows_failed"]
+                for key, n in summary["diff"].items():
+                    diff[key] = diff.get(key, 0) + n
+                processed.append(f"{test_name}-{s.name}")
+
+        # the swap: readers move from the old generation to the new one at once,
+        # together with outcomes saved on the old calls since they were copied
+        with transaction.atomic():
+            _carry_new_outcomes(replaced, uploads)
+            AcademicModule.objects.filter(id=module.id).update(result_generation=generation)
+        module.result_generation = generation
+    except BaseException:
+        ResultUpload.objects.filter(module=module, generation=generation).delete()
+        raise
+
+    from . import job_utils
+
+    job_utils.enqueue(
+        BackgroundJob.KIND_RESULT_GC,
+        module,
+        created_by=uploaded_by,
+        message="Removing replaced result uploads...",
+    )
 
-    return {
+    summary = {
         "uploads_created": uploads_created,
         "rows_total": rows_total,
         "rows_matched": rows_matched,
         "rows_failed": rows_failed,
         "found_subjects": found_subjects,
         "processed": processed,
+        "diff": diff,
     }
+    fingerprint_utils.remember(
+        module,
+        ImportFingerprint.KIND_RESULT,
+        "ALL_EXAMS",
+        sha256,
+        _upload_state(module, ResultUpload.objects.filter(module=module).live()),
+        summary,
+    )
+    return summary
@@ -0,0 +1,246 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import fingerprint_utils
+from .models import ResultCallRecord, ResultRule, ResultUpload, StudentResult
+
+
+# test -> (current_below, total_below, needs_total); a module's ResultRule rows override these
+DEFAULT_RESULT_RULES = {
+    "T1": (9, 9, False),
+    "T2": (9, 18, True),
+    "T3": (9, 27, True),
+    "T4": (18, 35, True),
+    "REMEDIAL": (35, 35, False),
+}
+
+# test -> (current mark name, total name) in fail reasons, (short current, short total) in filter labels
+RULE_NAMES = {
+    "T1": ("T1", "(T1)", "T1", "till T1"),
+    "T2": ("T2", "(T1+T2)", "T2", "T1+T2"),
+    "T3": ("T3", "(T1+T2+T3)", "T3", "T1+T2+T3"),
+    "T4": ("SEE", "(T1+T2+T3+SEE)", "T4", "T1+T2+T3+T4"),
+    "REMEDIAL": ("REMEDIAL", "(REMEDIAL)", "REM", "REM"),
+}
+
+
+class FailRule:
+    """
+    Fail thresholds of one test, usable as a scalar check, a NumPy
+    predicate over mark columns and a Django Q filter on StudentResult.
+
+    A row fails when marks_current < current_below and (when needs_total)
+    marks_total < total_below; a missing mark never fails.
+    """
+
+    def __init__(self, test_name, current_below, total_below, needs_total=True):
+        self.test_name = test_name
+        self.current_below = current_below
+        self.total_below = total_below
+        self.needs_total = needs_total
+
+    @property
+    def reason(self):
+        current_name, total_name, _, _ = RULE_NAMES.get(self.test_name, (self.test_name,) * 4)
+        text = f"Less than {self.current_below:g} marks in {current_name}"
+        if self.needs_total:
+            text += f" & less than {self.total_below:g} in {total_name}"
+        return text
+
+    @property
+    def current_label(self):
+        return f"{RULE_NAMES.get(self.test_name, (self.test_name,) * 4)[2]}<{self.current_below:g}"
+
+    @property
+    def total_label(self):
+        return f"{RULE_NAMES.get(self.test_name, (self.test_name,) * 4)[3]}<{self.total_below:g}"
+
+    @property
+    def either_label(self):
+        if self.current_label == self.total_label:
+            return f"Either ({self.current_label})"
+        return f"Either ({self.current_label} OR {self.total_label})"
+
+    def key(self):
+        return (self.test_name, float(self.current_below), float(self.total_below), bool(self.needs_total))
+
+    # ---------------- SCALAR ----------------
+
+    def check(self, marks_current, marks_total):
+        """(fail, reason) for one row; the reason is empty when the current mark is missing."""
+        if marks_current is None:
+            return False, ""
+        fail = marks_current < self.current_below
+        if self.needs_total:
+            fail = fail and marks_total is not None and marks_total < self.total_below
+        return fail, self.reason
+
+    def below_either(self, marks_current, marks_total):
+        # the "current OR total" view used by reports and the SIF
+        return (
+            (marks_current is not None and marks_current < self.current_below)
+            or (marks_total is not None and marks_total < self.total_below)
+        )
+
+    # ---------------- NUMPY ----------------
+
+    def mask(self, marks_current, marks_total):
+        """check() over whole float columns (NaN = missing); returns (fail mask, reasons)."""
+        has_current = ~np.isnan(marks_current)
+        with np.errstate(invalid="ignore"):
+            fail = marks_current < self.current_below
+            if self.needs_total:
+                fail &= marks_total < self.total_below
+        reasons = np.where(has_current, self.reason, "")
+        return fail & has_current, reasons
+
+    # ---------------- Q ----------------
+
+    def q_current(self, prefix=""):
+        return Q(**{f"{prefix}marks_current__lt": self.current_below})
+
+    def q_total(self, prefix=""):
+        return Q(**{f"{prefix}marks_total__lt": self.total_below})
+
+    def q_either(self, prefix=""):
+        return self.q_current(prefix) | self.q_total(prefix)
+
+    def q_fail(self, prefix=""):
+        if self.needs_total:
+            return self.q_current(prefix) & self.q_total(prefix)
+        return self.q_current(prefix)
+
+
+def default_rule(test_name):
+    test_name = (test_name or "").upper()
+    current_below, total_below, needs_total = DEFAULT_RESULT_RULES.get(test_name, DEFAULT_RESULT_RULES["REMEDIAL"])
+    return FailRule(test_name if test_name in DEFAULT_RESULT_RULES else "REMEDIAL", current_below, total_below, needs_total)
+
+
+def rules_for(module):
+    """test name -> FailRule of a module (defaults overridden by its ResultRule rows)."""
+    rules = {test: default_rule(test) for test in DEFAULT_RESULT_RULES}
+    if module is None:
+        return rules
+    for r in ResultRule.objects.filter(module=module):
+        rules[r.test_name] = FailRule(r.test_name, r.current_below, r.total_below, r.needs_total)
+    return rules
+
+
+def rule_for(module, test_name):
+    rules = rules_for(module)
+    return rules.get((test_name or "").upper()) or rules["REMEDIAL"]
+
+
+def rules_version(module, rules=None):
+    """Hash of the effective rules; part of the result import fingerprint state."""
+    rules = rules or rules_for(module)
+    return fingerprint_utils.state_key(*(rules[t].key() for t in sorted(rules)))
+
+
+@transaction.atomic
+def save_rules(module, rules):
+    """
+    Store `rules` (test -> FailRule) for the module and re-flag its results;
+    rules equal to the default keep no row. Returns reflag_module's counts.
+    """
+    for test_name, rule in rules.items():
+        if rule.key() == default_rule(test_name).key():
+            ResultRule.objects.filter(module=module, test_name=test_name).delete()
+            continue
+        ResultRule.objects.update_or_create(
+            module=module,
+            test_name=test_name,
+            defaults={
+                "current_below": rule.current_below,
+                "total_below": rule.total_below,
+                "needs_total": rule.needs_total,
+            },
+        )
+    return reflag_module(module, rules_for(module))
+
+
+# ---------------- RE-FLAG ----------------
+
+@transaction.atomic
+def reflag_module(module, rules=None):
+    """
+    Re-apply the fail rules to every live result of the module in place.
+
+    Flags and reasons are rewritten by one UPDATE over all uploads; calls
+    follow the new flags the way a re-upload would (retired when the
+    student no longer fails, restored with their outcome when they fail
+    again, created when missing) and rows_failed is recounted per upload.
+    """
+    rules = rules or rules_for(module)
+    uploads = dict(
+        ResultUpload.objects.live().filter(module=module).values_list("id", "test_name")
+    )
+    if not uploads:
+        return {"flagged": 0, "calls_added": 0, "calls_retired": 0, "calls_restored": 0}
+
+    by_test = {}
+    for upload_id, test_name in uploads.items():
+        by_test.setdefault(test_name, []).append(upload_id)
+
+    flag_cases = []
+    reason_cases = []
+    for test_name, ids in by_test.items():
+        rule = rules.get(test_name) or rules["REMEDIAL"]
+        flag_cases.append(When(Q(upload_id__in=ids) & rule.q_fail(), then=Value(True)))
+        reason_cases.append(When(upload_id__in=ids, marks_current__isnull=False, then=Value(rule.reason)))
+
+    results = StudentResult.objects.filter(upload_id__in=list(uploads))
+    results.update(
+        fail_flag=Case(*flag_cases, default=Value(False)),
+        fail_reason=Case(*reason_cases, default=Value("")),
+    )
+
+    now = timezone.now()
+    failing = StudentResult.objects.filter(upload=OuterRef("upload"), student=OuterRef("student"), fail_flag=True)
+    calls = ResultCallRecord.all_objects.filter(upload_id__in=list(uploads))
+
+    calls_retired = calls.filter(retired_at__isnull=True).exclude(Exists(failing)).update(retired_at=now)
+    calls_restored = calls.filter(retired_at__isnull=False).filter(Exists(failing)).count()
+    calls.filter(Exists(failing)).update(
+        retired_at=None,
+        fail_reason=Subquery(failing.values("fail_reason")[:1]),
+        marks_current=Coalesce(Subquery(failing.values("marks_current")[:1]), Value(0.0)),
+        marks_total=Subquery(failing.values("marks_total")[:1]),
+    )
+
+    has_call = ResultCallRecord.all_objects.filter(upload=OuterRef("upload"), student=OuterRef("student"))
+    missing = results.filter(fail_flag=True).exclude(Exists(has_call))
+    new_calls = [
+        ResultCallRecord(
+            upload_id=upload_id,
+            student_id=student_id,
+            fail_reason=fail_reason,
+            marks_current=marks_current or 0,
+            marks_total=marks_total,
+        )
+        for upload_id, student_id, fail_reason, marks_current, marks_total in missing.values_list(
+            "upload_id", "student_id", "fail_reason", "marks_current", "marks_total"
+        )
+    ]
+    ResultCallRecord.all_objects.bulk_create(new_calls, batch_size=500)
+
+    failed_count = (
+        StudentResult.objects.filter(upload=OuterRef("pk"), fail_flag=True)
+        .values("upload")
+        .annotate(c=Count("id"))
+        .values("c")
+    )
+    ResultUpload.objects.filter(id__in=list(uploads)).update(
+        rows_failed=Coalesce(Subquery(failed_count, output_field=IntegerField()), Value(0))
+    )
+
+    return {
+        "flagged": results.filter(fail_flag=True).count(),
+        "calls_added": len(new_calls),
+        "calls_retired": calls_retired,
+        "calls_restored": calls_restored,
+    }
@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Attendance, CallRecord, MentorWeekStats, Student
+
+
+# counters taken from CallRecord; need_call comes from Attendance
+CALL_COUNTERS = ("calls", "received", "not_received", "msg_sent")
+
+# rows per INSERT statement when a whole module is refreshed
+BULK_BATCH_SIZE = 500
+
+
+def _count_cells(scope):
+    """{(mentor_id, week_no): counters} of the students in `scope`, from two grouped queries."""
+    key = ("student__mentor_id", "week_no")
+    cells = {}
+    need = (
+        Attendance.objects.filter(scope, call_required=True)
+        .values(*key)
+        .annotate(need_call=Count("id"))
+        .order_by()
+    )
+    for row in need:
+        cells.setdefault((row["student__mentor_id"], row["week_no"]), {})["need_call"] = row["need_call"]
+
+    calls = (
+        CallRecord.objects.filter(scope)
+        .values(*key)
+        .annotate(
+            calls=Count("id"),
+            received=Count("id", filter=Q(final_status="received")),
+            not_received=Count("id", filter=Q(final_status="not_received")),
+            msg_sent=Count("id", filter=Q(message_sent=True)),
+        )
+        .order_by()
+    )
+    for row in calls:
+        cells.setdefault((row["student__mentor_id"], row["week_no"]), {}).update(
+            {name: row[name] for name in CALL_COUNTERS}
+        )
+    return cells
+
+
+# ---------------- REFRESH ----------------
+
+def refresh(module_id, weeks=None, mentor_ids=None):
+    """
+    Recount the MentorWeekStats of a module from Attendance and CallRecord,
+    optionally only for some weeks and / or mentors, and return the number
+    of cells written. Cells left without calls or call-required rows are
+    dropped.
+
+    Call it inside the transaction that changed the rows: the stored cells
+    of the scope are locked first, so two writers of one mentor-week count
+    in turn and the later one sees the earlier one's rows.
+    """
+    scope = Q(student__module_id=module_id)
+    stored = MentorWeekStats.objects.filter(module_id=module_id)
+    if weeks is not None:
+        scope &= Q(week_no__in=weeks)
+        stored = stored.filter(week_no__in=weeks)
+    if mentor_ids is not None:
+        scope &= Q(student__mentor_id__in=mentor_ids)
+        stored = stored.filter(mentor_id__in=mentor_ids)
+
+    with transaction.atomic():
+        existing = {
+            (mentor_id, week_no): stat_id
+            for stat_id, mentor_id, week_no in stored.select_for_update().values_list("id", "mentor_id", "week_no")
+        }
+        cells = _count_cells(scope)
+
+        MentorWeekStats.objects.bulk_create(
+            [
+                MentorWeekStats(
+                    module_id=module_id,
+                    mentor_id=mentor_id,
+                    week_no=week_no,
+                    need_call=counts.get("need_call", 0),
+                    **{name: counts.get(name, 0) for name in CALL_COUNTERS},
+                )
+                for (mentor_id, week_no), counts in cells.items()
+            ],
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["module", "mentor", "week_no"],
+            update_fields=["need_call", *CALL_COUNTERS, "updated_at"],
+        )
+        gone = [stat_id for key, stat_id in existing.items() if key not in cells]
+        if gone:
+            MentorWeekStats.objects.filter(id__in=gone).delete()
+    return len(cells)
+
+
+def refresh_modules(module_ids):
+    """Full refresh of several modules, e.g. after students moved between mentors."""
+    for module_id in sorted(set(module_ids)):
+        refresh(module_id)
+
+
+def save_call(call, update_fields=None):
+    """Save an attendance CallRecord and recount its mentor-week in the same transaction."""
+    with transaction.atomic():
+        call.save(update_fields=update_fields)
+        module_id, mentor_id = Student.objects.filter(id=call.student_id).values_list("module_id", "mentor_id").get()
+        refresh(module_id, weeks=[call.week_no], mentor_ids=[mentor_id])
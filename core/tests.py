@@ -1,3 +1,1065 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase, override_settings
+from openpyxl import Workbook
+
+from . import (
+    attendance_utils,
+    job_utils,
+    practical_utils,
+    report_utils,
+    result_utils,
+    rule_utils,
+    upload_utils,
+    workbook,
+)
+from .management.commands.benchmark_attendance import _classify_loop
+from .mobile_api import _issue_staff_token
+from .models import (
+    AcademicModule,
+    Attendance,
+    BackgroundJob,
+    CallRecord,
+    ChunkedUpload,
+    CoordinatorModuleAccess,
+    Mentor,
+    MentorWeekStats,
+    ResultCallRecord,
+    ResultRule,
+    ResultUpload,
+    Student,
+    StudentPracticalMark,
+    StudentResult,
+    Subject,
+    WeekLock,
+)
+
+
+# ---------------- FIXTURES ----------------
+
+MENTORS = [("ABC", "Alpha Beta Charlie"), ("DEF", "Delta Echo Fox")]
+
+
+def _workbook(rows, name="sheet.xlsx", title=None, merge=None):
+    """An uploaded .xlsx holding `rows` on its first sheet."""
+    wb = Workbook()
+    ws = wb.active
+    if title:
+        ws.title = title
+    for row in rows:
+        ws.append(list(row))
+    if merge:
+        ws.merge_cells(merge)
+    out = io.BytesIO()
+    wb.save(out)
+    return SimpleUploadedFile(name, out.getvalue())
+
+
+def _student_rows(enrollments, mentors=MENTORS):
+    rows = [
+        ["LJ University"],
+        [],
+        # the full-name column comes first: "name of mentor" also matches the short-name header
+        ["Roll No", "Enrollment No", "Name of Student", "Name of Mentor", "Short Name of Mentor",
+         "Student Mobile", "Father Mobile", "Mother Mobile", "Branch"],
+    ]
+    for i, enrollment in enumerate(enrollments):
+        short, full = mentors[i % len(mentors)]
+        rows.append([i + 1, int(enrollment), f"Student {i}", full, short, 9800000000 + i, 9700000000 + i, None, "CE"])
+    return rows
+
+
+def _attendance_rows(percentages):
+    """Rows of an attendance sheet of {enrollment: fraction} in the college export layout."""
+    rows = [
+        ["Attendance report"],
+        [],
+        ["Roll No", "Name", "Enrollment No", "Lectures", "Attendance", None],
+        [None, None, None, "Total", "Overall", "Count"],
+    ]
+    for i, (enrollment, fraction) in enumerate(percentages.items()):
+        rows.append([i + 1, f"Student {i}", int(enrollment), 40, fraction, 10])
+    return rows
+
+
+def _attendance_file(percentages, name="week.xlsx"):
+    return _workbook(_attendance_rows(percentages), name=name, title="OVERALL", merge="E3:F3")
+
+
+def _attendance_batch(sheets, name="batch.xlsx"):
+    """Multi-sheet batch workbook of {sheet title: {enrollment: fraction}}."""
+    wb = Workbook()
+    wb.remove(wb.active)
+    for title, percentages in sheets.items():
+        ws = wb.create_sheet(title)
+        for row in _attendance_rows(percentages):
+            ws.append(row)
+        ws.merge_cells("E3:F3")
+    out = io.BytesIO()
+    wb.save(out)
+    return SimpleUploadedFile(name, out.getvalue())
+
+
+def _result_file(marks, name="result.xlsx"):
+    """Per-subject result sheet of {enrollment: Test-1 mark}."""
+    rows = [
+        ["Result"],
+        ["Sr No", "Enrollment No", "Name", "Test-1", "Test-2", "Total"],
+        [None, None, None, "25", "25", "100"],
+    ]
+    for i, (enrollment, mark) in enumerate(marks.items()):
+        rows.append([i + 1, int(enrollment), f"Student {i}", mark, None, None])
+    return _workbook(rows, name=name)
+
+
+def _compiled_file(marks, subject="Java Programming", name="compiled.xlsx"):
+    """COMPILED sheet with one subject block of {enrollment: (t1, t2, t3, t4)} marks out of 25/25/25/50."""
+    heads = ["Test-1 (25)", "Test-2 (25)", "T1+T2 (50)", "Test-3 (25)", "T1+T2+T3 (75)",
+             "Test-4 (50)", "Test-4 (25)", "Total (100)"]
+    rows = [["x"]] * 6 + [
+        ["Sr", "Enrollment No", "Name", subject] + [None] * (len(heads) - 1),
+        ["", "", ""] + heads,
+    ]
+    for i, (enrollment, (t1, t2, t3, t4)) in enumerate(marks.items()):
+        rows.append([i + 1, int(enrollment), f"Student {i}", t1, t2, t1 + t2, t3, t1 + t2 + t3, t4, t4 / 2,
+                     t1 + t2 + t3 + t4 / 2])
+    return _workbook(rows, name=name, title="COMPILED")
+
+
+def _csv_file(rows, name="sheet.csv", delimiter=",", encoding="utf-8"):
+    """The same rows saved as a CSV/TSV export (blank cells empty)."""
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=delimiter, lineterminator="\r\n")
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+    return SimpleUploadedFile(name, out.getvalue().encode(encoding))
+
+
+def _same_file(upload):
+    """A second upload with the exact bytes of `upload`."""
+    upload.seek(0)
+    return SimpleUploadedFile(upload.name, upload.read())
+
+
+def _run_jobs():
+    # the worker's connection cleanup must not end the test's transaction
+    with mock.patch("core.job_utils.close_old_connections"):
+        return job_utils.drain("tests")
+
+
+class ModuleTestCase(TestCase):
+    """A module with two mentors' students, a coordinator logged in to it, and a private job spool."""
+
+    enrollments = ["240101000000", "240101000001", "240101000002", "240101000003"]
+
+    def setUp(self):
+        spool = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool, True)
+        settings_override = override_settings(JOB_SPOOL_DIR=spool, JOBS_IN_PROCESS=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.module = AcademicModule.objects.create(name="FY-A", academic_batch="2026")
+        self.user = User.objects.create_user("coord_a", password="x")
+        CoordinatorModuleAccess.objects.create(coordinator=self.user, module=self.module)
+        self.client.force_login(self.user)
+
+    def import_students(self, enrollments=None):
+        from .utils import import_students_from_excel
+
+        return import_students_from_excel(_workbook(_student_rows(enrollments or self.enrollments)), self.module)
+
+
+# ---------------- STUDENTS ----------------
+
+class StudentImportTests(ModuleTestCase):
+    def test_upsert_updates_creates_and_merges_mentor_names(self):
+        # an earlier upload without short names left a mentor keyed by full name
+        full_name_bucket = Mentor.objects.create(name="Alpha Beta Charlie")
+        other = AcademicModule.objects.create(name="FY-B", academic_batch="2026")
+        elsewhere = Student.objects.create(module=other, enrollment="250101000000", name="Other", mentor=full_name_bucket)
+        existing = Student.objects.create(
+            module=self.module, enrollment=self.enrollments[0], name="Old Name", mentor=full_name_bucket
+        )
+
+        added, updated, skipped, skipped_rows = self.import_students(self.enrollments[:2])
+        self.assertEqual((added, updated, skipped, skipped_rows), (1, 1, 0, []))
+
+        abc = Mentor.objects.get(name="ABC")
+        self.assertEqual(abc.full_name, "Alpha Beta Charlie")
+        self.assertFalse(Mentor.objects.filter(id=full_name_bucket.id).exists())
+        self.assertEqual(sorted(Mentor.objects.values_list("name", flat=True)), ["ABC", "DEF"])
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.name, existing.roll_no, existing.mentor_id), ("Student 0", 1, abc.id))
+        created = Student.objects.get(module=self.module, enrollment=self.enrollments[1])
+        self.assertEqual(created.mentor.name, "DEF")
+        elsewhere.refresh_from_db()
+        self.assertEqual(elsewhere.mentor_id, abc.id)
+
+        # a later sheet with only the full name resolves to the short-name mentor
+        from .utils import import_students_from_excel
+
+        rows = _student_rows([self.enrollments[2]], mentors=[(None, "delta echo fox")])
+        self.assertEqual(import_students_from_excel(_workbook(rows), self.module)[:3], (1, 0, 0))
+        self.assertEqual(Student.objects.get(enrollment=self.enrollments[2]).mentor.name, "DEF")
+        self.assertEqual(Mentor.objects.count(), 2)
+
+
+# ---------------- ATTENDANCE ----------------
+
+class ClassifyAttendanceTests(SimpleTestCase):
+    def assertMatchesLoop(self, weekly, overall, student_ids, threshold=80):
+        for rule in ("both", "week", "overall"):
+            ids, week, over, call_required = attendance_utils.classify_attendance(
+                weekly, overall, student_ids, rule, threshold
+            )
+            vectorized = list(zip(ids.tolist(), week.tolist(), over.tolist(), call_required.tolist()))
+            self.assertEqual(vectorized, _classify_loop(weekly, overall, student_ids, rule, threshold), rule)
+
+    def test_matches_loop(self):
+        weekly = {"E1": 90.0, "E2": 79.99, "E3": 80.0, "E4": 55.5, "E5": 100.0, "E6": 62.0}
+        # E4 is not a student, E5/E6 are missing from the overall sheet
+        overall = {"E1": 70.0, "E2": 95.0, "E3": 80.0, "E4": 90.0, "E9": 10.0}
+        student_ids = {"E6": 6, "E3": 3, "E2": 2, "E1": 1, "E5": 5, "E7": 7}
+        self.assertMatchesLoop(weekly, overall, student_ids)
+        self.assertMatchesLoop(weekly, overall, student_ids, threshold=75)
+
+    def test_generated_sheet_matches_loop(self):
+        weekly = {f"E{i:05d}": (i * 37 % 6000) / 100 + 40 for i in range(2000)}
+        overall = {k: v - 5 for k, v in list(weekly.items())[:1950]}
+        student_ids = {k: i + 1 for i, k in enumerate(list(weekly)[20:])}
+        self.assertMatchesLoop(weekly, overall, student_ids)
+
+    def test_empty_inputs(self):
+        self.assertMatchesLoop({}, {}, {})
+        self.assertMatchesLoop({"E1": 50.0}, {}, {"E1": 1})
+        self.assertMatchesLoop({"E1": 50.0}, {"E1": 90.0}, {})
+
+
+class AttendanceImportTests(ModuleTestCase):
+    def _row_by_row_import(self, weekly_file, overall_file, week_no):
+        # the per-student update_or_create import the bulk upsert replaced
+        weekly = attendance_utils.read_sheet(weekly_file)
+        overall = attendance_utils.read_sheet(overall_file) if week_no != 1 else weekly
+        for enrollment, week_per in weekly.items():
+            student = Student.objects.filter(module=self.module, enrollment=enrollment).first()
+            if student is None:
+                continue
+            overall_per = overall.get(enrollment, week_per)
+            call_required = week_per < 80 or overall_per < 80
+            Attendance.objects.update_or_create(
+                week_no=week_no,
+                student=student,
+                defaults={
+                    "week_percentage": week_per,
+                    "overall_percentage": overall_per,
+                    "call_required": call_required,
+                },
+            )
+            if call_required:
+                CallRecord.objects.get_or_create(student=student, week_no=week_no)
+
+    def _snapshot(self):
+        attendance = Attendance.objects.filter(student__module=self.module).values_list(
+            "student__enrollment", "week_no", "week_percentage", "overall_percentage", "call_required"
+        )
+        calls = CallRecord.objects.filter(student__module=self.module).values_list(
+            "student__enrollment", "week_no", "final_status"
+        )
+        return sorted(attendance), sorted(calls)
+
+    def test_bulk_upsert_matches_row_by_row_import(self):
+        self.import_students()
+        e = self.enrollments
+        uploads = [
+            # an enrollment without a student, and one missing from the overall sheet
+            ({e[0]: 0.9, e[1]: 0.75, e[2]: 0.8, "240101009999": 0.5}, {e[0]: 0.7, e[1]: 0.9}),
+            # re-upload of the same week with changed figures
+            ({e[0]: 0.9, e[1]: 0.85, e[2]: 0.6, e[3]: 0.95}, {e[0]: 0.85, e[1]: 0.9, e[3]: 0.7}),
+        ]
+
+        def bulk(weekly_file, overall_file, week_no):
+            attendance_utils.import_attendance(weekly_file, overall_file, week_no, self.module)
+
+        snapshots = []
+        for importer in (bulk, self._row_by_row_import):
+            Attendance.objects.all().delete()
+            CallRecord.objects.all().delete()
+            for weekly, overall in uploads:
+                importer(_attendance_file(weekly), _attendance_file(overall, name="overall.xlsx"), 2)
+                # the mentor's outcome must survive the re-upload
+                CallRecord.objects.filter(student__enrollment=e[1]).update(final_status="received")
+            snapshots.append(self._snapshot())
+
+        self.assertEqual(snapshots[0], snapshots[1])
+        attendance, calls = snapshots[0]
+        self.assertEqual(len(attendance), 4)
+        self.assertEqual(calls, [(e[0], 2, None), (e[1], 2, "received"), (e[2], 2, None), (e[3], 2, None)])
+
+    def test_batch_imports_every_week(self):
+        self.import_students()
+        e = self.enrollments
+        batch = _attendance_batch({
+            "Week 2": {e[0]: 0.9, e[1]: 0.5},
+            "Week 2 Overall": {e[0]: 0.7, e[1]: 0.9},
+            "Week 3": {e[0]: 0.95, e[1]: 0.95},
+        })
+        self.assertEqual(attendance_utils.import_attendance_batch(batch, self.module), {2: 2, 3: 0})
+        self.assertEqual(Attendance.objects.filter(student__module=self.module).count(), 4)
+
+    def test_batch_refuses_locked_week(self):
+        self.import_students()
+        WeekLock.objects.create(module=self.module, week_no=3, locked=True)
+        e = self.enrollments
+        batch = _attendance_batch({"Week 2": {e[0]: 0.5}, "Week 3": {e[0]: 0.5}})
+
+        with self.assertRaisesMessage(Exception, "Week(s) 3 LOCKED"):
+            attendance_utils.import_attendance_batch(batch, self.module)
+        # nothing is written, not even the unlocked week
+        self.assertFalse(Attendance.objects.exists())
+        self.assertFalse(CallRecord.objects.exists())
+
+
+# ---------------- MENTOR WEEK STATS ----------------
+
+class MentorWeekStatsTests(ModuleTestCase):
+    counters = ("need_call", "calls", "received", "not_received", "msg_sent")
+
+    def setUp(self):
+        super().setUp()
+        self.import_students()
+        e = self.enrollments
+        attendance_utils.import_attendance(
+            _attendance_file({e[0]: 0.5, e[1]: 0.6, e[2]: 0.9, e[3]: 0.7}), None, 1, self.module
+        )
+        attendance_utils.import_attendance(
+            _attendance_file({e[0]: 0.9, e[1]: 0.6, e[2]: 0.95, e[3]: 0.9}),
+            _attendance_file({e[0]: 0.75, e[1]: 0.65, e[2]: 0.9, e[3]: 0.85}, name="overall.xlsx"),
+            2,
+            self.module,
+        )
+
+    def recount(self):
+        # the counters rebuilt row by row from Attendance and CallRecord
+        cells = {}
+
+        def cell(mentor_id, week_no):
+            return cells.setdefault((mentor_id, week_no), dict.fromkeys(self.counters, 0))
+
+        for mentor_id, week_no in Attendance.objects.filter(
+            student__module=self.module, call_required=True
+        ).values_list("student__mentor_id", "week_no"):
+            cell(mentor_id, week_no)["need_call"] += 1
+        for mentor_id, week_no, status, sent in CallRecord.objects.filter(student__module=self.module).values_list(
+            "student__mentor_id", "week_no", "final_status", "message_sent"
+        ):
+            counts = cell(mentor_id, week_no)
+            counts["calls"] += 1
+            counts["received"] += status == "received"
+            counts["not_received"] += status == "not_received"
+            counts["msg_sent"] += sent
+        return cells
+
+    def stored(self):
+        return {
+            (s.mentor_id, s.week_no): {f: getattr(s, f) for f in self.counters}
+            for s in MentorWeekStats.objects.filter(module=self.module)
+        }
+
+    def assertStatsMatchRecount(self):
+        self.assertEqual(self.stored(), self.recount())
+
+    def call(self, enrollment, week_no):
+        return CallRecord.objects.get(student__enrollment=enrollment, week_no=week_no)
+
+    def test_stats_follow_imports_and_call_updates(self):
+        e = self.enrollments
+        self.assertStatsMatchRecount()
+        self.assertEqual(sum(c["need_call"] for c in self.stored().values()), 5)
+
+        call = self.call(e[0], 1)
+        self.client.post(
+            "/save-call/", {"id": call.id, "status": "received", "talked": "father", "duration": "2", "reason": "Sick"}
+        )
+        self.assertStatsMatchRecount()
+
+        # two unanswered attempts end as not received
+        call = self.call(e[1], 2)
+        for _ in range(2):
+            self.client.post("/save-call/", {"id": call.id, "status": "not_received"})
+        self.assertEqual(self.call(e[1], 2).final_status, "not_received")
+        self.assertStatsMatchRecount()
+
+        self.assertEqual(self.client.post("/mark-message/", {"id": call.id}).json(), {"ok": True})
+        self.assertStatsMatchRecount()
+        self.assertEqual(sum(c["msg_sent"] for c in self.stored().values()), 1)
+
+        # a re-import of week 2 keeps the recorded calls and recounts
+        attendance_utils.import_attendance(_attendance_file(dict.fromkeys(e, 0.5)), None, 2, self.module)
+        self.assertStatsMatchRecount()
+
+        self.client.post("/delete-week/", {"delete_week": "1", "week": "1"})
+        self.assertFalse(MentorWeekStats.objects.filter(module=self.module, week_no=1).exists())
+        self.assertStatsMatchRecount()
+
+    def test_rebuild_stats_command(self):
+        expected = self.stored()
+        MentorWeekStats.objects.filter(module=self.module, week_no=1).delete()
+        MentorWeekStats.objects.filter(module=self.module).update(calls=99)
+        MentorWeekStats.objects.create(module=self.module, mentor=Mentor.objects.get(name="ABC"), week_no=7, calls=3)
+        self.assertNotEqual(self.stored(), expected)
+
+        out = io.StringIO()
+        call_command("rebuild_stats", "--module", str(self.module.id), stdout=out)
+        self.assertEqual(self.stored(), expected)
+        self.assertIn(f"Rebuilt {len(expected)} cells.", out.getvalue())
+
+        with self.assertRaisesMessage(CommandError, "Unknown module id(s): 999999"):
+            call_command("rebuild_stats", "--module", "999999", stdout=io.StringIO())
+
+
+# ---------------- SEMESTER REGISTER ----------------
+
+class SemesterRegisterTests(ModuleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.import_students()
+        self.students = list(Student.objects.filter(module=self.module).order_by("roll_no"))
+
+    def attend(self, student, week_no, week_per, overall_per):
+        Attendance.objects.create(
+            student=student, week_no=week_no, week_percentage=week_per, overall_percentage=overall_per
+        )
+
+    def test_pivot_fills_gaps_and_takes_latest_overall(self):
+        s0, s1, s2, _ = self.students
+        self.attend(s0, 4, 60, 74)
+        self.attend(s0, 1, 90, 90)
+        self.attend(s0, 2, 80, 85)
+        self.attend(s1, 2, 70, 72)
+        # a week outside the register is ignored, for the cells and the overall
+        self.attend(s1, 5, 10, 10)
+
+        students = Student.objects.filter(id__in=[s1.id, s0.id, s2.id]).select_related("mentor").order_by("-roll_no")
+        with self.assertNumQueries(2):
+            rows = report_utils.attendance_register(list(students), [1, 2, 4])
+
+        self.assertEqual(
+            [(r["roll"], r["cells"], r["overall"]) for r in rows],
+            [(3, [None, None, None], None), (2, [None, 70, None], 72), (1, [90, 80, 60], 74)],
+        )
+        self.assertEqual(
+            (rows[1]["enrollment"], rows[1]["name"], rows[1]["mentor"]), (s1.enrollment, "Student 1", "DEF")
+        )
+
+    def test_view_filters_and_page_labels(self):
+        for student in self.students:
+            self.attend(student, 1, 90, 90)
+
+        response = self.client.get("/semester-register/", {"roll_from": 2, "roll_to": 3})
+        self.assertEqual([r["roll"] for r in response.context["rows"]], [2, 3])
+        self.assertEqual(response.context["base_q"], "roll_from=2&roll_to=3")
+
+        response = self.client.get("/semester-register/", {"mentor": "DEF"})
+        self.assertEqual([r["roll"] for r in response.context["rows"]], [2, 4])
+        self.assertEqual(response.context["mentor_names"], ["ABC", "DEF"])
+
+        with mock.patch("core.views.REGISTER_PAGE_SIZE", 2):
+            response = self.client.get("/semester-register/", {"roll_from": 1, "page": 2})
+            self.assertEqual(
+                response.context["pages"],
+                [{"number": 1, "first": 1, "last": 2}, {"number": 2, "first": 3, "last": 4}],
+            )
+            self.assertEqual([r["roll"] for r in response.context["rows"]], [3, 4])
+            self.assertContains(response, 'href="?roll_from=1&page=1">Roll 1&ndash;2</a>')
+
+            response = self.client.get("/semester-register/", {"roll_to": 3})
+            self.assertEqual(
+                response.context["pages"],
+                [{"number": 1, "first": 1, "last": 2}, {"number": 2, "first": 3, "last": 3}],
+            )
+
+
+# ---------------- RE-UPLOADS ----------------
+
+class ReuploadTests(ModuleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.import_students()
+        self.subject = Subject.objects.create(module=self.module, name="Java Programming", short_name="JAVA1")
+
+    def test_identical_attendance_reupload_is_skipped(self):
+        first = _attendance_file(dict.fromkeys(self.enrollments, 0.7))
+        self.assertEqual(attendance_utils.import_attendance(first, None, 1, self.module), 4)
+
+        stats = {}
+        with mock.patch.object(attendance_utils, "read_sheets") as read, \
+                mock.patch.object(attendance_utils, "_write_rows") as write:
+            calls = attendance_utils.import_attendance(_same_file(first), None, 1, self.module, stats=stats)
+        self.assertEqual(calls, 4)
+        self.assertTrue(stats["unchanged"])
+        read.assert_not_called()
+        write.assert_not_called()
+
+        # a new student changes the roster state, so the same file is read again
+        self.import_students(self.enrollments + ["240101000004"])
+        stats = {}
+        attendance_utils.import_attendance(_same_file(first), None, 1, self.module, stats=stats)
+        self.assertNotIn("unchanged", stats)
+        self.assertEqual(stats["rows_changed"], 0)
+
+    def test_changed_attendance_row_is_the_only_row_written(self):
+        percentages = dict.fromkeys(self.enrollments, 0.9)
+        attendance_utils.import_attendance(_attendance_file(percentages), None, 1, self.module)
+
+        percentages[self.enrollments[2]] = 0.5
+        stats = {}
+        with mock.patch.object(attendance_utils, "_write_rows", wraps=attendance_utils._write_rows) as write:
+            calls = attendance_utils.import_attendance(_attendance_file(percentages), None, 1, self.module, stats=stats)
+
+        _, _, written, call_rows = write.call_args.args
+        student = Student.objects.get(module=self.module, enrollment=self.enrollments[2])
+        self.assertEqual([row.student_id for row in written], [student.id])
+        self.assertEqual([row.student_id for row in call_rows], [student.id])
+        self.assertEqual((calls, stats["rows_matched"], stats["rows_changed"]), (1, 4, 1))
+        self.assertEqual(Attendance.objects.get(student=student, week_no=1).week_percentage, 50.0)
+
+    def test_identical_result_reupload_is_skipped(self):
+        first = _result_file(dict(zip(self.enrollments, [20, 5, 15, 12])))
+        upload, summary = result_utils.import_subject_result(first, self.module, "T1", self.subject, "subject")
+        self.assertEqual((summary["rows_matched"], summary["rows_failed"]), (4, 1))
+
+        with mock.patch.object(result_utils, "parse_result_sheet") as parse:
+            again, summary = result_utils.import_subject_result(
+                _same_file(first), self.module, "T1", self.subject, "subject"
+            )
+        parse.assert_not_called()
+        self.assertEqual(again.id, upload.id)
+        self.assertTrue(summary["unchanged"])
+        self.assertEqual(summary["rows_failed"], 1)
+
+    def test_changed_result_row_is_the_only_row_written(self):
+        marks = dict(zip(self.enrollments, [20, 5, 15, 12]))
+        result_utils.import_subject_result(_result_file(marks), self.module, "T1", self.subject, "subject")
+
+        marks[self.enrollments[2]] = 16
+        with mock.patch.object(QuerySet, "bulk_create", autospec=True, side_effect=QuerySet.bulk_create) as create, \
+                mock.patch.object(QuerySet, "bulk_update", autospec=True, side_effect=QuerySet.bulk_update) as update:
+            upload, summary = result_utils.import_subject_result(
+                _result_file(marks), self.module, "T1", self.subject, "subject"
+            )
+
+        written = {}
+        for call in create.call_args_list + update.call_args_list:
+            written.setdefault(call.args[0].model, []).extend(call.args[1])
+        self.assertEqual([r.enrollment for r in written[StudentResult]], [self.enrollments[2]])
+        self.assertEqual(written.get(ResultCallRecord, []), [])
+        self.assertEqual(summary["diff"]["updated"], 1)
+        self.assertEqual(summary["diff"]["unchanged"], 3)
+        self.assertEqual(
+            StudentResult.objects.get(upload=upload, enrollment=self.enrollments[2]).marks_current, 16
+        )
+
+    def test_result_writes_report_progress_and_cancel_per_batch(self):
+        marks = dict(zip(self.enrollments, [5, 5, 15, 12]))
+        progress = mock.Mock()
+        with mock.patch.object(result_utils, "BULK_BATCH_SIZE", 2):
+            result_utils.import_subject_result(
+                _result_file(marks), self.module, "T1", self.subject, "subject", progress_cb=progress
+            )
+        saving = [
+            (c.kwargs["current"], c.kwargs["total"]) for c in progress.call_args_list
+            if c.kwargs["message"].startswith("Saving")
+        ]
+        # 4 results in two batches, then 2 calls in one
+        self.assertEqual(saving, [(2, 6), (4, 6), (6, 6)])
+
+        # a cancel seen after the first write batch rolls the sheet back
+        marks = dict(zip(self.enrollments, [4, 4, 4, 4]))
+        progress = mock.Mock()
+        with mock.patch.object(result_utils, "BULK_BATCH_SIZE", 2), \
+                self.assertRaisesMessage(Exception, "Upload cancelled by user."):
+            result_utils.import_subject_result(
+                _result_file(marks), self.module, "T1", self.subject, "subject",
+                progress_cb=progress,
+                cancel_cb=lambda: any(c.kwargs["message"].startswith("Saving") for c in progress.call_args_list),
+            )
+        self.assertEqual(progress.call_args_list[-1].kwargs["current"], 2)
+        self.assertEqual(
+            sorted(StudentResult.objects.filter(upload__module=self.module).values_list("marks_current", flat=True)),
+            [5, 5, 12, 15],
+        )
+
+
+# ---------------- RESULT CALLS ----------------
+
+class ResultCallLifecycleTests(ModuleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.import_students()
+        self.subject = Subject.objects.create(module=self.module, name="Java Programming", short_name="JAVA1")
+        self.marks = dict(zip(self.enrollments, [5, 20, 15, 12]))
+
+    def upload(self):
+        return result_utils.import_subject_result(
+            _result_file(self.marks), self.module, "T1", self.subject, "subject"
+        )
+
+    def test_reupload_keeps_recorded_outcome(self):
+        upload, _ = self.upload()
+        call = ResultCallRecord.objects.get(upload=upload)
+        call.final_status = "received"
+        call.talked_with = "mother"
+        call.message_sent = True
+        call.save()
+
+        self.marks[self.enrollments[0]] = 6
+        self.marks[self.enrollments[2]] = 16
+        _, summary = self.upload()
+        self.assertEqual(summary["diff"]["calls_updated"], 1)
+
+        kept = ResultCallRecord.objects.get(upload=upload)
+        self.assertEqual(kept.id, call.id)
+        self.assertEqual(kept.marks_current, 6)
+        self.assertEqual((kept.final_status, kept.talked_with, kept.message_sent), ("received", "mother", True))
+
+    def test_passing_student_call_is_retired_and_restored(self):
+        upload, _ = self.upload()
+        call = ResultCallRecord.objects.get(upload=upload)
+        call.final_status = "not_received"
+        call.save()
+
+        # the student now passes: the call leaves the call lists but is kept
+        self.marks[self.enrollments[0]] = 10
+        _, summary = self.upload()
+        self.assertEqual((summary["rows_failed"], summary["diff"]["calls_retired"]), (0, 1))
+        self.assertFalse(ResultCallRecord.objects.filter(upload=upload).exists())
+        retired = ResultCallRecord.all_objects.get(id=call.id)
+        self.assertIsNotNone(retired.retired_at)
+        self.assertEqual(retired.final_status, "not_received")
+
+        # failing again brings the same call back with its outcome
+        self.marks[self.enrollments[0]] = 3
+        _, summary = self.upload()
+        self.assertEqual((summary["rows_failed"], summary["diff"]["calls_restored"]), (1, 1))
+        restored = ResultCallRecord.objects.get(upload=upload)
+        self.assertEqual(restored.id, call.id)
+        self.assertIsNone(restored.retired_at)
+        self.assertEqual((restored.final_status, restored.marks_current), ("not_received", 3))
+        self.assertEqual(ResultCallRecord.all_objects.filter(upload=upload).count(), 1)
+
+
+# ---------------- FAIL RULES ----------------
+
+class FailRuleTests(ModuleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.import_students()
+        subject = Subject.objects.create(module=self.module, name="Java Programming", short_name="JAVA1")
+        self.upload, _ = result_utils.import_subject_result(
+            _result_file(dict(zip(self.enrollments, [5, 20, 15, 12]))), self.module, "T1", subject, "subject"
+        )
+
+    def t1_rule(self, current_below):
+        rules = rule_utils.rules_for(self.module)
+        rules["T1"] = rule_utils.FailRule("T1", current_below, current_below, False)
+        return rules
+
+    def failing(self):
+        return sorted(
+            StudentResult.objects.filter(upload=self.upload, fail_flag=True).values_list("enrollment", flat=True)
+        )
+
+    def calls(self, manager):
+        return sorted(manager.filter(upload=self.upload).values_list("student__enrollment", flat=True))
+
+    def test_threshold_change_reflags_results_and_calls(self):
+        call = ResultCallRecord.objects.get(upload=self.upload)
+        call.final_status = "received"
+        call.save()
+
+        # raising the cut-off flags student 3 and creates their call
+        counts = rule_utils.save_rules(self.module, self.t1_rule(13))
+        self.assertEqual(counts, {"flagged": 2, "calls_added": 1, "calls_retired": 0, "calls_restored": 0})
+        self.assertEqual(self.failing(), [self.enrollments[0], self.enrollments[3]])
+        self.assertEqual(self.calls(ResultCallRecord.objects), [self.enrollments[0], self.enrollments[3]])
+        self.assertEqual(
+            StudentResult.objects.get(upload=self.upload, enrollment=self.enrollments[3]).fail_reason,
+            "Less than 13 marks in T1",
+        )
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.rows_failed, 2)
+
+        # lowering it below every mark retires both calls
+        counts = rule_utils.save_rules(self.module, self.t1_rule(4))
+        self.assertEqual(counts, {"flagged": 0, "calls_added": 0, "calls_retired": 2, "calls_restored": 0})
+        self.assertEqual(self.calls(ResultCallRecord.objects), [])
+        self.assertEqual(self.calls(ResultCallRecord.all_objects), [self.enrollments[0], self.enrollments[3]])
+
+        # back to the default: student 0's call returns with its outcome, no rule row is kept
+        counts = rule_utils.save_rules(self.module, self.t1_rule(9))
+        self.assertEqual(counts, {"flagged": 1, "calls_added": 0, "calls_retired": 0, "calls_restored": 1})
+        self.assertEqual(ResultCallRecord.objects.get(upload=self.upload).final_status, "received")
+        self.assertFalse(ResultRule.objects.filter(module=self.module).exists())
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.rows_failed, 1)
+
+    def test_manage_modules_reports_counts(self):
+        admin, _ = User.objects.get_or_create(username="superadmin1")
+        self.client.force_login(admin)
+        session = self.client.session
+        session["current_module_id"] = self.module.id
+        session.save()
+
+        form = {"action": "result_rules"}
+        for test_name, rule in self.t1_rule(13).items():
+            form[f"current_below_{test_name}"] = rule.current_below
+            form[f"total_below_{test_name}"] = rule.total_below
+            if rule.needs_total:
+                form[f"needs_total_{test_name}"] = "1"
+        response = self.client.post("/modules/", form, follow=True)
+        self.assertContains(response, "Failing results: 2, calls added: 1, retired: 0, restored: 0.")
+        self.assertEqual(ResultRule.objects.get(module=self.module).current_below, 13)
+
+
+# ---------------- BULK RESULT IMPORT ----------------
+
+class CompiledBulkImportTests(ModuleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.import_students()
+        self.subject = Subject.objects.create(module=self.module, name="Java Programming", short_name="JAVA1")
+        # students 0 and 1 fail T1 (below 9), the others pass every test
+        self.marks = dict(zip(
+            self.enrollments, [(5, 20, 20, 40), (8, 20, 20, 40), (20, 20, 20, 40), (15, 15, 15, 30)]
+        ))
+
+    def bulk_import(self, marks, **kwargs):
+        return result_utils.import_compiled_bulk_all(_compiled_file(marks), "coord_a", module=self.module, **kwargs)
+
+    def live_call(self, enrollment, test_name="T1"):
+        return ResultCallRecord.objects.live().get(
+            upload__module=self.module, upload__test_name=test_name, student__enrollment=enrollment
+        )
+
+    def test_generation_swap(self):
+        self.bulk_import(self.marks)
+        first = set(ResultUpload.objects.live().filter(module=self.module).values_list("id", flat=True))
+        self.assertEqual(len(first), 4)
+        call = self.live_call(self.enrollments[0])
+        call.final_status = "received"
+        call.parent_reason = "Was unwell"
+        call.save()
+
+        self.marks[self.enrollments[2]] = (4, 20, 20, 40)
+        summary = self.bulk_import(self.marks)
+        self.assertEqual(summary["uploads_created"], 4)
+        self.assertEqual(summary["diff"]["calls_added"], 1)
+
+        self.module.refresh_from_db()
+        live = ResultUpload.objects.live().filter(module=self.module)
+        self.assertEqual(set(live.values_list("generation", flat=True)), {self.module.result_generation})
+        self.assertFalse(first & set(live.values_list("id", flat=True)))
+        # the recorded outcome moves to the new generation's call
+        call = self.live_call(self.enrollments[0])
+        self.assertEqual((call.final_status, call.parent_reason), ("received", "Was unwell"))
+        self.assertEqual(
+            sorted(ResultCallRecord.objects.live().filter(upload__test_name="T1").values_list(
+                "student__enrollment", flat=True
+            )),
+            self.enrollments[:3],
+        )
+
+        # the replaced generation is removed by the queued job
+        self.assertEqual(ResultUpload.objects.filter(id__in=first).count(), 4)
+        _run_jobs()
+        self.assertFalse(ResultUpload.objects.filter(id__in=first).exists())
+
+    def test_outcome_saved_during_build_survives_swap(self):
+        self.bulk_import(self.marks)
+        next_generation = result_utils._next_generation(self.module)
+        # student 1 passes T1 in the new sheet, so the new generation gives them no live call
+        self.marks[self.enrollments[1]] = (12, 20, 20, 40)
+        recorded = []
+
+        def mentor_saves_meanwhile():
+            # once the new T1 upload is built from the old calls, a mentor records outcomes on them
+            if not recorded and ResultUpload.objects.filter(generation=next_generation, test_name="T1").exists():
+                for enrollment, status in ((self.enrollments[0], "received"), (self.enrollments[1], "not_received")):
+                    call = self.live_call(enrollment)
+                    call.final_status = status
+                    call.save()
+                    recorded.append(call.id)
+            return False
+
+        self.bulk_import(self.marks, cancel_cb=mentor_saves_meanwhile)
+        self.assertEqual(len(recorded), 2)
+
+        call = self.live_call(self.enrollments[0])
+        self.assertNotIn(call.id, recorded)
+        self.assertEqual(call.final_status, "received")
+
+        lookup = {"upload__test_name": "T1", "student__enrollment": self.enrollments[1]}
+        retired = ResultCallRecord.all_objects.live().get(**lookup)
+        self.assertIsNotNone(retired.retired_at)
+        self.assertEqual(retired.final_status, "not_received")
+        self.assertFalse(ResultCallRecord.objects.live().filter(**lookup).exists())
+
+
+# ---------------- CSV UPLOADS ----------------
+
+class CsvReadTests(SimpleTestCase):
+    def test_comma_and_tab_are_sniffed(self):
+        comma = workbook.read_workbook(io.BytesIO(b'Roll,Name,Enrollment\r\n1,"Shah, Riya",0240101\r\n'))
+        self.assertEqual(comma, {"Sheet1": [["Roll", "Name", "Enrollment"], [1, "Shah, Riya", "0240101"]]})
+
+        # commas inside cells do not outvote the tabs
+        tab = workbook.read_workbook(io.BytesIO(b"Roll\tName\tMarks\n1\tShah, Riya, K\t12.50\n2\t\t7.0\n"))
+        self.assertEqual(tab, {"Sheet1": [["Roll", "Name", "Marks"], [1, "Shah, Riya, K", 12.5], [2, None, 7]]})
+
+        # a title row without delimiters above the table
+        titled = workbook.read_workbook(io.BytesIO(b"Attendance report\n\nRoll\tName\n1\tRiya\n"))
+        self.assertEqual(titled["Sheet1"], [["Attendance report", None], [None, None], ["Roll", "Name"], [1, "Riya"]])
+
+    def test_cp1252_fallback(self):
+        data = "Roll,Name\r\n1,Ren\u00e9e Fern\u00e1ndez\r\n".encode("cp1252")
+        with self.assertRaises(UnicodeDecodeError):
+            data.decode("utf-8")
+        self.assertEqual(workbook.read_workbook(io.BytesIO(data))["Sheet1"][1], [1, "Ren\u00e9e Fern\u00e1ndez"])
+
+        # a UTF-8 export keeps its characters and loses the BOM
+        data = "\ufeffRoll,Name\r\n1,Ren\u00e9e\r\n".encode("utf-8")
+        self.assertEqual(workbook.read_workbook(io.BytesIO(data))["Sheet1"], [["Roll", "Name"], [1, "Ren\u00e9e"]])
+
+    def test_sheet_takes_requested_name(self):
+        data = io.BytesIO(b"a,b\n1,2\n")
+        self.assertEqual(list(workbook.read_workbook(data, sheets=["COMPILED"])), ["COMPILED"])
+        self.assertEqual(workbook.read_workbook(data, max_rows=1), {"Sheet1": [["a", "b"]]})
+
+
+class CsvImportTests(ModuleTestCase):
+    def test_student_csv(self):
+        from .utils import import_students_from_excel
+
+        upload = _csv_file(_student_rows(self.enrollments), name="students.csv")
+        self.assertEqual(import_students_from_excel(upload, self.module)[:3], (4, 0, 0))
+        student = Student.objects.get(module=self.module, enrollment=self.enrollments[1])
+        self.assertEqual((student.name, student.mentor.name), ("Student 1", "DEF"))
+
+    def test_attendance_csv(self):
+        self.import_students()
+        percentages = dict(zip(self.enrollments, ["70%", "85%", "79.5%", "100%"]))
+        upload = _csv_file(_attendance_rows(percentages), name="week.tsv", delimiter="\t")
+        self.assertEqual(attendance_utils.import_attendance(upload, None, 1, self.module), 2)
+        self.assertEqual(
+            sorted(Attendance.objects.values_list("week_percentage", flat=True)), [70.0, 79.5, 85.0, 100.0]
+        )
+
+    def test_result_csv(self):
+        self.import_students()
+        subject = Subject.objects.create(module=self.module, name="Java Programming", short_name="JAVA1")
+        rows = [
+            ["Result"],
+            ["Sr No", "Enrollment No", "Name", "Test-1", "Test-2", "Total"],
+            [None, None, None, "25", "25", "100"],
+        ]
+        for i, (enrollment, mark) in enumerate(zip(self.enrollments, [5, 20, "AB", 12])):
+            rows.append([i + 1, enrollment, f"Student {i}", mark, None, None])
+        upload, summary = result_utils.import_subject_result(
+            _csv_file(rows, name="result.csv"), self.module, "T1", subject, "subject"
+        )
+        # "AB" is absent, scored as 0
+        self.assertEqual((summary["rows_matched"], summary["rows_failed"]), (4, 2))
+        self.assertTrue(StudentResult.objects.get(upload=upload, enrollment=self.enrollments[2]).is_absent)
+
+        # the compiled layout reads the CSV as its COMPILED sheet
+        compiled = _compiled_file(dict.fromkeys(self.enrollments, (5, 20, 20, 40)))
+        compiled_rows = workbook.read_workbook(compiled)["COMPILED"]
+        summary = result_utils.import_compiled_bulk_all(
+            _csv_file(compiled_rows, name="compiled.csv"), "coord_a", module=self.module
+        )
+        self.assertEqual((summary["uploads_created"], summary["found_subjects"]), (4, ["Java Programming"]))
+
+    def test_practical_csv(self):
+        self.import_students()
+        Subject.objects.create(module=self.module, name="Java Programming", short_name="JAVA1")
+        rows = [["Practical"], ["Sr No", "Enrollment Number", "Name", "JAVA1-PR", "JAVA1-%"]]
+        rows += [[i + 1, e, f"Student {i}", 20 + i, 80] for i, e in enumerate(self.enrollments)]
+        summary = practical_utils.import_practical_marks(_csv_file(rows, name="practical.csv"), self.module)
+        self.assertEqual((summary["mode"], summary["rows_matched"]), ("combined", 4))
+        self.assertEqual(
+            sorted(StudentPracticalMark.objects.filter(module=self.module).values_list("pr_marks", flat=True)),
+            [20, 21, 22, 23],
+        )
+
+
+# ---------------- WEB UPLOADS ----------------
+
+class WebUploadJobTests(ModuleTestCase):
+    def test_student_upload_is_queued_and_page_shows_outcome(self):
+        response = self.client.post("/upload-students/", {"file": _workbook(_student_rows(self.enrollments))})
+        job = BackgroundJob.objects.get(kind=BackgroundJob.KIND_STUDENT_IMPORT)
+        self.assertRedirects(response, f"/upload-students/?job={job.job_id}", fetch_redirect_response=False)
+        self.assertFalse(Student.objects.exists())
+
+        page = self.client.get(f"/upload-students/?job={job.job_id}")
+        self.assertContains(page, "job-progress")
+
+        self.assertEqual(_run_jobs(), 1)
+        page = self.client.get(f"/upload-students/?job={job.job_id}")
+        self.assertNotContains(page, "job-progress")
+        self.assertContains(page, "Added: 4 | Updated: 0 | Skipped: 0")
+        self.assertEqual(Student.objects.filter(module=self.module).count(), 4)
+
+    def test_attendance_upload_answers_with_job_id(self):
+        self.import_students()
+        response = self.client.post(
+            "/upload-attendance/",
+            {"week": "1", "rule": "both", "weekly_file": _attendance_file(dict.fromkeys(self.enrollments, 0.7))},
+        )
+        job_id = response.json()["job_id"]
+
+        _run_jobs()
+        status = self.client.get(f"/jobs/{job_id}/").json()
+        self.assertEqual(status["status"], BackgroundJob.STATUS_COMPLETED)
+        self.assertEqual(status["result"]["week"], 1)
+        self.assertEqual(status["result"]["total_calls"], 4)
+
+    def test_practical_upload_is_queued(self):
+        response = self.client.post("/view-practical-marks/", {"practical_file": _workbook([["x"]])})
+        job = BackgroundJob.objects.get(kind=BackgroundJob.KIND_PRACTICAL_IMPORT)
+        self.assertRedirects(response, f"/view-practical-marks/?job={job.job_id}", fetch_redirect_response=False)
+
+        _run_jobs()
+        page = self.client.get(f"/view-practical-marks/?job={job.job_id}")
+        self.assertContains(page, "Upload failed")
+
+
+# ---------------- RESUMABLE UPLOADS ----------------
+
+class ChunkedUploadTests(TestCase):
+    data = b"0123456789"
+
+    def setUp(self):
+        self.chunk_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.chunk_dir, True)
+        settings_override = override_settings(CHUNKED_UPLOAD_DIR=self.chunk_dir, CHUNKED_UPLOAD_CHUNK_SIZE=4)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.module = AcademicModule.objects.create(name="FY-A", academic_batch="2026")
+        self.other_module = AcademicModule.objects.create(name="FY-B", academic_batch="2026")
+        self.user = User.objects.create_user("coord_a", password="x")
+        CoordinatorModuleAccess.objects.create(coordinator=self.user, module=self.module)
+
+    def _auth(self, user=None, module=None):
+        token = _issue_staff_token(user or self.user, "coordinator")
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}", "HTTP_X_MODULE_ID": str((module or self.module).id)}
+
+    def _start(self, sha256=None):
+        response = self.client.post(
+            "/api/mobile/staff/uploads/",
+            data=json.dumps({
+                "file_name": "students.xlsx",
+                "size": len(self.data),
+                "sha256": sha256 or hashlib.sha256(self.data).hexdigest(),
+            }),
+            content_type="application/json",
+            **self._auth(),
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["upload_id"]
+
+    def _put(self, upload_id, offset, body):
+        return self.client.put(
+            f"/api/mobile/staff/uploads/{upload_id}/",
+            data=body,
+            content_type="application/octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+            **self._auth(),
+        )
+
+    def _send_all(self, upload_id):
+        for offset in range(0, len(self.data), 4):
+            self.assertEqual(self._put(upload_id, offset, self.data[offset:offset + 4]).status_code, 200)
+
+    def _complete(self, upload_id):
+        return self.client.post(f"/api/mobile/staff/uploads/{upload_id}/complete/", **self._auth())
+
+    def test_wrong_offset_returns_409_with_resume_offset(self):
+        upload_id = self._start()
+        self.assertEqual(self._put(upload_id, 0, b"0123").json()["offset"], 4)
+
+        for offset in (0, 8):
+            response = self._put(upload_id, offset, b"0123")
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.json()["offset"], 4)
+
+        self.assertEqual(self._put(upload_id, 4, b"4567").status_code, 200)
+        self.assertEqual(self._put(upload_id, 8, b"89").status_code, 200)
+        self.assertEqual(self._complete(upload_id).status_code, 200)
+        self.assertEqual(ChunkedUpload.objects.get(upload_id=upload_id).status, ChunkedUpload.STATUS_COMPLETE)
+
+    def test_short_body_keeps_received_bytes(self):
+        upload_id = self._start()
+        upload = ChunkedUpload.objects.get(upload_id=upload_id)
+
+        # connection dropped after two of the four announced bytes
+        self.assertEqual(upload_utils.append(upload, 0, io.BytesIO(b"01"), 4), 2)
+        self.assertEqual(self.client.get(f"/api/mobile/staff/uploads/{upload_id}/", **self._auth()).json()["offset"], 2)
+
+        self.assertEqual(self._put(upload_id, 2, b"2345").json()["offset"], 6)
+        self.assertEqual(self._put(upload_id, 6, b"6789").json()["offset"], 10)
+        self.assertEqual(self._complete(upload_id).status_code, 200)
+
+    def test_checksum_mismatch_resets_to_zero(self):
+        upload_id = self._start(sha256=hashlib.sha256(b"something else").hexdigest())
+        self._send_all(upload_id)
+
+        response = self._complete(upload_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["offset"], 0)
+        upload = ChunkedUpload.objects.get(upload_id=upload_id)
+        self.assertEqual((upload.received, upload.status), (0, ChunkedUpload.STATUS_UPLOADING))
+
+        # the client starts over from byte 0
+        self.assertEqual(self._put(upload_id, 0, b"0123").status_code, 200)
+
+    def test_claim_is_scoped_to_module_and_user(self):
+        upload_id = self._start()
+        self._send_all(upload_id)
+        self.assertEqual(self._complete(upload_id).status_code, 200)
+
+        self.assertIsNone(upload_utils.claim(upload_id, self.other_module, self.user.username))
+        self.assertIsNone(upload_utils.claim(upload_id, self.module, "coord_b"))
+        assembled = upload_utils.claim(upload_id, self.module, self.user.username)
+        self.assertIsNotNone(assembled)
+        self.assertEqual(assembled.read(), self.data)
+        assembled.close()
+
+        # another coordinator of the same module cannot see or finish it
+        other = User.objects.create_user("coord_b", password="x")
+        CoordinatorModuleAccess.objects.create(coordinator=other, module=self.module)
+        response = self.client.get(f"/api/mobile/staff/uploads/{upload_id}/", **self._auth(user=other))
+        self.assertEqual(response.status_code, 404)
+
+        # nor can it be attached to an import in a module it was not uploaded to
+        CoordinatorModuleAccess.objects.create(coordinator=self.user, module=self.other_module)
+        response = self.client.post(
+            "/api/mobile/staff/upload-students/",
+            data={"file_upload_id": upload_id},
+            **self._auth(module=self.other_module),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("another module", response.json()["msg"])
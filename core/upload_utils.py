@@ -0,0 +1,176 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+
+from .models import ChunkedUpload
+
+
+# body of one PUT is copied to disk in pieces of this size
+COPY_SIZE = 64 * 1024
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadOffsetError(Exception):
+    """A chunk was sent for another offset than the server has; `offset` is where to resume."""
+
+    def __init__(self, offset):
+        super().__init__(f"Upload is at byte {offset}; resume from there.")
+        self.offset = offset
+
+
+class AssembledUpload(UploadedFile):
+    """A completed chunked upload, handed to the importers like a file Django spooled to disk."""
+
+    def __init__(self, path, name, size):
+        super().__init__(open(path, "rb"), name=name, size=size)
+        self.path = path
+
+    def temporary_file_path(self):
+        # lets job_utils._spool move the artifact instead of copying it
+        return self.path
+
+
+def _path(upload_id):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{upload_id}.part")
+
+
+# ---------------- PROTOCOL ----------------
+
+def start(module, username, file_name, size, sha256):
+    """Open a resumable upload of `size` bytes whose content must hash to `sha256`."""
+    file_name = os.path.basename((file_name or "").strip())
+    sha256 = (sha256 or "").strip().lower()
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise Exception("File size is required.")
+    if not file_name:
+        raise Exception("File name is required.")
+    if size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise Exception(f"File size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes.")
+    if not SHA256_RE.match(sha256):
+        raise Exception("sha256 must be the hex SHA-256 of the file.")
+
+    collect_stale()
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    upload_id = str(uuid.uuid4())
+    open(_path(upload_id), "wb").close()
+    return ChunkedUpload.objects.create(
+        upload_id=upload_id,
+        module=module,
+        created_by=username or "",
+        file_name=file_name,
+        size=size,
+        sha256=sha256,
+    )
+
+
+def append(upload, offset, stream, length):
+    """
+    Write `length` bytes of `stream` at `offset` and return the new offset.
+
+    The offset must be exactly what the server has received so far
+    (UploadOffsetError otherwise). A body cut short by a dropped connection
+    keeps the bytes that arrived; the client resumes from the returned offset.
+    """
+    if upload.status != ChunkedUpload.STATUS_UPLOADING:
+        raise Exception("Upload is already complete.")
+    if offset != upload.received:
+        raise UploadOffsetError(upload.received)
+    if length <= 0 or length > settings.CHUNKED_UPLOAD_CHUNK_SIZE:
+        raise Exception(f"Chunk size must be between 1 and {settings.CHUNKED_UPLOAD_CHUNK_SIZE} bytes.")
+    if offset + length > upload.size:
+        raise Exception("Chunk runs past the declared file size.")
+
+    written = 0
+    with open(_path(upload.upload_id), "r+b") as out:
+        out.seek(offset)
+        while written < length:
+            piece = stream.read(min(COPY_SIZE, length - written))
+            if not piece:
+                break
+            out.write(piece)
+            written += len(piece)
+
+    # conditional on the offset read above: of two racing PUTs only one advances it
+    updated = ChunkedUpload.objects.filter(
+        id=upload.id, status=ChunkedUpload.STATUS_UPLOADING, received=offset
+    ).update(received=offset + written, updated_at=timezone.now())
+    if not updated:
+        upload.refresh_from_db(fields=["received"])
+        raise UploadOffsetError(upload.received)
+    upload.received = offset + written
+    return upload.received
+
+
+def complete(upload):
+    """
+    Check the assembled file against the declared size and hash. On a
+    hash mismatch the upload is reset to byte 0.
+    """
+    if upload.status == ChunkedUpload.STATUS_COMPLETE:
+        return upload
+    if upload.received != upload.size:
+        raise Exception(f"Upload is incomplete: {upload.received} of {upload.size} bytes received.")
+
+    digest = hashlib.sha256()
+    with open(_path(upload.upload_id), "r+b") as f:
+        for piece in iter(lambda: f.read(COPY_SIZE), b""):
+            digest.update(piece)
+        if digest.hexdigest() != upload.sha256:
+            f.truncate(0)
+            ChunkedUpload.objects.filter(id=upload.id).update(received=0, updated_at=timezone.now())
+            upload.received = 0
+            raise Exception("Checksum mismatch; the upload was reset, send the file again.")
+
+    ChunkedUpload.objects.filter(id=upload.id).update(status=ChunkedUpload.STATUS_COMPLETE, updated_at=timezone.now())
+    upload.status = ChunkedUpload.STATUS_COMPLETE
+    return upload
+
+
+def claim(upload_id, module, username):
+    """
+    AssembledUpload of a completed upload of this module and user, or None.
+
+    The artifact stays until it expires, so a failed import can be retried
+    without sending the file again; a queued job moves it into its spool.
+    """
+    upload = ChunkedUpload.objects.filter(
+        upload_id=upload_id, module=module, created_by=username, status=ChunkedUpload.STATUS_COMPLETE
+    ).first()
+    if upload is None or not os.path.exists(_path(upload.upload_id)):
+        return None
+    return AssembledUpload(_path(upload.upload_id), upload.file_name, upload.size)
+
+
+# ---------------- CLEANUP ----------------
+
+def collect_stale(hours=None):
+    """Drop uploads untouched for CHUNKED_UPLOAD_TTL_HOURS, and their files."""
+    hours = hours or settings.CHUNKED_UPLOAD_TTL_HOURS
+    stale = ChunkedUpload.objects.filter(updated_at__lt=timezone.now() - timedelta(hours=hours))
+    for upload_id in stale.values_list("upload_id", flat=True):
+        try:
+            os.remove(_path(upload_id))
+        except OSError:
+            pass
+    stale.delete()
+
+    # files whose row is gone (module deleted, crash between steps)
+    if not os.path.isdir(settings.CHUNKED_UPLOAD_DIR):
+        return
+    cutoff = time.time() - hours * 3600
+    for entry in os.scandir(settings.CHUNKED_UPLOAD_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
@@ -4,6 +4,7 @@ from .views import (
     superadmin_home,
     upload_students,
     upload_attendance,
+    upload_attendance_batch,
     delete_week,
     delete_results,
     mentor_dashboard,
@@ -25,8 +26,8 @@ from .views import (
     semester_register,
     mentor_semester_register,
     upload_results,
-    upload_results_cancel,
-    upload_results_progress,
+    job_cancel,
+    job_progress,
     view_results,
     view_practical_marks,
     subjects_page,
@@ -81,12 +82,16 @@ from .mobile_api import (
     api_mobile_staff_result_rows,
     api_mobile_staff_control_summary,
     api_mobile_staff_upload_students,
+    api_mobile_staff_chunked_start,
+    api_mobile_staff_chunked_upload,
+    api_mobile_staff_chunked_complete,
     api_mobile_staff_clear_students,
     api_mobile_staff_upload_attendance,
     api_mobile_staff_attendance_report,
     api_mobile_staff_result_report,
     api_mobile_staff_subjects,
     api_mobile_staff_upload_results,
+    api_mobile_staff_job,
     api_mobile_staff_home_summary,
     api_mobile_staff_modules_manage,
     api_mobile_staff_module_toggle,
@@ -98,6 +103,7 @@ urlpatterns = [
     path('mentor-dashboard/', mentor_dashboard),
     path('upload-students/', upload_students),
     path('upload-attendance/', upload_attendance),
+    path('upload-attendance-batch/', upload_attendance_batch),
     path('delete-week/', delete_week),
     path('delete-results/', delete_results),
     path('save-call/', save_call),
@@ -117,8 +123,10 @@ urlpatterns = [
     path("semester-register/", semester_register, name="semester_register"),
     path("mentor-semester-register/", mentor_semester_register, name="mentor_semester_register"),
     path("upload-results/", upload_results),
-    path("upload-results/progress/<str:job_id>/", upload_results_progress),
-    path("upload-results/cancel/<str:job_id>/", upload_results_cancel),
+    path("upload-results/progress/<str:job_id>/", job_progress),
+    path("upload-results/cancel/<str:job_id>/", job_cancel),
+    path("jobs/<str:job_id>/", job_progress),
+    path("jobs/<str:job_id>/cancel/", job_cancel),
     path("view-results/", view_results),
     path("view-practical-marks/", view_practical_marks),
     path("subjects/", subjects_page),
@@ -178,6 +186,10 @@ urlpatterns = [
     path("api/mobile/staff/result-report/", api_mobile_staff_result_report),
     path("api/mobile/staff/subjects/", api_mobile_staff_subjects),
     path("api/mobile/staff/upload-results/", api_mobile_staff_upload_results),
+    path("api/mobile/staff/jobs/<str:job_id>/", api_mobile_staff_job),
+    path("api/mobile/staff/uploads/", api_mobile_staff_chunked_start),
+    path("api/mobile/staff/uploads/<str:upload_id>/", api_mobile_staff_chunked_upload),
+    path("api/mobile/staff/uploads/<str:upload_id>/complete/", api_mobile_staff_chunked_complete),
     path("api/mobile/staff/home-summary/", api_mobile_staff_home_summary),
     path("api/mobile/staff/modules-manage/", api_mobile_staff_modules_manage),
     path("api/mobile/staff/module-toggle/", api_mobile_staff_module_toggle),
@@ -1,5 +1,13 @@
 import pandas as pd
+from django.db import transaction
+
+from . import stats_utils, workbook
 from .models import Mentor, Student
+from .preview_utils import SAMPLE_SIZE
+
+
+# rows per INSERT statement for the student upsert
+BULK_BATCH_SIZE = 500
 
 
 # ---------------- PHONE FORMAT ----------------
@@ -143,16 +151,19 @@ def resolve_mentor_identity(username):
 
 
 # ---------------- DETECT HEADER ----------------
-def detect_header_row(df):
+def detect_header_row(rows):
     """Find row containing enrolment + mentor keywords"""
 
-    for i in range(len(df)):
-        row_text = " ".join([normalize(x) for x in df.iloc[i].values])
+    header_row = workbook.find_header_row(
+        rows,
+        lambda text: ("enrol" in text or "enrollment" in text) and ("mentor" in text),
+    )
+    return header_row if header_row is not None else 0
 
-        if ("enrol" in row_text or "enrollment" in row_text) and ("mentor" in row_text):
-            return i
 
-    return 0
+def _header_labels(row):
+    # same labels pandas would give (blank header -> "Unnamed: n")
+    return [normalize(workbook.cell_text(v) or f"Unnamed: {i}") for i, v in enumerate(row)]
 
 
 # ---------------- FIND COLUMN ----------------
@@ -168,37 +179,231 @@ def find_col(columns, keywords):
     return None
 
 
+# ---------------- MENTOR MAP ----------------
+class _MentorIndex:
+    """
+    All mentors loaded once for a student import.
+
+    Lookups mirror the ORM queries the importer used per row
+    (name exact, name__iexact, full_name__iexact; lowest id wins).
+    """
+
+    def __init__(self):
+        self.by_id = {m.id: m for m in Mentor.objects.order_by("id")}
+        self.by_name = {m.name: m for m in self.by_id.values()}
+        self.changed = set()
+        self._ci = None
+
+    def _ci_maps(self):
+        if self._ci is None:
+            names = {}
+            fulls = {}
+            for m in self.by_id.values():
+                names.setdefault(m.name.lower(), m)
+                if m.full_name:
+                    fulls.setdefault(m.full_name.lower(), m)
+            self._ci = (names, fulls)
+        return self._ci
+
+    def by_name_iexact(self, name):
+        return self._ci_maps()[0].get(name.lower())
+
+    def by_full_name_iexact(self, full_name):
+        return self._ci_maps()[1].get(full_name.lower())
+
+    def get_or_create(self, name):
+        mentor = self.by_name.get(name)
+        if mentor is None:
+            mentor = Mentor.objects.create(name=name)
+            self.by_id[mentor.id] = mentor
+            self.by_name[name] = mentor
+            self._ci = None
+        return mentor
+
+    def set_full_name(self, mentor, full_name):
+        if mentor.full_name != full_name:
+            mentor.full_name = full_name
+            self.changed.add(mentor.id)
+            self._ci = None
+
+    def remove(self, mentor):
+        self.by_id.pop(mentor.id, None)
+        self.by_name.pop(mentor.name, None)
+        self.changed.discard(mentor.id)
+        self._ci = None
+
+    def save(self):
+        Mentor.objects.bulk_update([self.by_id[i] for i in self.changed], ["full_name"])
+        self.changed.clear()
+
+
 # ---------------- IMPORT STUDENTS ----------------
-def import_students_from_excel(file, module):
+def parse_student_sheet(file):
+    """
+    Read a student master sheet into column arrays.
 
-    # read raw first
-    raw = pd.read_excel(file, header=None)
+    Returns {"columns": detected header per field (None when missing),
+    "data": field -> values of the data rows, "row_count": n}; no DB access,
+    so the result can be cached for a preview and imported later.
+    """
+    _, rows = workbook.read_rows(file)
 
     # detect header row dynamically
-    header_row = detect_header_row(raw)
-
-    # reload with header
-    df = pd.read_excel(file, header=header_row)
+    header_row = detect_header_row(rows)
 
     # normalize headers
-    df.columns = [normalize(c) for c in df.columns]
+    headers = _header_labels(rows[header_row]) if header_row < len(rows) else []
 
     # detect columns
-    enrollment_col = find_col(df.columns, ['enrol'])
-    name_col = find_col(df.columns, ['name of student', 'student name', 'the name must be'])
-    roll_col = find_col(df.columns, ['roll'])
-    mentor_short_col = find_col(df.columns, ['short name of mentor', 'mentor short'])
-    mentor_full_col = find_col(df.columns, ['name of mentor'])
-    mentor_fallback_col = find_col(df.columns, ['mentor'])
-    student_col = (
-        find_col(df.columns, ['student no'])
-        or find_col(df.columns, ['student mobile'])
-        or find_col(df.columns, ['student mobile no', 'student mobile number', 'student mobileno'])
-        or find_col(df.columns, ['student contact', 'student phone', 'student phone no'])
-    )
-    father_col = find_col(df.columns, ['parent no', 'father'])
-    mother_col = find_col(df.columns, ['mother'])
-    batch_col = find_col(df.columns, ['branch', 'batch'])
+    columns = {
+        'enrollment': find_col(headers, ['enrol']),
+        'name': find_col(headers, ['name of student', 'student name', 'the name must be']),
+        'roll': find_col(headers, ['roll']),
+        'mentor_short': find_col(headers, ['short name of mentor', 'mentor short']),
+        'mentor_full': find_col(headers, ['name of mentor']),
+        'mentor_raw': find_col(headers, ['mentor']),
+        'student': (
+            find_col(headers, ['student no'])
+            or find_col(headers, ['student mobile'])
+            or find_col(headers, ['student mobile no', 'student mobile number', 'student mobileno'])
+            or find_col(headers, ['student contact', 'student phone', 'student phone no'])
+        ),
+        'father': find_col(headers, ['parent no', 'father']),
+        'mother': find_col(headers, ['mother']),
+        'batch': find_col(headers, ['branch', 'batch']),
+    }
+
+    # column arrays for the data rows below the header
+    data_start = header_row + 1
+
+    def values(col):
+        idx = headers.index(col) if col is not None else None
+        return workbook.column(rows, idx, data_start)
+
+    return {
+        'columns': columns,
+        'data': {key: values(col) for key, col in columns.items()},
+        'row_count': max(len(rows) - data_start, 0),
+    }
+
+
+def _student_values(row):
+    """Model-safe values of one sheet row (enrollment is "" when missing)."""
+    return {
+        'enrollment': clean_number(row['enrollment'])[:20],
+        'name': safe_text(row['name'], 100),
+        'roll': safe_int(row['roll']),
+        'mentor_short': safe_text(row['mentor_short'], 50).upper(),
+        'mentor_full': safe_text(row['mentor_full'], 100),
+        'mentor_raw': safe_text(row['mentor_raw'], 100),
+        'student_mobile': format_phone(clean_number(row['student']))[:15],
+        'father': format_phone(clean_number(row['father']))[:15],
+        'mother': format_phone(clean_number(row['mother']))[:15],
+        'batch': safe_text(row['batch'], 20),
+    }
+
+
+def _mentor_name(values, mentors):
+    # Canonical mentor code:
+    # - 3 letters => short code
+    # - full name => resolve via known full_name mapping, else keep as-is
+    mentor_short = values['mentor_short']
+    mentor_raw = values['mentor_raw']
+    if mentor_short:
+        return mentor_short[:50]
+    if mentor_raw and len(mentor_raw.replace(" ", "")) <= 3:
+        return mentor_raw.upper()[:50]
+    full_candidate = values['mentor_full'] or mentor_raw
+    if full_candidate:
+        matched = mentors.by_full_name_iexact(full_candidate)
+        return (matched.name if matched else full_candidate)[:50]
+    return "UNKNOWN"
+
+
+def _skipped_row(idx, row, reason):
+    return {
+        "row": int(idx) + 2,
+        "roll": clean_number(row['roll']),
+        "name": safe_text(row['name'], 100),
+        "enrollment": clean_number(row['enrollment']),
+        "reason": reason,
+    }
+
+
+def preview_students(file, module, parsed=None):
+    """
+    Dry run of import_students_from_excel: what the upload would add,
+    update and skip, without writing. Returns (parsed, summary).
+    """
+    parsed = parsed or parse_student_sheet(file)
+    data = parsed['data']
+    mentors = _MentorIndex()
+    stored = {
+        s['enrollment']: s
+        for s in Student.objects.filter(module=module).values(
+            'enrollment', 'name', 'roll_no', 'mentor__name', 'student_mobile', 'father_mobile', 'mother_mobile', 'batch'
+        )
+    }
+
+    rows = {}
+    added = updated = 0
+    skipped_rows = []
+    for idx in range(parsed['row_count']):
+        row = {key: col[idx] for key, col in data.items()}
+        values = _student_values(row)
+        if not values['enrollment']:
+            skipped_rows.append(_skipped_row(idx, row, "Missing enrollment"))
+            continue
+        # counted per row and a repeated enrollment keeps its last row, as in the import
+        if values['enrollment'] in rows or values['enrollment'] in stored:
+            updated += 1
+        else:
+            added += 1
+        rows[values['enrollment']] = {
+            'name': values['name'],
+            'roll_no': values['roll'],
+            'mentor__name': _mentor_name(values, mentors),
+            'student_mobile': values['student_mobile'],
+            'father_mobile': values['father'],
+            'mother_mobile': values['mother'],
+            'batch': values['batch'],
+        }
+
+    new_enrollments = [e for e in rows if e not in stored]
+    changes = []
+    changed = 0
+    for enrollment, new in rows.items():
+        old = stored.get(enrollment)
+        if old is None:
+            continue
+        fields = [f for f, v in new.items() if old[f] != v]
+        if fields:
+            changed += 1
+            if len(changes) < SAMPLE_SIZE:
+                changes.append({
+                    "enrollment": enrollment,
+                    "changes": {f: [old[f], new[f]] for f in fields},
+                })
+
+    return parsed, {
+        "rows_total": parsed['row_count'],
+        "added": added,
+        "updated": updated,
+        "changed": changed,
+        "unchanged": len(rows) - len(new_enrollments) - changed,
+        "skipped": len(skipped_rows),
+        "columns": parsed['columns'],
+        "added_sample": new_enrollments[:SAMPLE_SIZE],
+        "skipped_rows": skipped_rows[:SAMPLE_SIZE],
+        "sample": changes,
+    }
+
+
+def import_students_from_excel(file, module, parsed=None):
+    """`parsed` is a parse_student_sheet() result (e.g. cached by a preview); the file is read otherwise."""
+    parsed = parsed or parse_student_sheet(file)
+    data = parsed['data']
+    row_count = parsed['row_count']
 
     added = 0
     updated = 0
@@ -206,89 +411,93 @@ def import_students_from_excel(file, module):
 
     skipped_rows = []
 
-    for idx, row in df.iterrows():
-
-        try:
-            enrollment = clean_number(row.get(enrollment_col))
-            if not enrollment:
-                skipped_rows.append({
-                    "row": int(idx) + 2,
-                    "roll": clean_number(row.get(roll_col)),
-                    "name": safe_text(row.get(name_col), 100),
-                    "enrollment": "",
-                    "reason": "Missing enrollment",
-                })
+    mentors = _MentorIndex()
+    existing = set(Student.objects.filter(module=module).values_list("enrollment", flat=True))
+    pending = {}
+    # modules whose students change mentor; their follow-up counters are recounted
+    regrouped = {module.id}
+
+    with transaction.atomic():
+        for idx in range(row_count):
+            row = {key: col[idx] for key, col in data.items()}
+
+            try:
+                values = _student_values(row)
+                enrollment = values['enrollment']
+                if not enrollment:
+                    skipped_rows.append(_skipped_row(idx, row, "Missing enrollment"))
+                    skipped += 1
+                    continue
+
+                mentor_short = values['mentor_short']
+                mentor_full = values['mentor_full']
+                mentor_name = _mentor_name(values, mentors)
+
+                # each DB step gets a savepoint: on Postgres a failed statement would
+                # otherwise abort the whole import instead of skipping this row
+                with transaction.atomic():
+                    mentor = mentors.get_or_create(mentor_name)
+
+                # If both full and short are available, merge old full-name mentor bucket into short-name mentor.
+                if mentor_short and mentor_full:
+                    full_mentor_obj = mentors.by_name_iexact(mentor_full)
+                    if full_mentor_obj and full_mentor_obj.id != mentor.id:
+                        with transaction.atomic():
+                            moved = set(
+                                Student.objects.filter(mentor=full_mentor_obj).values_list("module_id", flat=True)
+                            )
+                            Student.objects.filter(mentor=full_mentor_obj).update(mentor=mentor)
+                            Mentor.objects.filter(id=full_mentor_obj.id).delete()
+                        # in-memory state follows only once the merge is committed to the savepoint
+                        regrouped.update(moved)
+                        for student in pending.values():
+                            if student.mentor_id == full_mentor_obj.id:
+                                student.mentor = mentor
+                        mentors.remove(full_mentor_obj)
+
+                if mentor_full:
+                    mentors.set_full_name(mentor, mentor_full)
+
+                pending[enrollment] = Student(
+                    module=module,
+                    enrollment=enrollment,
+                    name=values['name'],
+                    roll_no=values['roll'],
+                    mentor=mentor,
+                    student_mobile=values['student_mobile'],
+                    father_mobile=values['father'],
+                    mother_mobile=values['mother'],
+                    batch=values['batch'],
+                )
+
+                if enrollment in existing:
+                    updated += 1
+                else:
+                    existing.add(enrollment)
+                    added += 1
+            except Exception as e:
+                # Skip bad rows instead of failing whole upload
+                skipped_rows.append(_skipped_row(idx, row, str(e)[:180]))
                 skipped += 1
-                continue
 
-            # model-safe values
-            name = safe_text(row.get(name_col), 100)
-            roll = safe_int(row.get(roll_col))
-            mentor_short = safe_text(row.get(mentor_short_col), 50).upper()
-            mentor_full = safe_text(row.get(mentor_full_col), 100)
-            mentor_raw = safe_text(row.get(mentor_fallback_col), 100)
-
-            # Canonical mentor code:
-            # - 3 letters => short code
-            # - full name => resolve via known full_name mapping, else keep as-is
-            mentor_name = ""
-            if mentor_short:
-                mentor_name = mentor_short[:50]
-            elif mentor_raw and len(mentor_raw.replace(" ", "")) <= 3:
-                mentor_name = mentor_raw.upper()[:50]
-            else:
-                full_candidate = mentor_full or mentor_raw
-                if full_candidate:
-                    matched = Mentor.objects.filter(full_name__iexact=full_candidate).first()
-                    mentor_name = (matched.name if matched else full_candidate)[:50]
-                else:
-                    mentor_name = "UNKNOWN"
-
-            student_mobile = format_phone(clean_number(row.get(student_col)))[:15]
-            father = format_phone(clean_number(row.get(father_col)))[:15]
-            mother = format_phone(clean_number(row.get(mother_col)))[:15]
-            batch = safe_text(row.get(batch_col), 20)
-
-            mentor, _ = Mentor.objects.get_or_create(name=mentor_name)
-            if mentor_full and mentor.full_name != mentor_full:
-                mentor.full_name = mentor_full
-                mentor.save(update_fields=["full_name"])
-
-            # If both full and short are available, merge old full-name mentor bucket into short-name mentor.
-            if mentor_short and mentor_full:
-                full_mentor_obj = Mentor.objects.filter(name__iexact=mentor_full).exclude(id=mentor.id).first()
-                if full_mentor_obj:
-                    Student.objects.filter(mentor=full_mentor_obj).update(mentor=mentor)
-                    if not Student.objects.filter(mentor=full_mentor_obj).exists():
-                        full_mentor_obj.delete()
-
-            _, created = Student.objects.update_or_create(
-                module=module,
-                enrollment=enrollment[:20],
-                defaults={
-                    'name': name,
-                    'roll_no': roll,
-                    'mentor': mentor,
-                    'student_mobile': student_mobile,
-                    'father_mobile': father,
-                    'mother_mobile': mother,
-                    'batch': batch
-                }
-            )
-
-            if created:
-                added += 1
-            else:
-                updated += 1
-        except Exception as e:
-            # Skip bad rows instead of failing whole upload
-            skipped_rows.append({
-                "row": int(idx) + 2,
-                "roll": clean_number(row.get(roll_col)),
-                "name": safe_text(row.get(name_col), 100),
-                "enrollment": clean_number(row.get(enrollment_col)),
-                "reason": str(e)[:180],
-            })
-            skipped += 1
+        mentors.save()
+
+        # one upsert per chunk; a repeated enrollment keeps its last row
+        Student.objects.bulk_create(
+            list(pending.values()),
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["module", "enrollment"],
+            update_fields=[
+                "name",
+                "roll_no",
+                "mentor",
+                "student_mobile",
+                "father_mobile",
+                "mother_mobile",
+                "batch",
+            ],
+        )
+        stats_utils.refresh_modules(regrouped)
 
     return added, updated, skipped, skipped_rows
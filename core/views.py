@@ -1,10 +1,8 @@
 # ---------- DJANGO ----------
 import io
+import math
 import os
 import re
-import tempfile
-import threading
-import uuid
 import zipfile
 from zoneinfo import ZoneInfo
 
@@ -16,7 +14,7 @@ from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
-from django.db import close_old_connections
+from django.db import transaction
 from django.db.models import Count
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -24,7 +22,7 @@ from django.views.decorators.http import require_http_methods
 from django.http import JsonResponse
 from django.db.models import Max 
 from django.db.models import Q
-from urllib.parse import quote
+from urllib.parse import quote, urlencode
 from django.core.paginator import Paginator
 from openpyxl import Workbook
 from reportlab.lib.pagesizes import A4, landscape
@@ -38,6 +36,7 @@ from .forms import UploadFileForm
 from .models import (
     AcademicModule,
     Attendance,
+    BackgroundJob,
     CallRecord,
     CoordinatorModuleAccess,
     Mentor,
@@ -47,7 +46,6 @@ from .models import (
     SifMarksLock,
     ResultCallRecord,
     ResultUpload,
-    ResultUploadJob,
     Student,
     StudentPracticalMark,
     StudentResult,
@@ -56,10 +54,19 @@ from .models import (
 )
 
 # ---------- LOCAL UTILITIES ----------
-from .utils import import_students_from_excel, resolve_mentor_identity
-from .attendance_utils import import_attendance
-from .result_utils import import_compiled_bulk_all, import_compiled_result_sheet, import_result_sheet
-from .practical_utils import import_practical_marks, ordered_subjects
+from .utils import preview_students, resolve_mentor_identity
+from . import import_utils, job_utils, preview_utils, report_utils, rule_utils, stats_utils
+from .attendance_utils import (
+    DEFAULT_THRESHOLD,
+    SheetParseError,
+    preview_attendance,
+)
+from .result_utils import (
+    diff_text,
+    preview_compiled_bulk,
+    preview_subject_result,
+)
+from .practical_utils import ordered_subjects, preview_practical_marks
 from .pdf_report import generate_student_pdf, generate_student_prefilled_pdf
 from .module_utils import allowed_modules_for_user, get_current_module, is_superadmin_user
 
@@ -79,6 +86,10 @@ def _active_module(request):
     return get_current_module(request)
 
 
+def _attendance_threshold(module):
+    return module.attendance_threshold if module else DEFAULT_THRESHOLD
+
+
 def _require_superadmin(request):
     if not request.user.is_authenticated or request.session.get("mentor"):
         return JsonResponse({"ok": False, "msg": "Unauthorized"}, status=401)
@@ -114,7 +125,7 @@ def _latest_result_map_for_student(student, module):
     subjects = Subject.objects.filter(module=module, is_active=True)
     for s in subjects:
         upload = (
-            ResultUpload.objects.filter(module=module, subject=s)
+            ResultUpload.objects.live().filter(module=module, subject=s)
             .order_by("-uploaded_at")
             .first()
         )
@@ -180,19 +191,8 @@ def _sif_marks_rows_for_student(student, module):
     return rows
 
 
-def _result_report_text(test_name, subject_name, mentor_name, total, received, not_received, message_done):
-    if test_name == "T1":
-        rule = f"Less than 9 marks in {test_name}"
-    elif test_name == "T2":
-        rule = "Less than 9 marks in T2 & less than 18 in (T1+T2)"
-    elif test_name == "T3":
-        rule = "Less than 9 marks in T3 & less than 27 in (T1+T2+T3)"
-    elif test_name == "T4":
-        rule = "Less than 18 marks in SEE & less than 35 in (T1+T2+T3+SEE)"
-    else:
-        rule = "Less than 35 marks in REMEDIAL"
-
-    return f"""📞Phone call done regarding failed in {subject_name} ({rule})
+def _result_report_text(rule, subject_name, mentor_name, total, received, not_received, message_done):
+    return f"""📞Phone call done regarding failed in {subject_name} ({rule.reason})
 Name of Faculty- {mentor_name}
 Total no of calls- {total:02d}
 Received Calls - {received:02d}
@@ -200,18 +200,21 @@ Not received- {not_received:02d}
 No of Message done as call not Received - {message_done:02d}"""
 
 
-def _result_filter_config(test_name):
+def _result_filter_config(test_name, rule):
     test_name = (test_name or "").upper()
+    config = {
+        "current_key": "current_fail",
+        "current_label": rule.current_label,
+        "total_key": "total_fail",
+        "total_label": rule.total_label,
+        "either_key": "either_fail",
+        "either_label": rule.either_label,
+        "current_threshold": rule.current_below,
+        "total_threshold": rule.total_below,
+    }
     if test_name == "T1":
         return {
-            "current_key": "current_fail",
-            "current_label": "T1<9",
-            "total_key": "total_fail",
-            "total_label": "till T1<9",
-            "either_key": "either_fail",
-            "either_label": "Either (T1<9 OR till T1<9)",
-            "current_threshold": 9,
-            "total_threshold": 9,
+            **config,
             "exam_col_label": "T1 marks /25",
             "total_col_label": "Total till T1 /25",
             "display_columns": [
@@ -221,14 +224,7 @@ def _result_filter_config(test_name):
         }
     if test_name == "T2":
         return {
-            "current_key": "current_fail",
-            "current_label": "T2<9",
-            "total_key": "total_fail",
-            "total_label": "T1+T2<18",
-            "either_key": "either_fail",
-            "either_label": "Either (T2<9 OR T1+T2<18)",
-            "current_threshold": 9,
-            "total_threshold": 18,
+            **config,
             "exam_col_label": "T2 marks /25",
             "total_col_label": "T1+T2 /50",
             "display_columns": [
@@ -239,14 +235,7 @@ def _result_filter_config(test_name):
         }
     if test_name == "T3":
         return {
-            "current_key": "current_fail",
-            "current_label": "T3<9",
-            "total_key": "total_fail",
-            "total_label": "T1+T2+T3<27",
-            "either_key": "either_fail",
-            "either_label": "Either (T3<9 OR T1+T2+T3<27)",
-            "current_threshold": 9,
-            "total_threshold": 27,
+            **config,
             "exam_col_label": "T3 marks /25",
             "total_col_label": "T1+T2+T3 /75",
             "display_columns": [
@@ -258,14 +247,7 @@ def _result_filter_config(test_name):
         }
     if test_name == "T4":
         return {
-            "current_key": "current_fail",
-            "current_label": "T4<18",
-            "total_key": "total_fail",
-            "total_label": "T1+T2+T3+T4<35",
-            "either_key": "either_fail",
-            "either_label": "Either (T4<18 OR T1+T2+T3+T4<35)",
-            "current_threshold": 18,
-            "total_threshold": 35,
+            **config,
             "exam_col_label": "T4 marks /50",
             "total_col_label": "T1+T2+T3+(T4/2) /100",
             "display_columns": [
@@ -278,14 +260,7 @@ def _result_filter_config(test_name):
             ],
         }
     return {
-        "current_key": "current_fail",
-        "current_label": "REM<35",
-        "total_key": "total_fail",
-        "total_label": "REM<35",
-        "either_key": "either_fail",
-        "either_label": "Either (REM<35)",
-        "current_threshold": 35,
-        "total_threshold": 35,
+        **config,
         "exam_col_label": "REM marks /100",
         "total_col_label": "Total till REM /100",
         "display_columns": [
@@ -538,7 +513,7 @@ def superadmin_home(request):
                 "students": student_qs.count(),
                 "mentors": Mentor.objects.filter(student__module=m).distinct().count(),
                 "attendance_rows": Attendance.objects.filter(student__module=m).count(),
-                "result_uploads": ResultUpload.objects.filter(module=m).count(),
+                "result_uploads": ResultUpload.objects.live().filter(module=m).count(),
                 "practical_uploads": PracticalMarkUpload.objects.filter(module=m).count(),
             }
         )
@@ -558,6 +533,35 @@ def superadmin_home(request):
 
 
 # ---------------- STUDENT MASTER ----------------
+def _page_job(request, module, kind):
+    # upload pages redirect to ?job=<id> after queueing; the page polls it until it finishes
+    job_id = (request.GET.get("job") or "").strip()
+    if not job_id or not module:
+        return None
+    return BackgroundJob.objects.filter(job_id=job_id, module=module, kind=kind).first()
+
+
+def _job_outcome(job):
+    # message of a finished upload job, "" while it still runs
+    if job.status == BackgroundJob.STATUS_COMPLETED:
+        return (job.result_payload or {}).get("msg") or job.message or "Upload done."
+    if job.status == BackgroundJob.STATUS_CANCELLED:
+        return "Upload cancelled."
+    if job.status == BackgroundJob.STATUS_FAILED:
+        return f"Upload failed: {job.message}"
+    return ""
+
+
+def _wants_preview(request):
+    # preview=1 parses and matches the upload without writing; the answer carries
+    # a preview_token that lets the real upload of the same file skip parsing
+    return (request.POST.get("preview") or "").strip() == "1"
+
+
+def _preview_token(request):
+    return (request.POST.get("preview_token") or "").strip()
+
+
 @login_required
 def upload_students(request):
     module = _active_module(request)
@@ -568,21 +572,44 @@ def upload_students(request):
 
     if request.method == 'POST':
         if request.POST.get("action") == "clear_module_students":
-            deleted_count, _ = Student.objects.filter(module=module).delete()
+            with transaction.atomic():
+                deleted_count, _ = Student.objects.filter(module=module).delete()
+                stats_utils.refresh(module.id)
             message = f"Deleted student master data for module '{module.name}'. Records removed: {deleted_count}"
         else:
             form = UploadFileForm(request.POST, request.FILES)
             if form.is_valid():
                 file = request.FILES['file']
-                try:
-                    added, updated, skipped, skipped_rows = import_students_from_excel(file, module)
-                    message = f"Added: {added} | Updated: {updated} | Skipped: {skipped}"
-                except Exception as e:
-                    message = f"Upload failed: {str(e)}"
+                if _wants_preview(request):
+                    try:
+                        parsed, summary = preview_students(file, module)
+                    except Exception as e:
+                        return JsonResponse({"ok": False, "msg": f"Preview failed: {str(e)}"})
+                    token = preview_utils.remember(module, BackgroundJob.KIND_STUDENT_IMPORT, "", [file], parsed)
+                    return JsonResponse(preview_utils.payload(
+                        summary,
+                        token,
+                        f"New: {summary['added']} | Existing: {summary['updated']} "
+                        f"(changed: {summary['changed']}) | Skipped: {summary['skipped']}",
+                    ))
+                job = job_utils.enqueue(
+                    BackgroundJob.KIND_STUDENT_IMPORT,
+                    module,
+                    params={"preview_token": _preview_token(request)},
+                    files={"file": file},
+                    created_by=request.user.username,
+                )
+                return redirect(f"/upload-students/?job={job.job_id}")
             else:
                 message = "Please select a file to upload."
     else:
         form = UploadFileForm()
+
+    job = _page_job(request, module, BackgroundJob.KIND_STUDENT_IMPORT)
+    if job and job.status not in BackgroundJob.ACTIVE_STATUSES:
+        message = _job_outcome(job)
+        skipped_rows = (job.result_payload or {}).get("skipped_rows") or []
+        job = None
 
     students = Student.objects.select_related("mentor").filter(module=module).order_by("roll_no")
 
@@ -592,6 +619,7 @@ def upload_students(request):
         'students': students,
         'module': module,
         'skipped_rows': skipped_rows[:200],
+        'job': job,
     })
 
 # ---------------- ATTENDANCE VIEW & UPLOAD ----------------
@@ -621,25 +649,33 @@ def upload_attendance(request):
                 "msg": f"Week {week_no} is LOCKED. Upload not allowed."
             })
 
-        # import
-        count = import_attendance(weekly_file, overall_file, week_no, module, rule)
-
-        # mentor-wise counts
-        mentor_stats = list(
-            CallRecord.objects.filter(week_no=week_no, student__module=module)
-            .values("student__mentor__name")
-            .annotate(total=Count("id"))
-            .order_by("student__mentor__name")
+        if _wants_preview(request):
+            parsed, summary = preview_attendance(weekly_file, overall_file, week_no, module, rule)
+            token = preview_utils.remember(
+                module, BackgroundJob.KIND_ATTENDANCE_IMPORT, f"week-{week_no}", [weekly_file, overall_file], parsed
+            )
+            return JsonResponse(preview_utils.payload(
+                summary,
+                token,
+                f"Week {week_no}: {summary['matched']} of {summary['rows_total']} enrollments matched, "
+                f"{summary['unmatched']} unmatched, {summary['changed']} changed, "
+                f"{summary['calls']} follow-up calls.",
+            ))
+
+        job = job_utils.enqueue(
+            BackgroundJob.KIND_ATTENDANCE_IMPORT,
+            module,
+            params={"week": week_no, "rule": rule, "preview_token": _preview_token(request)},
+            files={"weekly_file": weekly_file, "overall_file": overall_file},
+            created_by=request.user.username,
         )
+        return JsonResponse({"ok": True, "job_id": job.job_id})
 
-        total_calls = sum(m["total"] for m in mentor_stats)
-
+    except SheetParseError as e:
         return JsonResponse({
-            "ok": True,
-            "msg": f"{count} students require follow-up calls for Week {week_no}",
-            "week": week_no,
-            "mentor_stats": mentor_stats,
-            "total_calls": total_calls
+            "ok": False,
+            "msg": str(e),
+            "errors": e.errors,
         })
 
     except Exception as e:
@@ -649,171 +685,83 @@ def upload_attendance(request):
         })
 
 
-def _process_result_upload(module, username, test_name, subject_id, upload_mode, bulk_confirm, file_obj, progress_cb=None, cancel_cb=None):
-    is_all_tests = test_name == "ALL_EXAMS"
-    is_all_subjects = str(subject_id).upper() == "ALL"
-
-    if is_all_tests and is_all_subjects:
-        summary = import_compiled_bulk_all(
-            file_obj,
-            username,
-            module=module,
-            progress_cb=progress_cb,
-            cancel_cb=cancel_cb,
-        )
-        return {
-            "ok": True,
-            "msg": (
-                f"Bulk replace completed. Created uploads: {summary['uploads_created']}. "
-                f"Rows matched: {summary['rows_matched']}. Failed calls: {summary['rows_failed']}."
-            ),
-            "test_name": "ALL_EXAMS",
-            "subject_name": "ALL",
-            "upload_id": "",
-            "mentor_stats": [],
-            "total_calls": summary["rows_failed"],
-            "upload_mode": upload_mode,
-            "found_subjects": summary.get("found_subjects", []),
-            "used_subject": "ALL",
-        }
-
-    subject = Subject.objects.filter(id=subject_id, module=module, is_active=True).first()
-    if not subject:
-        raise Exception("Invalid subject")
-    if subject.result_format == Subject.FORMAT_T4_ONLY and test_name != "T4":
-        raise Exception("This subject is configured as Only T4. Please upload in T4.")
-
-    upload, _ = ResultUpload.objects.update_or_create(
-        module=module,
-        test_name=test_name,
-        subject=subject,
-        defaults={"uploaded_by": username},
-    )
+@require_http_methods(["POST"])
+def upload_attendance_batch(request):
+    module = _active_module(request)
 
-    if upload_mode == "compiled":
-        summary = import_compiled_result_sheet(file_obj, upload, progress_cb=progress_cb, cancel_cb=cancel_cb)
-    else:
-        summary = import_result_sheet(file_obj, upload, progress_cb=progress_cb, cancel_cb=cancel_cb)
+    try:
+        rule = request.POST.get("rule") or "both"
+        batch_file = request.FILES.get("batch_file")
+        if not batch_file:
+            return JsonResponse({"ok": False, "msg": "Batch file is required"})
 
-    mentor_stats = list(
-        ResultCallRecord.objects.filter(upload=upload)
-        .values("student__mentor__name")
-        .annotate(total=Count("id"))
-        .order_by("student__mentor__name")
-    )
-    total_calls = sum(m["total"] for m in mentor_stats)
-    return {
-        "ok": True,
-        "msg": (
-            f"Processed {summary['rows_total']} rows. "
-            f"Matched: {summary['rows_matched']}. "
-            f"Fail calls generated: {summary['rows_failed']}."
-        ),
-        "test_name": test_name,
-        "subject_name": subject.name,
-        "upload_id": upload.id,
-        "mentor_stats": mentor_stats,
-        "total_calls": total_calls,
-        "upload_mode": upload_mode,
-        "found_subjects": summary.get("found_subjects", []),
-        "used_subject": summary.get("used_subject", ""),
-    }
+        job = job_utils.enqueue(
+            BackgroundJob.KIND_ATTENDANCE_BATCH,
+            module,
+            params={"rule": rule},
+            files={"batch_file": batch_file},
+            created_by=request.user.username,
+        )
+        return JsonResponse({"ok": True, "job_id": job.job_id})
 
+    except SheetParseError as e:
+        return JsonResponse({
+            "ok": False,
+            "msg": str(e),
+            "errors": e.errors,
+        })
 
-def _run_result_upload_job(job_id, module_id, username, test_name, subject_id, upload_mode, bulk_confirm, temp_path):
-    close_old_connections()
-    try:
-        job = ResultUploadJob.objects.filter(job_id=job_id).first()
-        if not job:
-            return
-        job.status = ResultUploadJob.STATUS_RUNNING
-        job.message = "Reading marks and preparing result call list..."
-        job.save(update_fields=["status", "message", "updated_at"])
-
-        def cancel_cb():
-            return ResultUploadJob.objects.filter(job_id=job_id, cancel_requested=True).exists()
-
-        def progress_cb(current, total, enrollment, student_name, message):
-            ResultUploadJob.objects.filter(job_id=job_id).update(
-                progress_current=current or 0,
-                progress_total=total or 0,
-                current_enrollment=(enrollment or ""),
-                current_student_name=(student_name or ""),
-                message=(message or "Processing result upload..."),
-                updated_at=timezone.now(),
-            )
+    except Exception as e:
+        return JsonResponse({
+            "ok": False,
+            "msg": str(e)
+        })
 
-        module = AcademicModule.objects.filter(id=module_id).first()
-        if not module:
-            raise Exception("Module not found")
-
-        with open(temp_path, "rb") as f:
-            payload = _process_result_upload(
-                module=module,
-                username=username,
-                test_name=test_name,
-                subject_id=subject_id,
-                upload_mode=upload_mode,
-                bulk_confirm=bulk_confirm,
-                file_obj=f,
-                progress_cb=progress_cb,
-                cancel_cb=cancel_cb,
-            )
 
-        if cancel_cb():
-            ResultUploadJob.objects.filter(job_id=job_id).update(
-                status=ResultUploadJob.STATUS_CANCELLED,
-                message="Upload cancelled.",
-                updated_at=timezone.now(),
-            )
-            return
-
-        ResultUploadJob.objects.filter(job_id=job_id).update(
-            status=ResultUploadJob.STATUS_COMPLETED,
-            message="Upload completed.",
-            result_payload=payload,
-            progress_current=1,
-            progress_total=1,
-            updated_at=timezone.now(),
+def _preview_result_upload(module, test_name, subject_id, upload_mode, file_obj):
+    if test_name == "ALL_EXAMS":
+        parsed, summary = preview_compiled_bulk(file_obj, module)
+        msg = (
+            f"Bulk replace would create {summary['uploads_created']} uploads. "
+            f"Rows matched: {summary['rows_matched']}. Failed calls: {summary['rows_failed']}."
         )
-    except Exception as exc:
-        cancelled = ResultUploadJob.objects.filter(job_id=job_id, cancel_requested=True).exists()
-        ResultUploadJob.objects.filter(job_id=job_id).update(
-            status=(ResultUploadJob.STATUS_CANCELLED if cancelled else ResultUploadJob.STATUS_FAILED),
-            message=("Upload cancelled." if cancelled else str(exc)),
-            updated_at=timezone.now(),
+    else:
+        subject = import_utils.result_subject(module, test_name, subject_id)
+        parsed, summary = preview_subject_result(file_obj, module, test_name, subject, upload_mode)
+        msg = (
+            f"{summary['rows_total']} rows. Matched: {summary['rows_matched']}. "
+            f"Unmatched: {summary['unmatched']}. Fail calls: {summary['rows_failed']}."
         )
-    finally:
-        try:
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
-        except Exception:
-            pass
-        close_old_connections()
+    token = preview_utils.remember(
+        module,
+        BackgroundJob.KIND_RESULT_UPLOAD,
+        import_utils.result_preview_scope(test_name, subject_id, upload_mode),
+        [file_obj],
+        parsed,
+    )
+    return preview_utils.payload(summary, token, msg + diff_text(summary.get("diff")))
 
 
 @login_required
 @require_http_methods(["GET"])
-def upload_results_progress(request, job_id):
+def job_progress(request, job_id):
     if "mentor" in request.session:
         return JsonResponse({"ok": False, "msg": "Unauthorized"}, status=403)
     module = _active_module(request)
-    job = ResultUploadJob.objects.filter(job_id=job_id, module=module).first()
-    if not job:
+    payload = job_utils.status_payload(job_id, [module.id] if module else [])
+    if payload is None:
         return JsonResponse({"ok": False, "msg": "Job not found"}, status=404)
-    return JsonResponse(
-        {
-            "ok": True,
-            "job_id": job.job_id,
-            "status": job.status,
-            "message": job.message or "",
-            "progress_current": job.progress_current,
-            "progress_total": job.progress_total,
-            "current_enrollment": job.current_enrollment or "",
-            "current_student_name": job.current_student_name or "",
-            "result": job.result_payload or {},
-        }
-    )
+    return JsonResponse(payload)
+
+
+@login_required
+@require_http_methods(["POST"])
+def job_cancel(request, job_id):
+    if "mentor" in request.session:
+        return JsonResponse({"ok": False, "msg": "Unauthorized"}, status=403)
+    if not job_utils.cancel(job_id, _active_module(request)):
+        return JsonResponse({"ok": False, "msg": "Upload is already finished."})
+    return JsonResponse({"ok": True, "msg": "Cancel requested."})
 
 
 def _to_ist_datetime_text(dt):
@@ -846,19 +794,6 @@ def _exam_name_for_sif(test_name):
     return test_name or "-"
 
 
-def _result_thresholds(test_name):
-    test = (test_name or "").upper()
-    if test == "T1":
-        return 9, 9
-    if test == "T2":
-        return 9, 18
-    if test == "T3":
-        return 9, 27
-    if test == "T4":
-        return 18, 35
-    return 35, 35
-
-
 def _test_sort_key(test_name):
     order = {"T1": 1, "T2": 2, "T3": 3, "T4": 4, "REMEDIAL": 5}
     return order.get((test_name or "").upper(), 99)
@@ -873,22 +808,6 @@ def _subject_sort_key(subject_name):
     return 99
 
 
-@login_required
-@require_http_methods(["POST"])
-def upload_results_cancel(request, job_id):
-    if "mentor" in request.session:
-        return JsonResponse({"ok": False, "msg": "Unauthorized"}, status=403)
-    module = _active_module(request)
-    updated = ResultUploadJob.objects.filter(
-        job_id=job_id,
-        module=module,
-        status__in=[ResultUploadJob.STATUS_QUEUED, ResultUploadJob.STATUS_RUNNING],
-    ).update(cancel_requested=True, message="Cancelling upload...", updated_at=timezone.now())
-    if not updated:
-        return JsonResponse({"ok": False, "msg": "Upload is already finished."})
-    return JsonResponse({"ok": True, "msg": "Cancel requested."})
-
-
 @login_required
 @require_http_methods(["GET", "POST"])
 def upload_results(request):
@@ -929,39 +848,24 @@ def upload_results(request):
             return JsonResponse({"ok": False, "msg": "Please select BOTH ALL EXAMS and ALL subjects for bulk upload."})
         if is_all_tests and is_all_subjects and upload_mode != "compiled":
             return JsonResponse({"ok": False, "msg": "ALL_EXAMS + ALL subjects is supported only for Compiled sheet mode."})
+        if _wants_preview(request):
+            # nothing is replaced yet, so the bulk confirmation is asked on commit
+            return JsonResponse(_preview_result_upload(module, test_name, subject_id, upload_mode, file_obj))
         if is_all_tests and is_all_subjects and bulk_confirm != "yes":
             return JsonResponse({"ok": False, "msg": "Bulk upload cancelled. Please select YES to replace old uploads."})
 
-        suffix = os.path.splitext(getattr(file_obj, "name", ""))[1] or ".xlsx"
-        fd, temp_path = tempfile.mkstemp(prefix="result_upload_", suffix=suffix, dir=tempfile.gettempdir())
-        with os.fdopen(fd, "wb") as tmp:
-            for chunk in file_obj.chunks():
-                tmp.write(chunk)
-
-        job_key = str(uuid.uuid4())
-        job = ResultUploadJob.objects.create(
-            job_id=job_key,
-            module=module,
-            created_by=request.user.username,
-            status=ResultUploadJob.STATUS_QUEUED,
-            message="Upload queued...",
-        )
-
-        t = threading.Thread(
-            target=_run_result_upload_job,
-            kwargs={
-                "job_id": job.job_id,
-                "module_id": module.id,
-                "username": request.user.username,
+        job = job_utils.enqueue(
+            BackgroundJob.KIND_RESULT_UPLOAD,
+            module,
+            params={
                 "test_name": test_name,
                 "subject_id": str(subject_id),
                 "upload_mode": upload_mode,
-                "bulk_confirm": bulk_confirm,
-                "temp_path": temp_path,
+                "preview_token": _preview_token(request),
             },
-            daemon=True,
+            files={"result_file": file_obj},
+            created_by=request.user.username,
         )
-        t.start()
         return JsonResponse({"ok": True, "job_id": job.job_id})
     except Exception as e:
         return JsonResponse({"ok": False, "msg": str(e)})
@@ -981,7 +885,7 @@ def view_results(request):
     sort = request.GET.get("sort", "roll")
     direction = request.GET.get("dir", "asc")
 
-    latest_upload = ResultUpload.objects.filter(module=module).select_related("subject").order_by("-uploaded_at").first()
+    latest_upload = ResultUpload.objects.live().filter(module=module).select_related("subject").order_by("-uploaded_at").first()
     if not selected_test and not selected_subject and latest_upload:
         selected_test = latest_upload.test_name
         selected_subject = str(latest_upload.subject_id)
@@ -992,7 +896,7 @@ def view_results(request):
     if not selected_subject and subjects:
         selected_subject = str(subjects[0].id)
 
-    uploads = ResultUpload.objects.filter(module=module).select_related("subject").order_by("test_name", "subject__name")
+    uploads = ResultUpload.objects.live().filter(module=module).select_related("subject").order_by("test_name", "subject__name")
     upload_map = {(u.test_name, str(u.subject_id)): u for u in uploads}
     selected_upload = upload_map.get((selected_test, str(selected_subject))) if selected_subject else None
     if not selected_upload and latest_upload and not request.GET.get("test") and not request.GET.get("subject"):
@@ -1011,7 +915,8 @@ def view_results(request):
             cells.append({"subject": s, "upload": up, "applicable": applicable})
         matrix_rows.append({"test": test, "cells": cells})
 
-    config = _result_filter_config(selected_test)
+    rule = rule_utils.rule_for(module, selected_test)
+    config = _result_filter_config(selected_test, rule)
     records = []
     rows = []
     total_count = 0
@@ -1027,14 +932,11 @@ def view_results(request):
             .select_related("student", "student__mentor", "upload", "upload__subject")
         )
         if selected_filter == config["current_key"]:
-            base_qs = base_qs.filter(marks_current__lt=config["current_threshold"])
+            base_qs = base_qs.filter(rule.q_current())
         elif selected_filter == config["total_key"]:
-            base_qs = base_qs.filter(marks_total__lt=config["total_threshold"])
+            base_qs = base_qs.filter(rule.q_total())
         elif selected_filter == config["either_key"]:
-            base_qs = base_qs.filter(
-                Q(marks_current__lt=config["current_threshold"]) |
-                Q(marks_total__lt=config["total_threshold"])
-            )
+            base_qs = base_qs.filter(rule.q_either())
 
         mentor_counts = (
             base_qs.values("student__mentor__name")
@@ -1065,7 +967,7 @@ def view_results(request):
         prev_mark_map = {}
         for prev_test in ["T1", "T2", "T3"]:
             prev_upload = (
-                ResultUpload.objects.filter(module=module, test_name=prev_test, subject_id=selected_upload.subject_id)
+                ResultUpload.objects.live().filter(module=module, test_name=prev_test, subject_id=selected_upload.subject_id)
                 .order_by("-uploaded_at")
                 .first()
             )
@@ -1170,14 +1072,33 @@ def view_practical_marks(request):
             f = request.FILES.get("practical_file")
             if not f:
                 raise Exception("Please select practical marks file.")
-            summary = import_practical_marks(f, module=module, uploaded_by=request.user.username)
-            msg = (
-                f"Uploaded practical marks ({summary.get('mode','-')} mode). "
-                f"Rows: {summary['rows_total']}, matched: {summary['rows_matched']}."
+            if _wants_preview(request):
+                parsed, summary = preview_practical_marks(f, module)
+                token = preview_utils.remember(module, BackgroundJob.KIND_PRACTICAL_IMPORT, "", [f], parsed)
+                return JsonResponse(preview_utils.payload(
+                    summary,
+                    token,
+                    f"{summary['mode'].title()} sheet: {summary['rows_matched']} of {summary['rows_total']} rows matched. "
+                    f"New: {summary['added']}, changed: {summary['changed']}, removed: {summary['removed']}.",
+                ))
+            job = job_utils.enqueue(
+                BackgroundJob.KIND_PRACTICAL_IMPORT,
+                module,
+                params={"preview_token": _preview_token(request)},
+                files={"practical_file": f},
+                created_by=request.user.username,
             )
+            return redirect(f"/view-practical-marks/?job={job.job_id}")
         except Exception as exc:
+            if _wants_preview(request):
+                return JsonResponse({"ok": False, "msg": f"Preview failed: {exc}"})
             msg = f"Upload failed: {exc}"
 
+    job = _page_job(request, module, BackgroundJob.KIND_PRACTICAL_IMPORT)
+    if job and job.status not in BackgroundJob.ACTIVE_STATUSES:
+        msg = _job_outcome(job)
+        job = None
+
     subjects = ordered_subjects(module)
     students = list(Student.objects.filter(module=module).select_related("mentor").order_by("roll_no", "name"))
     marks_qs = StudentPracticalMark.objects.filter(module=module).select_related("subject", "student")
@@ -1201,6 +1122,7 @@ def view_practical_marks(request):
             "subjects": subjects,
             "rows": rows,
             "latest_upload": latest_upload,
+            "job": job,
         },
     )
 
@@ -1404,10 +1326,10 @@ def view_attendance(request):
 
         # ---------- FILTERS ----------
         if filter_type == "weekly":
-            qs = qs.filter(week_percentage__lt=80)
+            qs = qs.filter(week_percentage__lt=_attendance_threshold(module))
 
         elif filter_type == "overall":
-            qs = qs.filter(overall_percentage__lt=80)
+            qs = qs.filter(overall_percentage__lt=_attendance_threshold(module))
 
         elif filter_type == "either":
             qs = qs.filter(call_required=True)
@@ -1478,8 +1400,10 @@ def delete_week(request):
     if request.method == "POST" and "delete_week" in request.POST:
         week_no = int(request.POST.get("week"))
 
-        Attendance.objects.filter(week_no=week_no, student__module=module).delete()
-        CallRecord.objects.filter(week_no=week_no, student__module=module).delete()
+        with transaction.atomic():
+            Attendance.objects.filter(week_no=week_no, student__module=module).delete()
+            CallRecord.objects.filter(week_no=week_no, student__module=module).delete()
+            stats_utils.refresh(module.id, weeks=[week_no])
 
         message = f"Week-{week_no} deleted successfully"
 
@@ -1490,8 +1414,10 @@ def delete_week(request):
         user = authenticate(username=request.user.username, password=password)
 
         if user:
-            Attendance.objects.filter(student__module=module).delete()
-            CallRecord.objects.filter(student__module=module).delete()
+            with transaction.atomic():
+                Attendance.objects.filter(student__module=module).delete()
+                CallRecord.objects.filter(student__module=module).delete()
+                stats_utils.refresh(module.id)
             message = "ALL WEEKS DELETED"
         else:
             message = "Wrong password"
@@ -1508,12 +1434,12 @@ def delete_results(request):
         return redirect("/")
     module = _active_module(request)
 
-    uploads = ResultUpload.objects.filter(module=module).select_related("subject").order_by("-uploaded_at")
+    uploads = ResultUpload.objects.live().filter(module=module).select_related("subject").order_by("-uploaded_at")
     message = ""
 
     if request.method == "POST" and "delete_upload" in request.POST:
         upload_id = request.POST.get("upload_id")
-        upload = ResultUpload.objects.filter(id=upload_id, module=module).select_related("subject").first()
+        upload = ResultUpload.objects.live().filter(id=upload_id, module=module).select_related("subject").first()
         if upload:
             label = f"{upload.test_name} - {upload.subject.name}"
             upload.delete()
@@ -1530,7 +1456,7 @@ def delete_results(request):
         else:
             message = "Wrong password"
 
-    uploads = ResultUpload.objects.filter(module=module).select_related("subject").order_by("-uploaded_at")
+    uploads = ResultUpload.objects.live().filter(module=module).select_related("subject").order_by("-uploaded_at")
     return render(
         request,
         "delete_results.html",
@@ -1595,18 +1521,16 @@ def mentor_dashboard(request):
     not_connected = []
 
     if selected_week:
-        week_calls = CallRecord.objects.filter(
-            student__mentor=mentor,
-            student__module=module,
-            week_no=selected_week
-        )
+        stats = report_utils.mentor_week(module, mentor, selected_week)
 
-        total = week_calls.count()
-        finished = week_calls.exclude(final_status__isnull=True).count()
-
-        if total > 0 and total == finished:
+        if stats.calls > 0 and stats.calls == stats.received + stats.not_received:
             all_done = True
-            not_connected = week_calls.filter(final_status="not_received")
+            not_connected = CallRecord.objects.filter(
+                student__mentor=mentor,
+                student__module=module,
+                week_no=selected_week,
+                final_status="not_received",
+            )
 
     
     return render(request,"mentor_dashboard.html",{
@@ -1723,7 +1647,7 @@ def save_other_call(request):
         attendance_call.parent_reason = f"PARENT::{parent_text}||FACULTY::{faculty_text}"
         if status in {"received", "not_received"}:
             attendance_call.final_status = status
-        attendance_call.save()
+        stats_utils.save_call(attendance_call)
         call.exam_name = ""
         call.subject_name = ""
         call.marks_obtained = None
@@ -1788,7 +1712,7 @@ def save_call(request):
         elif call.attempt2_time:
             call.final_status = "not_received"
 
-        call.save()
+        stats_utils.save_call(call)
         return JsonResponse({"ok": True})
 
 
@@ -1798,7 +1722,7 @@ def mark_message(request):
         module = _active_module(request)
         call=CallRecord.objects.get(id=request.POST.get("id"), student__module=module)
         call.message_sent=True
-        call.save()
+        stats_utils.save_call(call)
         return JsonResponse({"ok":True})
 
 
@@ -1817,34 +1741,22 @@ def mentor_report(request):
 
     students = Student.objects.filter(module=module, mentor=mentor_obj).count()
 
-    below80 = Attendance.objects.filter(
-        week_no=week, student__mentor=mentor_obj, student__module=module, call_required=True
-    ).count()
-
-    calls_done = CallRecord.objects.filter(
-        week_no=week, student__mentor=mentor_obj, student__module=module, final_status__isnull=False
-    ).count()
-
-    received = CallRecord.objects.filter(
-        week_no=week, student__mentor=mentor_obj, student__module=module, final_status="received"
-    ).count()
-
-    not_received = CallRecord.objects.filter(
-        week_no=week, student__mentor=mentor_obj, student__module=module, final_status="not_received"
-    ).count()
-
-    message_done = CallRecord.objects.filter(
-        week_no=week, student__mentor=mentor_obj, student__module=module, message_sent=True
-    ).count()
+    stats = report_utils.mentor_week(module, mentor_obj, week)
+    below80 = stats.need_call
+    received = stats.received
+    not_received = stats.not_received
+    calls_done = received + not_received
+    message_done = stats.msg_sent
 
     not_done = below80 - calls_done
+    threshold = f"{_attendance_threshold(module):g}"
 
     report = f"""
-Follow up Attendance < 80% (Week-{week} only & Overall Week-01 to {week}):
+Follow up Attendance < {threshold}% (Week-{week} only & Overall Week-01 to {week}):
 
 Mentor Name: {mentor_obj.name}
 Total no. Of students under mentorship: {students}
-No. Of students under mentorship whose attendance < 80%: {below80}
+No. Of students under mentorship whose attendance < {threshold}%: {below80}
 No. Of call done: {calls_done}
 No. Of call received: {received}
 No. Of call not received: {not_received}
@@ -1861,7 +1773,7 @@ def mentor_result_calls(request):
         return redirect("/")
     module = _active_module(request)
     uploads = list(
-        ResultUpload.objects.filter(module=module, calls__student__mentor=mentor, calls__student__module=module)
+        ResultUpload.objects.live().filter(module=module, calls__student__mentor=mentor, calls__student__module=module, calls__retired_at__isnull=True)
         .distinct()
         .order_by("-uploaded_at")
     )
@@ -1869,7 +1781,7 @@ def mentor_result_calls(request):
     selected_upload = None
     upload_id = request.GET.get("upload")
     if upload_id:
-        selected_upload = ResultUpload.objects.filter(id=upload_id, module=module).first()
+        selected_upload = ResultUpload.objects.live().filter(id=upload_id, module=module).first()
     if not selected_upload and uploads:
         selected_upload = uploads[0]
 
@@ -1971,7 +1883,7 @@ def mentor_result_report(request):
     module = _active_module(request)
 
     uploads = list(
-        ResultUpload.objects.filter(module=module, calls__student__mentor=mentor, calls__student__module=module)
+        ResultUpload.objects.live().filter(module=module, calls__student__mentor=mentor, calls__student__module=module, calls__retired_at__isnull=True)
         .distinct()
         .order_by("-uploaded_at")
     )
@@ -1979,7 +1891,7 @@ def mentor_result_report(request):
     selected_upload = None
     upload_id = request.GET.get("upload")
     if upload_id:
-        selected_upload = ResultUpload.objects.filter(id=upload_id, module=module).first()
+        selected_upload = ResultUpload.objects.live().filter(id=upload_id, module=module).first()
     if not selected_upload and uploads:
         selected_upload = uploads[0]
 
@@ -1995,7 +1907,7 @@ def mentor_result_report(request):
         not_received = calls.filter(final_status="not_received").count()
         message_done = calls.filter(message_sent=True).count()
         report = _result_report_text(
-            selected_upload.test_name,
+            rule_utils.rule_for(module, selected_upload.test_name),
             selected_upload.subject.name,
             mentor.name,
             total,
@@ -2095,45 +2007,7 @@ def coordinator_dashboard(request):
         return render(request,"coordinator_dashboard.html")
 
     week = int(week)
-    mentors = Mentor.objects.filter(student__module=module).distinct()
-    data = []
-
-    for m in mentors:
-
-        total_students = Student.objects.filter(module=module, mentor=m).count()
-
-        need_call = Attendance.objects.filter(
-            week_no=week, student__mentor=m, student__module=module, call_required=True
-        ).count()
-
-        received = CallRecord.objects.filter(
-            week_no=week, student__mentor=m, student__module=module, final_status="received"
-        ).count()
-
-        not_received = CallRecord.objects.filter(
-            week_no=week, student__mentor=m, student__module=module, final_status="not_received"
-        ).count()
-
-        done = received + not_received
-        not_done = max(need_call - done, 0)
-
-        message_sent = CallRecord.objects.filter(
-            week_no=week, student__mentor=m, student__module=module, message_sent=True
-        ).count()
-
-        percent = round((done/need_call)*100,1) if need_call else 0
-
-        data.append({
-            "mentor":m.name,
-            "students":total_students,
-            "need_call":need_call,
-            "done":done,
-            "received":received,
-            "not_received":not_received,
-            "not_done":not_done,
-            "msg_sent":message_sent,
-            "percent":percent
-        })
+    data = report_utils.mentor_attendance_stats(module, week)
 
     return render(request,"coordinator_dashboard.html",{"data":data,"week":week})
 
@@ -2229,7 +2103,8 @@ def _build_live_followup_rows(module, selected_mentor="", selected_type="all", s
         )
 
     result_calls = (
-        ResultCallRecord.objects.select_related("student", "student__mentor", "upload", "upload__subject")
+        ResultCallRecord.objects.live()
+        .select_related("student", "student__mentor", "upload", "upload__subject")
         .filter(student__module=module)
     )
     for c in result_calls:
@@ -2594,42 +2469,16 @@ def coordinator_result_report(request):
         return redirect("/mentor-dashboard/")
     module = _active_module(request)
 
-    uploads = ResultUpload.objects.filter(module=module).order_by("-uploaded_at")
+    uploads = ResultUpload.objects.live().filter(module=module).order_by("-uploaded_at")
     selected_upload = None
     upload_id = request.GET.get("upload")
     if upload_id:
-        selected_upload = ResultUpload.objects.filter(id=upload_id, module=module).first()
+        selected_upload = ResultUpload.objects.live().filter(id=upload_id, module=module).first()
     if not selected_upload:
         selected_upload = uploads.first()
 
-    data = []
-    if selected_upload:
-        mentors = (
-            Mentor.objects.filter(student__module=module, student__resultcallrecord__upload=selected_upload)
-            .distinct()
-            .order_by("name")
-        )
-        for m in mentors:
-            qs = ResultCallRecord.objects.filter(upload=selected_upload, student__mentor=m, student__module=module)
-            need_call = qs.count()
-            received = qs.filter(final_status="received").count()
-            not_received = qs.filter(final_status="not_received").count()
-            done = received + not_received
-            not_done = max(need_call - done, 0)
-            msg_sent = qs.filter(message_sent=True).count()
-            percent = round((done / need_call) * 100, 1) if need_call else 0
-            data.append(
-                {
-                    "mentor": m.name,
-                    "need_call": need_call,
-                    "done": done,
-                    "received": received,
-                    "not_received": not_received,
-                    "not_done": not_done,
-                    "msg_sent": msg_sent,
-                    "percent": percent,
-                }
-            )
+    data = report_utils.mentor_result_stats(module, selected_upload) if selected_upload else []
+    tests, matrix = report_utils.result_followup_matrix(module)
 
     return render(
         request,
@@ -2638,6 +2487,8 @@ def coordinator_result_report(request):
             "uploads": uploads,
             "selected_upload": selected_upload,
             "data": data,
+            "matrix_tests": tests,
+            "matrix": matrix,
         },
     )
 
@@ -2735,9 +2586,10 @@ def mentor_view_sif(request):
             for c in CallRecord.objects.filter(student=selected_student).order_by("week_no")
         }
         attendance_qs = Attendance.objects.filter(student=selected_student).order_by("week_no")
+        threshold = _attendance_threshold(module)
         sr = 1
         for att in attendance_qs:
-            if (att.week_percentage or 0) >= 80 and (att.overall_percentage or 0) >= 80:
+            if (att.week_percentage or 0) >= threshold and (att.overall_percentage or 0) >= threshold:
                 continue
             call = calls_by_week.get(att.week_no)
             call_done = bool(call and call.final_status in ("received", "not_received"))
@@ -2776,7 +2628,7 @@ def mentor_view_sif(request):
             )
             sr += 1
 
-        result_rows_qs = StudentResult.objects.filter(student=selected_student).select_related("upload", "upload__subject")
+        result_rows_qs = StudentResult.objects.live().filter(student=selected_student).select_related("upload", "upload__subject")
         result_rows_sorted = sorted(
             result_rows_qs,
             key=lambda r: (
@@ -2788,16 +2640,15 @@ def mentor_view_sif(request):
         )
         result_call_map = {
             c.upload_id: c
-            for c in ResultCallRecord.objects.filter(student=selected_student).select_related("upload")
+            for c in ResultCallRecord.objects.live().filter(student=selected_student).select_related("upload")
         }
+        rules = rule_utils.rules_for(module)
         sr = 1
         for row in result_rows_sorted:
             if not row.upload:
                 continue
-            cur_thr, total_thr = _result_thresholds(row.upload.test_name)
-            current_fail = row.marks_current is not None and row.marks_current < cur_thr
-            total_fail = row.marks_total is not None and row.marks_total < total_thr
-            if not (current_fail or total_fail):
+            rule = rules.get(row.upload.test_name) or rules["REMEDIAL"]
+            if not rule.below_either(row.marks_current, row.marks_total):
                 continue
 
             call = result_call_map.get(row.upload_id)
@@ -3212,11 +3063,72 @@ def manage_modules(request):
     if not is_superadmin_user(request.user):
         return HttpResponse("Forbidden", status=403)
 
+    if request.method == "POST" and request.POST.get("action") == "result_rules":
+        module = _active_module(request)
+        if not module:
+            messages.error(request, "Select a module first.")
+            return redirect("/modules/")
+        rules = {}
+        try:
+            for test_name in rule_utils.DEFAULT_RESULT_RULES:
+                current_below = float(request.POST.get(f"current_below_{test_name}"))
+                total_below = float(request.POST.get(f"total_below_{test_name}"))
+                # float() also takes "nan" and "inf"; neither is a usable cut-off
+                if not (math.isfinite(current_below) and math.isfinite(total_below)):
+                    raise ValueError
+                if current_below < 0 or total_below < 0:
+                    raise ValueError
+                needs_total = request.POST.get(f"needs_total_{test_name}") == "1"
+                rules[test_name] = rule_utils.FailRule(test_name, current_below, total_below, needs_total)
+        except (TypeError, ValueError):
+            messages.error(request, "Fail rule thresholds must be finite, non-negative numbers.")
+            return redirect("/modules/")
+
+        if rule_utils.rules_version(module, rules) == rule_utils.rules_version(module):
+            messages.info(request, "Fail rules unchanged.")
+            return redirect("/modules/")
+        counts = rule_utils.save_rules(module, rules)
+        messages.success(
+            request,
+            f"Fail rules saved for {module.name}. Failing results: {counts['flagged']}, "
+            f"calls added: {counts['calls_added']}, retired: {counts['calls_retired']}, "
+            f"restored: {counts['calls_restored']}.",
+        )
+        return redirect("/modules/")
+
+    if request.method == "POST" and request.POST.get("action") == "attendance_threshold":
+        module = _active_module(request)
+        if not module:
+            messages.error(request, "Select a module first.")
+            return redirect("/modules/")
+        try:
+            threshold = float(request.POST.get("attendance_threshold"))
+        except (TypeError, ValueError):
+            threshold = None
+        if threshold is None or not 0 < threshold <= 100:
+            messages.error(request, "Attendance threshold must be a number between 0 and 100.")
+            return redirect("/modules/")
+        if threshold == module.attendance_threshold:
+            messages.info(request, "Attendance threshold unchanged.")
+            return redirect("/modules/")
+        module.attendance_threshold = threshold
+        module.save(update_fields=["attendance_threshold"])
+        messages.success(
+            request,
+            f"Attendance threshold of {module.name} set to {threshold:g}%. "
+            "It applies to weeks uploaded from now on; re-upload a week to re-check its calls.",
+        )
+        return redirect("/modules/")
+
     if request.method == "POST":
         batch = (request.POST.get("academic_batch") or "").strip()
         year_level = (request.POST.get("year_level") or "FY").strip()
         variant = (request.POST.get("variant") or "FY2-CE").strip()
         semester = (request.POST.get("semester") or "Sem-1").strip()
+        try:
+            threshold = float(request.POST.get("attendance_threshold") or DEFAULT_THRESHOLD)
+        except ValueError:
+            threshold = DEFAULT_THRESHOLD
         if not batch:
             messages.error(request, "Batch is required.")
             return redirect("/modules/")
@@ -3226,6 +3138,8 @@ def manage_modules(request):
             variant = "FY2-CE"
         if semester not in {x[0] for x in AcademicModule.SEM_CHOICES}:
             semester = "Sem-1"
+        if not 0 < threshold <= 100:
+            threshold = DEFAULT_THRESHOLD
 
         name = f"{variant} - Batch {batch}_{semester}"
         module, created = AcademicModule.objects.get_or_create(
@@ -3235,16 +3149,24 @@ def manage_modules(request):
                 "year_level": year_level,
                 "variant": variant,
                 "semester": semester,
+                "attendance_threshold": threshold,
                 "is_active": True,
             },
         )
         request.session["current_module_id"] = module.id
         if created:
             messages.success(request, f"Module created: {module.name}")
+        elif threshold != module.attendance_threshold:
+            messages.info(
+                request,
+                f"Module already exists: {module.name}. Its attendance threshold stays at "
+                f"{module.attendance_threshold:g}%; change it under Attendance Threshold.",
+            )
         else:
             messages.info(request, f"Module already exists: {module.name}")
         return redirect("/modules/")
 
+    rule_module = _active_module(request)
     return render(
         request,
         "modules.html",
@@ -3253,54 +3175,76 @@ def manage_modules(request):
             "year_choices": AcademicModule.YEAR_CHOICES,
             "variant_choices": AcademicModule.VARIANT_CHOICES,
             "sem_choices": AcademicModule.SEM_CHOICES,
+            "rule_module": rule_module,
+            "result_rules": list(rule_utils.rules_for(rule_module).values()) if rule_module else [],
         },
     )
 
 
 # ---------------- SEM REGISTER ----------------
 
+# students per register page
+REGISTER_PAGE_SIZE = 200
+
+
+def _int_or_none(raw):
+    raw = (raw or "").strip()
+    return int(raw) if raw.lstrip("-").isdigit() else None
+
+
+def _render_semester_register(request, title, students, weeks, mentor_names=None):
+    """Paged register of `students`, narrowed by the roll range in the query string."""
+    roll_from = _int_or_none(request.GET.get("roll_from"))
+    roll_to = _int_or_none(request.GET.get("roll_to"))
+    if roll_from is not None:
+        students = students.filter(roll_no__gte=roll_from)
+    if roll_to is not None:
+        students = students.filter(roll_no__lte=roll_to)
+    students = students.select_related("mentor").order_by("roll_no", "id")
+
+    # pages are labelled with the roll numbers they span
+    rolls = list(students.values_list("roll_no", flat=True))
+    pages = [
+        {"number": n + 1, "first": rolls[i], "last": rolls[min(i + REGISTER_PAGE_SIZE, len(rolls)) - 1]}
+        for n, i in enumerate(range(0, len(rolls), REGISTER_PAGE_SIZE))
+    ]
+    page_obj = Paginator(students, REGISTER_PAGE_SIZE).get_page(request.GET.get("page", "1"))
+    selected_mentor = (request.GET.get("mentor") or "").strip()
+    filters = {"mentor": selected_mentor, "roll_from": roll_from, "roll_to": roll_to}
+
+    return render(request, "semester_register.html", {
+        "title": title,
+        "weeks": weeks,
+        "rows": report_utils.attendance_register(list(page_obj.object_list), weeks),
+        "page_obj": page_obj,
+        "pages": pages,
+        "mentor_names": mentor_names,
+        "selected_mentor": selected_mentor,
+        "roll_from": "" if roll_from is None else roll_from,
+        "roll_to": "" if roll_to is None else roll_to,
+        "base_q": urlencode({k: v for k, v in filters.items() if v not in (None, "")}),
+    })
+
+
 def semester_register(request):
     if "mentor" in request.session:
         return redirect("/mentor-semester-register/")
 
     module = _active_module(request)
+    students = Student.objects.filter(module=module)
+    mentor_names = list(students.values_list("mentor__name", flat=True).distinct().order_by("mentor__name"))
 
-    # all uploaded weeks
-    weeks = sorted(
-        Attendance.objects.filter(student__module=module).values_list("week_no", flat=True).distinct()
-    )
-
-    students = Student.objects.select_related("mentor").filter(module=module).order_by("roll_no")
-
-    table = []
-
-    for s in students:
-
-        row = {
-            "roll": s.roll_no,
-            "enrollment": s.enrollment,
-            "name": s.name,
-            "mentor": s.mentor.name
-        }
-
-        overall = None
-
-        for w in weeks:
-            rec = Attendance.objects.filter(student=s, week_no=w).first()
-            if rec:
-                row[f"week_{w}"] = rec.week_percentage
-                overall = rec.overall_percentage
-            else:
-                row[f"week_{w}"] = None
+    selected_mentor = (request.GET.get("mentor") or "").strip()
+    if selected_mentor:
+        students = students.filter(mentor__name=selected_mentor)
 
-        row["overall"] = overall
-        table.append(row)
-
-    return render(request, "semester_register.html", {
-        "title": "Overall Attendance Register",
-        "weeks": weeks,
-        "rows": table
-    })
+    return _render_semester_register(
+        request,
+        "Overall Attendance Register",
+        students,
+        report_utils.register_weeks(module),
+        mentor_names,
+    )
 
 
 def mentor_semester_register(request):
@@ -3309,43 +3253,9 @@ def mentor_semester_register(request):
         return redirect("/")
 
     module = _active_module(request)
-    weeks = sorted(
-        Attendance.objects.filter(student__module=module, student__mentor=mentor)
-        .values_list("week_no", flat=True)
-        .distinct()
-    )
-
-    students = (
-        Student.objects.select_related("mentor")
-        .filter(module=module, mentor=mentor)
-        .order_by("roll_no")
-    )
-
-    table = []
-    for s in students:
-        row = {
-            "roll": s.roll_no,
-            "enrollment": s.enrollment,
-            "name": s.name,
-            "mentor": s.mentor.name,
-        }
-        overall = None
-        for w in weeks:
-            rec = Attendance.objects.filter(student=s, week_no=w).first()
-            if rec:
-                row[f"week_{w}"] = rec.week_percentage
-                overall = rec.overall_percentage
-            else:
-                row[f"week_{w}"] = None
-        row["overall"] = overall
-        table.append(row)
-
-    return render(
+    return _render_semester_register(
         request,
-        "semester_register.html",
-        {
-            "title": "My Mentees Attendance Register",
-            "weeks": weeks,
-            "rows": table,
-        },
+        "My Mentees Attendance Register",
+        Student.objects.filter(module=module, mentor=mentor),
+        report_utils.register_weeks(module, mentor),
     )
@@ -0,0 +1,255 @@
+import csv
+import io
+import re
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+
+
+# Header rows are always near the top of the sheet; never scan further.
+HEADER_SCAN_ROWS = 50
+
+XLSX_MAGIC = b"PK\x03\x04"
+XLS_MAGIC = b"\xd0\xcf\x11\xe0"
+
+# a CSV/TSV export is one sheet; it answers to the name a caller asks for, else this one
+CSV_SHEET = "Sheet1"
+
+# CSV cells that openpyxl would have given as numbers (no leading zeros: enrollments stay text)
+INT_RE = re.compile(r"^[-+]?(0|[1-9][0-9]*)$")
+FLOAT_RE = re.compile(r"^[-+]?(0|[1-9][0-9]*)?\.[0-9]+([eE][-+]?[0-9]+)?$|^[-+]?(0|[1-9][0-9]*)[eE][-+]?[0-9]+$")
+
+
+# ---------------- CELL HELPERS ----------------
+
+def _cell_value(val):
+    """Normalize an openpyxl value the way pandas' openpyxl engine does."""
+    if val is None:
+        return None
+    if isinstance(val, str):
+        if val in ERROR_CODES:
+            return None
+        return val if val != "" else None
+    if isinstance(val, float) and val.is_integer():
+        return int(val)
+    return val
+
+
+def _csv_value(text):
+    """Type a CSV cell the way it would come out of an .xlsx export."""
+    if text == "" or text in ERROR_CODES:
+        return None
+    stripped = text.strip()
+    if INT_RE.match(stripped):
+        return int(stripped)
+    if FLOAT_RE.match(stripped):
+        return _cell_value(float(stripped))
+    return text
+
+
+def cell_text(val):
+    """Stripped text of a cell; empty string for blank/NaN cells."""
+    if val is None:
+        return ""
+    try:
+        if pd.isna(val):
+            return ""
+    except (TypeError, ValueError):
+        pass
+    return str(val).strip()
+
+
+def row_text(row):
+    """Lower-cased text of all non-blank cells in a row (used for header detection)."""
+    return " ".join(cell_text(x).lower() for x in row if cell_text(x))
+
+
+def _trim(rows):
+    # drop trailing blank rows and pad every row to the same width (like pandas)
+    while rows and not any(v is not None for v in rows[-1]):
+        rows.pop()
+    width = 0
+    for r in rows:
+        for i in range(len(r) - 1, -1, -1):
+            if r[i] is not None:
+                width = max(width, i + 1)
+                break
+    return [list(r[:width]) + [None] * (width - len(r)) for r in rows]
+
+
+# ---------------- READERS ----------------
+
+def _rewind(file_obj):
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+
+
+def _is_path(file_obj):
+    return isinstance(file_obj, (str, bytes)) or hasattr(file_obj, "__fspath__")
+
+
+def _head(file_obj, size=2048):
+    if _is_path(file_obj):
+        with open(file_obj, "rb") as fh:
+            return fh.read(size)
+    _rewind(file_obj)
+    head = file_obj.read(size)
+    _rewind(file_obj)
+    return head
+
+
+def _is_text(head):
+    # neither a zip (xlsx) nor an OLE2 (.xls) container and no NUL bytes: CSV/TSV
+    return not head.startswith((XLSX_MAGIC, XLS_MAGIC)) and b"\x00" not in head
+
+
+def _pick(names, sheets):
+    if sheets is None:
+        return list(names)
+    if callable(sheets):
+        picked = sheets(list(names))
+        if picked is None:
+            return []
+        return [picked] if isinstance(picked, str) else list(picked)
+    return [n for n in names if n in set(sheets)]
+
+
+def _read_xlsx(file_obj, sheets, max_rows):
+    _rewind(file_obj)
+    wb = load_workbook(file_obj, read_only=True, data_only=True, keep_links=False)
+    try:
+        out = {}
+        for name in _pick(wb.sheetnames, sheets):
+            ws = wb[name]
+            rows = [
+                [_cell_value(v) for v in row]
+                for row in ws.iter_rows(max_row=max_rows, values_only=True)
+            ]
+            out[name] = _trim(rows)
+        return out
+    finally:
+        wb.close()
+
+
+def _read_legacy(file_obj, sheets, max_rows):
+    # .xls (and anything openpyxl cannot open) still goes through pandas/xlrd
+    _rewind(file_obj)
+    xls = pd.ExcelFile(file_obj)
+    out = {}
+    for name in _pick(xls.sheet_names, sheets):
+        df = pd.read_excel(xls, sheet_name=name, header=None, nrows=max_rows)
+        df = df.astype(object).where(df.notna(), None)
+        out[name] = _trim([[_cell_value(v) for v in r] for r in df.values.tolist()])
+    return out
+
+
+def _csv_rows(stream, delimiter, max_rows):
+    rows = []
+    for row in csv.reader(stream, delimiter=delimiter):
+        if max_rows is not None and len(rows) >= max_rows:
+            break
+        rows.append([_csv_value(v) for v in row])
+    return rows
+
+
+def _read_csv(file_obj, sheets, head, max_rows):
+    # CSV/TSV exports skip openpyxl entirely; streamed row by row through the csv module
+    if sheets is None or callable(sheets):
+        names = _pick([CSV_SHEET], sheets)
+    else:
+        names = list(sheets)[:1]
+    if not names:
+        return {}
+
+    # title rows above the table hold no delimiter: count over the whole sample,
+    # leaving out a last line the sample may have cut
+    sample = head.rsplit(b"\n", 1)[0] if b"\n" in head else head
+    delimiter = "\t" if sample.count(b"\t") > sample.count(b",") else ","
+    # Excel on Windows saves CSV in the ANSI code page, not UTF-8
+    for encoding, errors in (("utf-8-sig", "strict"), ("cp1252", "replace")):
+        raw = open(file_obj, "rb") if _is_path(file_obj) else file_obj
+        _rewind(raw)
+        stream = io.TextIOWrapper(raw, encoding=encoding, errors=errors, newline="")
+        try:
+            rows = _csv_rows(stream, delimiter, max_rows)
+            break
+        except UnicodeDecodeError:
+            continue
+        finally:
+            # hand the upload back open; only files opened here are closed
+            stream.detach()
+            if raw is not file_obj:
+                raw.close()
+    return {names[0]: _trim(rows)}
+
+
+def read_workbook(file_obj, sheets=None, max_rows=None):
+    """
+    Open a workbook once and return {sheet_name: rows} in workbook order.
+
+    `sheets` may be None (all sheets), a list of names, or a callable that
+    receives the sheet names and returns the name(s) to load.
+    `max_rows` bounds how many rows are read per sheet (header-only reads).
+    Blank cells are None; rows are padded to the same width.
+    CSV/TSV files are read as a single sheet named after the first
+    requested one (CSV_SHEET when all sheets are asked for).
+    """
+    head = _head(file_obj)
+    if head.startswith(XLSX_MAGIC):
+        return _read_xlsx(file_obj, sheets, max_rows)
+    if _is_text(head):
+        return _read_csv(file_obj, sheets, head, max_rows)
+    return _read_legacy(file_obj, sheets, max_rows)
+
+
+def read_rows(file_obj, choose=None, max_rows=None):
+    """
+    Read a single sheet and return (sheet_name, rows).
+
+    `choose` receives the sheet names and returns the one to read;
+    by default the first sheet is used.
+    """
+    def _first(names):
+        if choose is not None:
+            picked = choose(names)
+            if picked:
+                return picked
+        return names[0] if names else None
+
+    book = read_workbook(file_obj, sheets=_first, max_rows=max_rows)
+    for name, rows in book.items():
+        return name, rows
+    return "", []
+
+
+# ---------------- HEADER / COLUMN HELPERS ----------------
+
+def find_header_row(rows, match, limit=HEADER_SCAN_ROWS):
+    """Index of the first row (within `limit`) whose text satisfies `match`."""
+    for i, row in enumerate(rows[:limit]):
+        if match(row_text(row)):
+            return i
+    return None
+
+
+def column(rows, idx, start=0):
+    """Values of column `idx` from row `start` onwards (None when missing)."""
+    if idx is None:
+        return [None] * max(len(rows) - start, 0)
+    return [r[idx] if idx < len(r) else None for r in rows[start:]]
+
+
+def columns(rows, start=0):
+    """All columns from row `start` onwards as a list of column arrays."""
+    data = rows[start:]
+    width = max((len(r) for r in data), default=0)
+    return [column(data, i) for i in range(width)]
+
+
+def frame(rows, start=0, labels=None):
+    """DataFrame (object dtype, raw cell values) of the rows from `start` onwards."""
+    df = pd.DataFrame(rows[start:], dtype=object)
+    if labels is not None:
+        df.columns = list(labels)[: len(df.columns)]
+    return df
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 try:
@@ -109,6 +110,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # background upload threads write while requests are served:
+        # take the write lock up front and wait for it instead of failing
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -119,6 +126,60 @@ if dj_database_url and os.getenv("DATABASE_URL"):
     )
 
 
+# ----------------------------
+# Cache (upload job progress)
+# ----------------------------
+
+# Local memory by default; set CACHE_DIR so all worker processes share job progress.
+CACHE_DIR = os.getenv("CACHE_DIR", "").strip()
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'easymentor',
+    }
+}
+
+if CACHE_DIR:
+    CACHES["default"] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    }
+
+# Job progress is written to the DB at most every N rows or T milliseconds.
+JOB_PROGRESS_FLUSH_ROWS = int(os.getenv("JOB_PROGRESS_FLUSH_ROWS", "200"))
+JOB_PROGRESS_FLUSH_MS = int(os.getenv("JOB_PROGRESS_FLUSH_MS", "1000"))
+
+
+# ----------------------------
+# Background jobs
+# ----------------------------
+
+# Jobs are run by the `manage.py run_jobs` worker (Procfile / render.yaml).
+# True drains the queue in threads of the web process instead: a fallback for
+# local runserver without a worker, not for deployments.
+JOBS_IN_PROCESS = env_bool("JOBS_IN_PROCESS", False)
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "").strip() or os.path.join(tempfile.gettempdir(), "easymentor-jobs")
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY_SECONDS = int(os.getenv("JOB_RETRY_DELAY_SECONDS", "30"))
+
+# Uploads above FILE_UPLOAD_MAX_MEMORY_SIZE stream to FILE_UPLOAD_TEMP_DIR instead of
+# memory. Keeping that dir next to the job spool lets enqueue() move a workbook into
+# place with a rename instead of writing it a second time.
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", str(512 * 1024)))
+FILE_UPLOAD_TEMP_DIR = os.getenv("FILE_UPLOAD_TEMP_DIR", "").strip() or os.path.join(JOB_SPOOL_DIR, "incoming")
+os.makedirs(FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+
+# Resumable uploads from the mobile app are assembled here (same filesystem as the spool).
+CHUNKED_UPLOAD_DIR = os.getenv("CHUNKED_UPLOAD_DIR", "").strip() or os.path.join(JOB_SPOOL_DIR, "chunks")
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv("CHUNKED_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv("CHUNKED_UPLOAD_MAX_SIZE", str(50 * 1024 * 1024)))
+CHUNKED_UPLOAD_TTL_HOURS = int(os.getenv("CHUNKED_UPLOAD_TTL_HOURS", "24"))
+
+
 # ----------------------------
 # Password Validation
 # ----------------------------
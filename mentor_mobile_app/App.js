@@ -17,6 +17,7 @@ import { WebView } from "react-native-webview";
 import * as DocumentPicker from "expo-document-picker";
 import LegacyMentorApp from "./src/mentor/LegacyMentorApp";
 import { LIVE_API_BASE_URL, LOCAL_API_BASE_URL } from "./src/constants";
+import { sha256Hex } from "./src/sha256";
 import {
   createStaffModule,
   getStaffAttendance,
@@ -40,6 +41,11 @@ const BASE_KEY = "easymentor_mobile_base_v1";
 const LEGACY_MENTOR_BASE_KEY = "easymentor_api_base_url_v1";
 const STAFF_SESSION_KEY = "easymentor_mobile_staff_session_v1";
 const PAGE_SIZE = 40;
+// background upload jobs: poll interval, overall deadline, and how long a job may sit in the queue
+const JOB_POLL_MS = 1500;
+const JOB_TIMEOUT_MS = 15 * 60 * 1000;
+const JOB_MAX_QUEUED_POLLS = 120;
+const CHUNK_MAX_RETRIES = 5;
 
 const APP_COLORS = {
   bg: "#eef3fb",
@@ -713,36 +719,119 @@ function RoleWebTabsApp({ role, apiBaseUrl, onChangeBase, onExit }) {
     } catch (_) {}
   };
 
+  const waitForStaffJob = async (jobId) => {
+    // the server imports in the background; poll until the job finishes or we give up
+    const deadline = Date.now() + JOB_TIMEOUT_MS;
+    let queuedPolls = 0;
+    for (;;) {
+      if (Date.now() > deadline) {
+        throw new Error("The server is still processing this upload. Check the data in a few minutes, or upload again.");
+      }
+      if (queuedPolls >= JOB_MAX_QUEUED_POLLS) {
+        throw new Error("The upload is still waiting in the server queue. Please try again.");
+      }
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+      const response = await fetch(`${currentUrl}/api/mobile/staff/jobs/${jobId}/`, {
+        headers: { Authorization: `Bearer ${staffToken}` },
+      });
+      const job = await response.json();
+      if (!response.ok || job.ok === false) {
+        throw new Error(job.msg || "Upload failed");
+      }
+      if (job.status === "completed") return job.result || {};
+      queuedPolls = job.status === "queued" ? queuedPolls + 1 : 0;
+      if (job.status === "failed" || job.status === "cancelled") {
+        throw new Error((job.result && job.result.msg) || job.message || "Upload failed");
+      }
+    }
+  };
+
+  const sendChunked = async (file, headers) => {
+    // resumable upload: the server keeps every byte that arrived, so a dropped
+    // chunk is resent from the server's offset instead of restarting the file
+    const bytes = new Uint8Array(await (await fetch(file.uri)).arrayBuffer());
+    const startResponse = await fetch(`${currentUrl}/api/mobile/staff/uploads/`, {
+      method: "POST",
+      headers: { ...headers, "Content-Type": "application/json" },
+      body: JSON.stringify({ file_name: file.name || "upload.xlsx", size: bytes.length, sha256: sha256Hex(bytes) }),
+    });
+    const upload = await startResponse.json();
+    if (!startResponse.ok || upload.ok === false) {
+      throw new Error(upload.msg || "Upload failed");
+    }
+
+    const url = `${currentUrl}/api/mobile/staff/uploads/${upload.upload_id}/`;
+    let offset = upload.offset;
+    let failures = 0;
+    let resent = false;
+    for (;;) {
+      while (offset === null || offset < bytes.length) {
+        let response;
+        try {
+          response = offset === null
+            ? await fetch(url, { headers })
+            : await fetch(url, {
+                method: "PUT",
+                headers: { ...headers, "Content-Type": "application/octet-stream", "Upload-Offset": String(offset) },
+                body: bytes.slice(offset, offset + upload.chunk_size),
+              });
+        } catch (err) {
+          // connection dropped: ask the server how much it kept, then carry on
+          failures += 1;
+          if (failures > CHUNK_MAX_RETRIES) throw err;
+          offset = null;
+          await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+          continue;
+        }
+        const data = await response.json();
+        // 409: the server is at another offset; resume from there
+        if (!response.ok && response.status !== 409) {
+          throw new Error(data.msg || "Upload failed");
+        }
+        failures = 0;
+        offset = data.offset;
+      }
+
+      const response = await fetch(`${url}complete/`, { method: "POST", headers });
+      const data = await response.json();
+      if (response.ok && data.ok !== false) return upload.upload_id;
+      // a checksum mismatch resets the upload to byte 0: send the file once more
+      if (data.offset !== 0 || resent) {
+        throw new Error(data.msg || "Upload failed");
+      }
+      resent = true;
+      offset = 0;
+    }
+  };
+
   const uploadMultipart = async (path, fields = {}, files = {}) => {
     if (!staffToken) throw new Error("Unauthorized");
+    const headers = {
+      Authorization: `Bearer ${staffToken}`,
+      "X-Module-Id": String(staffModuleId || ""),
+    };
     const form = new FormData();
+    form.append("async", "1");
     Object.entries(fields).forEach(([k, v]) => {
       if (v !== undefined && v !== null && String(v) !== "") {
         form.append(k, String(v));
       }
     });
-    Object.entries(files).forEach(([k, f]) => {
-      if (!f) return;
-      form.append(k, {
-        uri: f.uri,
-        name: f.name || `${k}.xlsx`,
-        type: f.mimeType || "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-      });
-    });
+    // files go up in chunks first; the import endpoint takes their upload ids
+    for (const [k, f] of Object.entries(files)) {
+      if (f) form.append(`${k}_upload_id`, await sendChunked(f, headers));
+    }
 
     const response = await fetch(`${currentUrl}${path}`, {
       method: "POST",
-      headers: {
-        Authorization: `Bearer ${staffToken}`,
-        "X-Module-Id": String(staffModuleId || ""),
-      },
+      headers,
       body: form,
     });
     const data = await response.json();
     if (!response.ok || data.ok === false) {
       throw new Error(data.msg || "Upload failed");
     }
-    return data;
+    return data.job_id ? waitForStaffJob(data.job_id) : data;
   };
 
   const doStudentUpload = async () => {